@@ -11,6 +11,11 @@ temp_dir = tempfile.gettempdir()
 os.environ.setdefault('FLASK_INSTANCE_PATH', temp_dir)
 os.makedirs(temp_dir, exist_ok=True)
 
+# 部署前用 `python run.py precompile-themes --cache-dir .jinja_cache` 预编译的主题模板随代码发布
+prebuilt_template_cache = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.jinja_cache')
+if os.path.isdir(prebuilt_template_cache):
+    os.environ.setdefault('THEME_BYTECODE_CACHE_DIR', prebuilt_template_cache)
+
 # --- 应用创建和初始化 ---
 from app import create_app, db
 
@@ -24,6 +29,10 @@ with app.app_context():
         # 这会创建所有尚未存在的表
         db.create_all()
 
+        # 为已有的表补充新增的可空字段
+        from app.utils.schema import add_missing_columns
+        add_missing_columns()
+
         # --- 填充默认数据 (如果需要) ---
         from app.models.setting import Setting
         from app.models.user import User
@@ -3,6 +3,7 @@ Noteblog - 基于 Flask 的可扩展博客框架
 """
 from flask import Flask
 from flask import send_from_directory
+from flask import request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
@@ -72,6 +73,33 @@ def create_app(config_name='default'):
     allowed_mimes = os.getenv('ALLOWED_UPLOAD_MIME_TYPES', 'image/png,image/jpeg,image/gif,image/webp')
     app.config['ALLOWED_UPLOAD_MIME_TYPES'] = {mime.strip().lower() for mime in allowed_mimes.split(',') if mime.strip()}
     
+    # 主题模板修改后是否自动重新编译，未设置时跟随 debug
+    templates_auto_reload = os.getenv('TEMPLATES_AUTO_RELOAD')
+    if templates_auto_reload is not None:
+        app.config['TEMPLATES_AUTO_RELOAD'] = templates_auto_reload.strip().lower() in ('1', 'true', 'yes', 'on')
+    
+    # 统计主题模板实际使用的默认上下文变量（调试报告），未设置时跟随 debug
+    context_report = os.getenv('THEME_CONTEXT_REPORT')
+    if context_report is not None:
+        app.config['THEME_CONTEXT_REPORT'] = context_report.strip().lower() in ('1', 'true', 'yes', 'on')
+    
+    # 主题声明为可流式输出的模板以流式响应返回，默认关闭
+    app.config['THEME_STREAMING'] = os.getenv('THEME_STREAMING', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+    
+    # 压缩主题的 CSS/JS 资源（需要安装可选依赖 rcssmin / rjsmin），默认关闭
+    app.config['THEME_ASSET_MINIFY'] = os.getenv('THEME_ASSET_MINIFY', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+    
+    # 在 Flask 分发请求之前直接返回主题、插件、上传目录中的静态文件，默认关闭
+    app.config['STATIC_WSGI_FAST_PATH'] = os.getenv('STATIC_WSGI_FAST_PATH', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+    
+    # 主题模板字节码缓存目录（相对路径基于实例目录），设置为空字符串关闭
+    bytecode_cache_dir = os.getenv('THEME_BYTECODE_CACHE_DIR')
+    if bytecode_cache_dir is None:
+        bytecode_cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+    elif bytecode_cache_dir and not os.path.isabs(bytecode_cache_dir):
+        bytecode_cache_dir = os.path.join(app.instance_path, bytecode_cache_dir)
+    app.config['THEME_BYTECODE_CACHE_DIR'] = bytecode_cache_dir or None
+    
     # 初始化扩展
     db.init_app(app)
     migrate.init_app(app, db)
@@ -95,22 +123,37 @@ def create_app(config_name='default'):
     # plugin_manager 会尝试访问数据库导致错误。通过环境变量
     # SKIP_PLUGIN_INIT=1 可以在初始化过程中跳过插件/主题加载。
     if os.getenv('SKIP_PLUGIN_INIT', '0') != '1':
+        # 插件与主题状态的跨 worker 版本号，须在两者之前初始化
+        from app.services.runtime_state import runtime_state
+        runtime_state.init_app(app)
         plugin_manager.init_app(app)
+
+    # 注册核心钩子：文章、评论保存/更新后重建持久化的渲染结果
+    from app.models.post_render import register_render_hooks
+    from app.models.comment_render import register_comment_render_hooks
+    register_render_hooks(plugin_manager)
+    register_comment_render_hooks(plugin_manager)
+    
+    # 文章发布、修改、删除后使侧边栏缓存失效
+    from app.services.sidebar_service import register_sidebar_hooks
+    register_sidebar_hooks(plugin_manager)
     
     # 初始化主题系统
     from app.services.theme_manager import theme_manager
     if os.getenv('SKIP_PLUGIN_INIT', '0') != '1':
         theme_manager.init_app(app)
 
-    # 注册请求处理钩子
+    # 注册请求处理钩子（静态文件请求不触发插件钩子）
+    from app.services.asset_service import is_asset_request
+
     @app.before_request
     def before_request_handler():
-        if hasattr(app, 'plugin_manager'):
+        if hasattr(app, 'plugin_manager') and not is_asset_request():
             app.plugin_manager.do_action('before_request')
 
     @app.after_request
     def after_request_handler(response):
-        if hasattr(app, 'plugin_manager'):
+        if hasattr(app, 'plugin_manager') and not is_asset_request():
             # after_request钩子通常需要接收response对象
             # 但我们的do_action不直接处理返回值，所以这里只是触发
             app.plugin_manager.do_action('after_request', response)
@@ -126,12 +169,8 @@ def create_app(config_name='default'):
         try:
             from app.services.plugin_manager import plugin_manager
 
-            # 获取插件钩子内容
-            plugin_hooks = {
-                'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom')
-            }
-
-            return {'plugin_hooks': plugin_hooks}
+            # 模板读取时才获取插件钩子内容；视图自己提供 plugin_hooks 时不会执行
+            return {'plugin_hooks': plugin_manager.template_hooks('sidebar_bottom')}
         except Exception:
             # 如果插件管理器不可用，返回空字典
             return {}
@@ -151,10 +190,9 @@ def create_app(config_name='default'):
 
     @app.route('/themes/<theme_name>/static/<path:filename>')
     def theme_static(theme_name, filename):
-        themes_dir = path_utils.project_path('themes')
-        static_dir = os.path.join(themes_dir, theme_name, 'static')
-        # send_from_directory 会处理路径安全性
-        return send_from_directory(static_dir, filename)
+        # asset_url() 生成的带内容指纹的URL返回永久缓存头，路径安全性由 safe_join 处理
+        from app.services.asset_service import send_theme_static
+        return send_theme_static(theme_name, filename, request.environ)
     
     # 提供插件静态文件（/static/plugins/<plugin>/...）的路由，便于插件资源加载
     @app.route('/static/plugins/<plugin_name>/<path:filename>')
@@ -250,4 +288,9 @@ def create_app(config_name='default'):
             </html>
             """, 500
     
+    # 静态文件快速通道：主题、插件、上传文件在进入 Flask 之前直接返回
+    if app.config['STATIC_WSGI_FAST_PATH']:
+        from app.services.asset_service import StaticFilesMiddleware
+        app.wsgi_app = StaticFilesMiddleware(app.wsgi_app, app)
+    
     return app
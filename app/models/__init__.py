@@ -3,9 +3,11 @@
 """
 from .user import User
 from .post import Post, Category, Tag
+from .post_render import PostRender
 from .comment import Comment
+from .comment_render import CommentRender
 from .plugin import Plugin
 from .theme import Theme
 from .setting import Setting
 
-__all__ = ['User', 'Post', 'Category', 'Tag', 'Comment', 'Plugin', 'Theme', 'Setting']
+__all__ = ['User', 'Post', 'Category', 'Tag', 'PostRender', 'Comment', 'CommentRender', 'Plugin', 'Theme', 'Setting']
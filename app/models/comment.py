@@ -2,6 +2,7 @@
 from datetime import datetime
 from app import db
 from app.services.markdown_service import markdown_service
+from .comment_render import CommentRender
 
 class Comment(db.Model):
     """评论模型"""
@@ -18,6 +19,7 @@ class Comment(db.Model):
     is_spam = db.Column(db.Boolean, default=False)  # 是否为垃圾评论
     parent_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=True)  # 父评论ID
     like_count = db.Column(db.Integer, default=0)  # 点赞数
+    is_markdown = db.Column(db.Boolean, nullable=True)  # 保存时计算的内容是否包含Markdown语法
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -27,6 +29,7 @@ class Comment(db.Model):
     
     # 关系
     parent = db.relationship('Comment', remote_side=[id], backref='replies')
+    render = db.relationship('CommentRender', uselist=False, cascade='all, delete-orphan')
     
     def __init__(self, content, post_id, **kwargs):
         self.content = content
@@ -53,12 +56,34 @@ class Comment(db.Model):
     
     def get_reply_count(self):
         """获取回复数量"""
+        replies = getattr(self, '_replies_cache', None)
+        if replies is not None:
+            return len(replies)
         return Comment.query.filter_by(parent_id=self.id, is_approved=True).count()
     
     def get_replies(self):
         """获取回复"""
+        replies = getattr(self, '_replies_cache', None)
+        if replies is not None:
+            return list(replies)
         return Comment.query.filter_by(parent_id=self.id, is_approved=True).order_by(db.asc('created_at')).all()
     
+    @staticmethod
+    def attach_replies(comments):
+        """
+        用同一篇文章已加载的已审核评论为每条评论设置回复列表，模板中不再逐条查询
+        
+        Args:
+            comments (list): 文章的全部已审核评论（含回复）
+        """
+        replies_by_parent = {}
+        ordered = sorted(comments, key=lambda c: (c.created_at or datetime.min, c.id or 0))
+        for comment in ordered:
+            if comment.parent_id is not None:
+                replies_by_parent.setdefault(comment.parent_id, []).append(comment)
+        for comment in comments:
+            comment._replies_cache = replies_by_parent.get(comment.id, [])
+    
     def get_display_name(self):
         """获取显示名称"""
         if self.author_id and self.author:
@@ -92,11 +117,15 @@ class Comment(db.Model):
         return self.is_approved and not self.is_spam
     
     def get_content_html(self, sanitize=True):
-        """获取渲染后的HTML内容"""
-        return markdown_service.render(self.content, sanitize)
+        """获取渲染后的HTML内容（comment_renders 中写入时已清理的结果）"""
+        if not sanitize:
+            return markdown_service.render(self.content, sanitize)
+        return markdown_service.trusted_html(CommentRender.html_for(self))
     
     def is_markdown_content(self):
-        """检查内容是否包含Markdown语法"""
+        """检查内容是否包含Markdown语法（优先使用保存时计算的结果）"""
+        if self.is_markdown is not None:
+            return self.is_markdown
         return markdown_service.is_markdown(self.content)
     
     def to_dict(self, include_replies=False, include_html=False):
@@ -131,3 +160,11 @@ class Comment(db.Model):
     
     def __repr__(self):
         return f'<Comment {self.id} on Post {self.post_id}>'
+
+
+@db.event.listens_for(Comment, 'before_insert')
+@db.event.listens_for(Comment, 'before_update')
+def _compute_comment_is_markdown(mapper, connection, target):
+    """保存时在内容变化（或尚未计算）的情况下重新检测Markdown语法"""
+    if target.is_markdown is None or db.inspect(target).attrs.content.history.has_changes():
+        target.is_markdown = markdown_service.is_markdown(target.content)
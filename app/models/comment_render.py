@@ -0,0 +1,108 @@
+"""
+评论渲染结果模型
+"""
+import os
+from app import db
+from app.models.stored_render import StoredRender, owner_foreign_key
+from app.services.markdown_service import markdown_service, RenderCache
+
+# 评论HTML进程内缓存条目上限，以评论ID为键，条目记录内容哈希与渲染配置签名，0 表示关闭
+try:
+    COMMENT_HTML_CACHE_SIZE = int(os.getenv('COMMENT_HTML_CACHE_SIZE', 2048))
+except (TypeError, ValueError):
+    COMMENT_HTML_CACHE_SIZE = 2048
+
+comment_html_cache = RenderCache(COMMENT_HTML_CACHE_SIZE)
+
+
+def _cache_version(comment):
+    """
+    进程内缓存条目的版本：评论内容哈希 + 渲染配置签名
+
+    由内容本身决定，其他 worker 编辑评论（即使没有修改 updated_at）后同样不会命中旧条目；
+    审核、点赞等不修改内容的操作不会使条目失效
+    """
+    return (CommentRender.compute_hash(comment), markdown_service.config_signature)
+
+
+def _cached_html(comment):
+    """返回进程内缓存中与评论当前内容一致的HTML，未命中返回 None"""
+    if comment.id is None:
+        return None
+    cached = comment_html_cache.get(comment.id)
+    if cached is not None and cached[0] == _cache_version(comment):
+        return cached[1]
+    return None
+
+
+def invalidate_comment_html(*comment_ids):
+    """提前释放评论HTML的进程内缓存条目（评论编辑、删除后调用，内容变化本身由版本识别）"""
+    for comment_id in comment_ids:
+        comment_html_cache.delete(comment_id)
+
+
+class CommentRender(StoredRender, db.Model):
+    """评论渲染结果表，保存评论当前内容在写入时清理过的HTML"""
+    __tablename__ = 'comment_renders'
+
+    owner_key = 'comment_id'
+    owner_label = '评论'
+    create_table_command = 'run.py backfill-renders'
+
+    comment_id = owner_foreign_key('comments.id')
+
+    @staticmethod
+    def owner_model():
+        from app.models.comment import Comment
+        return Comment
+
+    @classmethod
+    def render_fields(cls, comment):
+        """渲染并清理评论"""
+        return {'content_html': markdown_service.render(comment.content, sanitize=True)}
+
+    @classmethod
+    def prefetch(cls, comments):
+        """
+        一次查询加载多条评论的渲染结果，已命中进程内缓存的评论不再读取
+
+        Args:
+            comments (list): 评论列表
+        """
+        super().prefetch([c for c in comments if _cached_html(c) is None])
+
+    @classmethod
+    def html_for(cls, comment):
+        """
+        获取评论清理后的HTML
+
+        先查进程内缓存（评论ID + 内容哈希），未命中再读取 comment_renders，
+        缺失或过期时重新渲染。
+
+        Returns:
+            str: 清理后的HTML
+        """
+        html = _cached_html(comment)
+        if html is not None:
+            return html
+
+        html = cls.for_owner(comment).content_html
+        if comment.id is not None:
+            comment_html_cache.set(comment.id, (_cache_version(comment), html))
+        return html
+
+
+def _refresh_comment_render(comment=None, **kwargs):
+    """评论保存/更新后重新渲染"""
+    if comment is None or comment.id is None or not CommentRender.table_ready():
+        return
+    comment._render_cache = CommentRender.store(comment)
+
+
+def register_comment_render_hooks(plugin_manager):
+    """注册评论渲染结果的维护钩子（重复调用不会重复注册）"""
+    for hook_name in ('after_comment_save', 'after_comment_update'):
+        registered = plugin_manager.hooks.get(hook_name, [])
+        if any(hook['callback'] is _refresh_comment_render for hook in registered):
+            continue
+        plugin_manager.register_hook(hook_name, _refresh_comment_render, priority=5)
@@ -2,6 +2,7 @@
 from datetime import datetime
 from app import db
 from app.services.markdown_service import markdown_service
+from app.models.post_render import PostRender, EXCERPT_CACHE_LENGTH
 
 # 文章标签关联表
 post_tags = db.Table('post_tags',
@@ -144,6 +145,7 @@ class Post(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     published_at = db.Column(db.DateTime, nullable=True)
+    is_markdown = db.Column(db.Boolean, nullable=True)  # 保存时计算的正文是否包含Markdown语法
     
     # 外键
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -153,6 +155,7 @@ class Post(db.Model):
     tags = db.relationship('Tag', secondary=post_tags, lazy='subquery',
                           backref=db.backref('posts', lazy=True))
     comments = db.relationship('Comment', backref='post', lazy='dynamic', cascade='all, delete-orphan')
+    render = db.relationship('PostRender', uselist=False, cascade='all, delete-orphan')
     
     def __init__(self, title, content, author_id, **kwargs):
         self.title = title
@@ -190,22 +193,46 @@ class Post(db.Model):
         """获取已审核的评论"""
         return self.comments.filter_by(is_approved=True).order_by(db.desc('created_at')).all()
     
+    def get_render(self):
+        """获取渲染结果（post_renders），内容未变化时不会重新渲染"""
+        return PostRender.for_owner(self)
+    
     def get_content_html(self, sanitize=True):
         """获取渲染后的HTML内容"""
-        return markdown_service.render(self.content, sanitize)
+        if not sanitize:
+            return markdown_service.render(self.content, sanitize)
+        return markdown_service.trusted_html(self.get_render().content_html)
     
     def get_excerpt_html(self, length=150, sanitize=True):
         """获取渲染后的HTML摘要"""
+        if not sanitize:
+            if self.excerpt:
+                return markdown_service.render(self.excerpt, sanitize)
+            return markdown_service.render_excerpt(self.content, length, sanitize)
+        
+        rendered = self.get_render()
         if self.excerpt:
-            return markdown_service.render(self.excerpt, sanitize)
-        return markdown_service.render_excerpt(self.content, length, sanitize)
+            return markdown_service.trusted_html(rendered.excerpt_html)
+        if length <= EXCERPT_CACHE_LENGTH:
+            return markdown_service.truncate_text(rendered.excerpt_text, length)
+        return markdown_service.render_excerpt(self.content, length)
     
     def get_toc(self):
         """获取文章目录"""
-        return markdown_service.get_toc(self.content)
+        return self.get_render().toc_html or ''
+    
+    def get_word_count(self):
+        """获取文章字数"""
+        return self.get_render().word_count or 0
+    
+    def get_reading_time(self):
+        """获取预计阅读时间（分钟）"""
+        return self.get_render().reading_time or 0
     
     def is_markdown_content(self):
-        """检查内容是否包含Markdown语法"""
+        """检查内容是否包含Markdown语法（优先使用保存时计算的结果）"""
+        if self.is_markdown is not None:
+            return self.is_markdown
         return markdown_service.is_markdown(self.content)
     
     def to_dict(self, include_content=True, include_html=False):
@@ -238,10 +265,21 @@ class Post(db.Model):
         if include_content:
             data['content'] = self.content
         if include_html:
+            # 以下字段均来自同一次渲染结果
             data['content_html'] = self.get_content_html()
             data['excerpt_html'] = self.get_excerpt_html()
             data['toc'] = self.get_toc()
+            data['word_count'] = self.get_word_count()
+            data['reading_time'] = self.get_reading_time()
         return data
     
     def __repr__(self):
         return f'<Post {self.title}>'
+
+
+@db.event.listens_for(Post, 'before_insert')
+@db.event.listens_for(Post, 'before_update')
+def _compute_post_is_markdown(mapper, connection, target):
+    """保存时在正文变化（或尚未计算）的情况下重新检测Markdown语法"""
+    if target.is_markdown is None or db.inspect(target).attrs.content.history.has_changes():
+        target.is_markdown = markdown_service.is_markdown(target.content)
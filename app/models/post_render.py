@@ -0,0 +1,59 @@
+"""
+文章渲染结果模型
+"""
+from app import db
+from app.models.stored_render import StoredRender, owner_foreign_key
+from app.services.markdown_service import markdown_service
+
+# 持久化的纯文本摘要长度，更长的摘要请求回退到实时渲染
+EXCERPT_CACHE_LENGTH = 500
+
+
+class PostRender(StoredRender, db.Model):
+    """文章渲染结果表，每篇文章保存其当前内容版本的渲染结果"""
+    __tablename__ = 'post_renders'
+
+    owner_key = 'post_id'
+    owner_label = '文章'
+    source_fields = ('content', 'excerpt')  # 正文与手写摘要
+
+    post_id = owner_foreign_key('posts.id')
+    toc_html = db.Column(db.Text, nullable=True)  # 目录HTML
+    excerpt_html = db.Column(db.Text, nullable=True)  # 手写摘要渲染结果
+    excerpt_text = db.Column(db.Text, nullable=True)  # 正文纯文本前 EXCERPT_CACHE_LENGTH 个字符
+    word_count = db.Column(db.Integer, default=0)
+    reading_time = db.Column(db.Integer, default=0)  # 分钟
+
+    @staticmethod
+    def owner_model():
+        from app.models.post import Post
+        return Post
+
+    @classmethod
+    def render_fields(cls, post):
+        """渲染文章（单次转换）"""
+        document = markdown_service.render_document(post.content, sanitize=True)
+        return {
+            'content_html': document.html,
+            'toc_html': document.toc,
+            'excerpt_html': markdown_service.render(post.excerpt, sanitize=True) if post.excerpt else None,
+            'excerpt_text': markdown_service.html_to_text(document.html)[:EXCERPT_CACHE_LENGTH],
+            'word_count': document.word_count,
+            'reading_time': document.reading_time
+        }
+
+
+def _refresh_post_render(post=None, **kwargs):
+    """文章保存/更新后重新渲染"""
+    if post is None or post.id is None or not PostRender.table_ready():
+        return
+    post._render_cache = PostRender.store(post)
+
+
+def register_render_hooks(plugin_manager):
+    """注册文章渲染结果的维护钩子（重复调用不会重复注册）"""
+    for hook_name in ('after_post_save', 'after_post_update'):
+        registered = plugin_manager.hooks.get(hook_name, [])
+        if any(hook['callback'] is _refresh_post_render for hook in registered):
+            continue
+        plugin_manager.register_hook(hook_name, _refresh_post_render, priority=5)
@@ -0,0 +1,232 @@
+"""
+持久化渲染结果的公共部分
+"""
+from datetime import datetime
+import hashlib
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.services.markdown_service import markdown_service
+
+
+def owner_foreign_key(target):
+    """指向所属内容的外键列：每条内容只有一行渲染结果，删除内容时级联删除"""
+    return db.Column(db.Integer, db.ForeignKey(target, ondelete='CASCADE'), unique=True, nullable=False, index=True)
+
+
+class StoredRender:
+    """
+    渲染结果表的公共列与读写逻辑（文章 PostRender、评论 CommentRender）
+
+    子类需声明：
+        owner_key: 指向所属内容的外键列名（用 owner_foreign_key() 定义）
+        owner_label: 日志中所属内容的名称
+        source_fields: 参与内容哈希的源字段
+        owner_model(): 返回所属内容的模型（补写时遍历）
+        render_fields(owner): 返回除键、哈希与签名之外的渲染字段
+    """
+
+    owner_key = None
+    owner_label = None
+    source_fields = ('content',)
+    # 表不存在时提示执行的命令
+    create_table_command = 'run.py init'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # 源字段的哈希
+    renderer_signature = db.Column(db.String(64), nullable=False)  # Markdown 配置签名（含清理规则）
+    content_html = db.Column(db.Text, nullable=False)  # 清理后的正文HTML
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # 每个进程只检查一次表是否存在（按子类分别记录）
+    _table_ready = None
+
+    @classmethod
+    def table_ready(cls):
+        """渲染结果表是否可用"""
+        if cls._table_ready is None:
+            try:
+                cls._table_ready = db.inspect(db.engine).has_table(cls.__tablename__)
+            except Exception:
+                cls._table_ready = False
+            if not cls._table_ready:
+                current_app.logger.warning(
+                    f'{cls.__tablename__} 表不存在，{cls.owner_label}将实时渲染，请执行 {cls.create_table_command} 创建'
+                )
+        return cls._table_ready
+
+    @classmethod
+    def compute_hash(cls, owner):
+        """计算源字段的内容哈希"""
+        payload = '\x00'.join(getattr(owner, field) or '' for field in cls.source_fields)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def source_modified(cls, owner):
+        """源字段是否在当前会话中被修改而尚未提交（例如提交前预览正在编辑的内容）"""
+        state = db.inspect(owner, raiseerr=False)
+        if state is None:
+            return False
+        return any(state.attrs[field].history.has_changes() for field in cls.source_fields)
+
+    def is_fresh_for(self, owner, content_hash=None):
+        """判断渲染结果是否对应所属内容的当前版本与当前渲染配置"""
+        return (
+            self.content_hash == (content_hash or self.compute_hash(owner))
+            and self.renderer_signature == markdown_service.config_signature
+        )
+
+    @staticmethod
+    def owner_model():
+        raise NotImplementedError
+
+    @classmethod
+    def render_fields(cls, owner):
+        raise NotImplementedError
+
+    @classmethod
+    def build_values(cls, owner):
+        """渲染所属内容，返回可写入渲染结果表的字段"""
+        values = {
+            cls.owner_key: owner.id,
+            'content_hash': cls.compute_hash(owner),
+            'renderer_signature': markdown_service.config_signature
+        }
+        values.update(cls.render_fields(owner))
+        return values
+
+    @classmethod
+    def render_transient(cls, owner):
+        """只渲染不写入，结果缓存在所属内容的实例上（用于未保存或仅本次展示的内容）"""
+        row = cls(**cls.build_values(owner))
+        owner._render_cache = row
+        return row
+
+    @classmethod
+    def store(cls, owner):
+        """
+        重新渲染并写入渲染结果
+
+        使用独立连接写入，不会刷新当前会话中尚未提交的修改；
+        调用方需保证所属内容是已提交的版本（for_owner 不会写入未提交的改动）。
+
+        Returns:
+            StoredRender: 未绑定会话的渲染结果
+        """
+        values = cls.build_values(owner)
+        now = datetime.utcnow()
+        table = cls.__table__
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    table.update()
+                    .where(table.c[cls.owner_key] == owner.id)
+                    .values(updated_at=now, **values)
+                ).rowcount
+                if not updated:
+                    conn.execute(table.insert().values(created_at=now, updated_at=now, **values))
+        except IntegrityError:
+            # 并发请求已写入同一条内容，忽略即可
+            pass
+        except Exception as exc:
+            current_app.logger.warning(f"写入{cls.owner_label} {owner.id} 渲染结果失败: {exc}")
+        return cls(**values)
+
+    @classmethod
+    def for_owner(cls, owner):
+        """
+        获取所属内容当前版本的渲染结果，缺失或过期时重新渲染并写入
+
+        结果缓存在所属内容的实例上，同一请求内多次调用只查询一次；
+        已批量预取过的实例不再单独查询；尚未保存、源字段有未提交的修改或表不可用时只渲染不写入，
+        渲染结果表只保存已提交内容的渲染。
+
+        Returns:
+            StoredRender: 渲染结果
+        """
+        content_hash = cls.compute_hash(owner)
+        cached = getattr(owner, '_render_cache', None)
+        if cached is not None and cached.is_fresh_for(owner, content_hash):
+            return cached
+
+        if owner.id is None or cls.source_modified(owner) or not cls.table_ready():
+            return cls.render_transient(owner)
+
+        row = cached
+        if row is None and not getattr(owner, '_render_prefetched', False):
+            try:
+                row = cls.query.filter_by(**{cls.owner_key: owner.id}).first()
+            except Exception as exc:
+                current_app.logger.warning(f"读取{cls.owner_label} {owner.id} 渲染结果失败: {exc}")
+
+        if row is None or not row.is_fresh_for(owner, content_hash):
+            row = cls.store(owner)
+
+        owner._render_cache = row
+        return row
+
+    @classmethod
+    def prefetch(cls, owners):
+        """
+        一次查询加载多条内容的渲染结果，避免逐条查询
+
+        Args:
+            owners (list): 所属内容列表
+        """
+        pending = [o for o in owners if o.id is not None and getattr(o, '_render_cache', None) is None]
+        if not pending or not cls.table_ready():
+            return
+        owner_column = getattr(cls, cls.owner_key)
+        try:
+            rows = cls.query.filter(owner_column.in_([o.id for o in pending])).all()
+        except Exception as exc:
+            current_app.logger.warning(f"批量读取{cls.owner_label}渲染结果失败: {exc}")
+            return
+        by_owner = {getattr(row, cls.owner_key): row for row in rows}
+        for owner in pending:
+            owner._render_cache = by_owner.get(owner.id)
+            owner._render_prefetched = True
+
+    @classmethod
+    def backfill(cls, force=False, batch_size=200, progress=None):
+        """
+        为缺失或过期的内容补写渲染结果
+
+        Args:
+            force (bool): 是否忽略已有结果全部重新渲染
+            batch_size (int): 每批读取的内容数量
+            progress (callable): 每批完成后以 (已检查, 已渲染) 调用
+
+        Returns:
+            tuple: (检查数量, 重新渲染数量)
+        """
+        model = cls.owner_model()
+        owner_column = getattr(cls, cls.owner_key)
+
+        existing = {}
+        if not force:
+            existing = {
+                owner_id: (content_hash, signature)
+                for owner_id, content_hash, signature
+                in db.session.query(owner_column, cls.content_hash, cls.renderer_signature)
+            }
+
+        checked = rendered = 0
+        last_id = 0
+        while True:
+            items = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not items:
+                break
+            for item in items:
+                checked += 1
+                if existing.get(item.id) != (cls.compute_hash(item), markdown_service.config_signature):
+                    cls.store(item)
+                    rendered += 1
+            last_id = items[-1].id
+            if progress:
+                progress(checked, rendered)
+        return checked, rendered
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.owner_key}={getattr(self, self.owner_key)}>'
@@ -0,0 +1,362 @@
+"""
+主题静态资源清单服务
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, has_request_context, request, url_for
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file, send_from_directory
+
+from app.utils import path_utils
+
+# 带内容指纹的资源URL内容永远不变，浏览器与CDN可以缓存一年且无需重新验证
+ASSET_MAX_AGE = 31536000
+ASSET_CACHE_CONTROL = f'public, max-age={ASSET_MAX_AGE}, immutable'
+# 文件名中内容指纹（SHA-256 十六进制前缀）的长度，例如 css/style.3f2a9c1b7e.css
+ASSET_HASH_LENGTH = 10
+# 资源路径中的主题前缀分隔符，例如 "default:css/style.css" 从 default 主题开始查找
+ASSET_THEME_SEPARATOR = ':'
+
+# 只返回静态文件的端点：跳过插件/主题状态同步以及 before_request/after_request 插件钩子
+ASSET_ENDPOINTS = frozenset({'static', 'theme_static', 'plugin_static', 'uploaded_file'})
+
+_FINGERPRINT_PATTERN = re.compile(
+    r'^(?P<stem>.+)\.[0-9a-f]{%d}(?P<ext>\.[^.]+)$' % ASSET_HASH_LENGTH
+)
+
+
+def fingerprint_path(path, digest):
+    """在扩展名前插入内容指纹：css/style.css → css/style.<digest>.css"""
+    stem, ext = posixpath.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+def strip_fingerprint(path):
+    """
+    去掉路径中的内容指纹
+
+    Returns:
+        str: 原始路径；路径不带指纹时返回 None
+    """
+    directory, filename = posixpath.split(path)
+    match = _FINGERPRINT_PATTERN.match(filename)
+    if not match:
+        return None
+    return posixpath.join(directory, match.group('stem') + match.group('ext'))
+
+
+def is_asset_request():
+    """当前请求是否由静态文件端点处理"""
+    return has_request_context() and request.endpoint in ASSET_ENDPOINTS
+
+
+def minify_asset(path, data):
+    """
+    压缩 CSS/JS 内容，使用可选依赖 rcssmin / rjsmin
+
+    未安装对应的库、文件不是 UTF-8 或不是 CSS/JS 时原样返回
+    """
+    ext = posixpath.splitext(path)[1].lower()
+    try:
+        if ext == '.css':
+            import rcssmin
+            return rcssmin.cssmin(data.decode('utf-8')).encode('utf-8')
+        if ext == '.js':
+            import rjsmin
+            return rjsmin.jsmin(data.decode('utf-8')).encode('utf-8')
+    except (ImportError, UnicodeDecodeError):
+        pass
+    return data
+
+
+class ThemeAsset:
+    """
+    清单中的一个资源
+
+    普通文件直接从磁盘发送；压缩后的文件和合并文件的内容保存在内存中
+    """
+
+    __slots__ = ('theme_name', 'path', 'url_path', 'digest', 'sources', 'mtimes', 'data', 'mimetype')
+
+    def __init__(self, theme_name, path, sources, content, data=None):
+        self.theme_name = theme_name
+        self.path = path
+        self.digest = hashlib.sha256(content).hexdigest()[:ASSET_HASH_LENGTH]
+        self.url_path = fingerprint_path(path, self.digest)
+        self.sources = sources
+        self.mtimes = [_mtime(source) for source in sources]
+        self.data = data
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def is_stale(self):
+        """来源文件是否在构建清单后被修改或删除"""
+        return [_mtime(source) for source in self.sources] != self.mtimes
+
+    def make_response(self, environ, immutable=True):
+        """
+        返回资源响应（只依赖 WSGI environ，快速通道中同样可用）
+
+        Args:
+            immutable: 是否设置永久缓存头；请求的指纹已过期时为 False，只按 ETag 重新验证
+        """
+        if self.data is None:
+            response = send_file(self.sources[0], environ, mimetype=self.mimetype, etag=self.digest,
+                                 max_age=ASSET_MAX_AGE if immutable else None, conditional=True,
+                                 response_class=current_app.response_class)
+        else:
+            response = current_app.response_class(self.data, mimetype=self.mimetype)
+            response.set_etag(self.digest)
+            response.make_conditional(environ)
+        if immutable:
+            response.headers['Cache-Control'] = ASSET_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read(path):
+    with open(path, 'rb') as asset_file:
+        return asset_file.read()
+
+
+class AssetManifest:
+    """
+    主题继承链的静态资源清单
+
+    主题激活（创建 Jinja 环境）时扫描继承链上每个主题的 static 目录，计算内容指纹，
+    并按 theme.json 的 asset_bundles 合并文件。资源路径与模板一样按继承链查找，
+    当前主题的文件覆盖父主题的同名文件。
+    """
+
+    def __init__(self, chain, minify=False, auto_reload=False):
+        """
+        Args:
+            chain (list): [(主题名, static 目录, {合并文件路径: [成员路径]})]，当前主题在前
+            minify (bool): 是否压缩 CSS/JS
+            auto_reload (bool): 文件修改后是否重新构建清单（开发模式）
+        """
+        self.chain = chain
+        self.minify = minify
+        self.auto_reload = auto_reload
+        self._positions = {name: index for index, (name, _, _) in enumerate(chain)}
+        self._assets = {}
+        self._by_url = {}
+        self.build()
+
+    def build(self):
+        """扫描继承链并重新计算全部资源的指纹"""
+        assets = {}
+        for theme_name, static_dir, _ in self.chain:
+            for path in self._list_files(static_dir):
+                source = os.path.join(static_dir, *path.split('/'))
+                try:
+                    content = _read(source)
+                except OSError:
+                    continue
+                data = None
+                if self.minify:
+                    minified = minify_asset(path, content)
+                    if minified != content:
+                        content = data = minified
+                assets[(theme_name, path)] = ThemeAsset(theme_name, path, [source], content, data)
+
+        # 合并文件的成员从声明它的主题开始按继承链查找
+        for theme_name, static_dir, bundles in reversed(self.chain):
+            for bundle_path, members in bundles.items():
+                sources = []
+                for member in members:
+                    asset = self._find(assets, member, self._positions[theme_name])
+                    if asset is not None:
+                        sources.extend(asset.sources)
+                if not sources:
+                    continue
+                content = b'\n'.join(_read(source) for source in sources)
+                if self.minify:
+                    content = minify_asset(bundle_path, content)
+                assets[(theme_name, bundle_path)] = ThemeAsset(theme_name, bundle_path, sources, content, content)
+
+        self._assets = assets
+        self._by_url = {(asset.theme_name, asset.url_path): asset for asset in assets.values()}
+
+    @staticmethod
+    def _list_files(static_dir):
+        """列出 static 目录下的全部文件（相对路径，使用 / 分隔），忽略隐藏文件"""
+        if not os.path.isdir(static_dir):
+            return []
+        paths = []
+        for root, dirs, files in os.walk(static_dir):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            relative = os.path.relpath(root, static_dir)
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                path = name if relative == os.curdir else os.path.join(relative, name)
+                paths.append(path.replace(os.sep, '/'))
+        return sorted(paths)
+
+    def _split(self, path):
+        """拆分资源路径，返回 (查找起点, 不含前缀的路径)"""
+        owner, separator, name = path.partition(ASSET_THEME_SEPARATOR)
+        if separator and owner in self._positions:
+            return self._positions[owner], name
+        return 0, path
+
+    def _find(self, assets, path, start=0):
+        for theme_name, _, _ in self.chain[start:]:
+            asset = assets.get((theme_name, path))
+            if asset is not None:
+                return asset
+        return None
+
+    def resolve(self, path):
+        """
+        按继承链查找资源
+
+        Args:
+            path (str): 相对 static 目录的路径，可以带 ``主题名:`` 前缀
+
+        Returns:
+            ThemeAsset: 资源；不存在时返回 None
+        """
+        start, name = self._split(path)
+        asset = self._find(self._assets, name, start)
+        if self.auto_reload and (asset is None or asset.is_stale()):
+            self.build()
+            asset = self._find(self._assets, name, start)
+        return asset
+
+    def url(self, path):
+        """
+        模板中的 asset_url()：返回带内容指纹的资源URL
+
+        资源不存在时返回查找起点主题下的普通静态文件URL
+        """
+        asset = self.resolve(path)
+        if asset is not None:
+            return url_for('theme_static', theme_name=asset.theme_name, filename=asset.url_path)
+        start, name = self._split(path)
+        theme_name = self.chain[start][0] if self.chain else 'default'
+        return url_for('theme_static', theme_name=theme_name, filename=name)
+
+    def lookup(self, theme_name, filename):
+        """
+        按URL路径查找资源的当前版本，供静态文件路由使用
+
+        来源文件在构建清单后被修改时重新构建清单；URL中的指纹已过期（来自旧页面或刚被修改）时
+        按去掉指纹的路径返回当前版本，合并文件只存在于内存中，不能回退到磁盘文件
+
+        Returns:
+            ThemeAsset: 资源，asset.url_path 与 filename 不同说明请求的指纹已过期；
+                        不是清单中的资源时返回 None
+        """
+        asset = self._by_url.get((theme_name, filename))
+        if asset is None:
+            asset = self._assets.get((theme_name, strip_fingerprint(filename) or filename))
+        if asset is not None and asset.is_stale():
+            self.build()
+            asset = self._assets.get((theme_name, asset.path))
+        return asset
+
+
+def send_static_file(directory, filename, environ):
+    """
+    与 flask.send_from_directory 相同，但只依赖 WSGI environ 与应用上下文
+
+    Raises:
+        NotFound: 文件不存在或路径越出目录
+    """
+    return send_from_directory(
+        directory, filename, environ,
+        max_age=current_app.get_send_file_max_age,
+        use_x_sendfile=current_app.config['USE_X_SENDFILE'],
+        response_class=current_app.response_class,
+        _root_path=current_app.root_path
+    )
+
+
+def send_theme_static(theme_name, filename, environ):
+    """
+    返回主题静态文件
+
+    asset_url() 生成的带内容指纹的路径返回永久缓存头；指纹已过期（文件在主题激活后被更新，
+    或来自旧页面）时返回当前内容（包括内存中的合并文件），不设置永久缓存
+
+    Raises:
+        NotFound: 文件不存在
+    """
+    from app.services.theme_manager import theme_manager
+
+    asset = theme_manager.find_asset(theme_name, filename)
+    if asset is not None:
+        return asset.make_response(environ, immutable=asset.url_path == filename)
+
+    static_dir = safe_join(path_utils.project_path('themes'), theme_name, 'static')
+    if static_dir is None:
+        raise NotFound()
+    original = strip_fingerprint(filename)
+    if original and not os.path.isfile(os.path.join(static_dir, filename)):
+        filename = original
+    return send_static_file(static_dir, filename, environ)
+
+
+class StaticFilesMiddleware:
+    """
+    在 Flask 分发请求之前直接返回静态文件（STATIC_WSGI_FAST_PATH）
+
+    处理 /themes/<主题>/static/、/static/plugins/<插件>/、/uploads/ 以及应用 static 目录下的 GET/HEAD 请求：
+    不创建请求上下文，不执行 before_request/after_request（包括 CORS 头与插件钩子）。
+    文件不存在时交给 Flask 处理，仍然显示正常的 404 页面。
+    """
+
+    def __init__(self, wsgi_app, app):
+        self.wsgi_app = wsgi_app
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            response = self.serve(environ)
+            if response is not None:
+                return response(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+    def serve(self, environ):
+        """
+        匹配静态文件路径并生成响应
+
+        Returns:
+            Response: 静态文件响应；不是静态文件路径或文件不存在时返回 None
+        """
+        parts = environ.get('PATH_INFO', '').lstrip('/').split('/')
+        with self.app.app_context():
+            try:
+                if len(parts) > 3 and parts[0] == 'themes' and parts[2] == 'static':
+                    return send_theme_static(parts[1], '/'.join(parts[3:]), environ)
+                if len(parts) > 3 and parts[0] == 'static' and parts[1] == 'plugins':
+                    static_dir = safe_join(path_utils.project_path('plugins'), parts[2], 'static')
+                    return self._send(static_dir, parts[3:], environ)
+                if len(parts) > 1 and parts[0] == 'uploads':
+                    upload_dir = self.app.config.get('UPLOAD_FOLDER', os.path.join(self.app.instance_path, 'uploads'))
+                    return self._send(upload_dir, parts[1:], environ)
+                if len(parts) > 1 and parts[0] == 'static' and self.app.has_static_folder:
+                    return self._send(self.app.static_folder, parts[1:], environ)
+            except NotFound:
+                return None
+        return None
+
+    @staticmethod
+    def _send(directory, parts, environ):
+        if directory is None:
+            raise NotFound()
+        return send_static_file(directory, '/'.join(parts), environ)
@@ -578,6 +578,13 @@ def _refresh_runtime_state() -> None:
         except Exception as exc:
             current_app.logger.warning('插件状态刷新失败: %s', exc)
 
+    # Restored comments may reuse ids and timestamps of the replaced ones.
+    from app.models.comment_render import comment_html_cache
+    comment_html_cache.clear()
+
+    from app.services.sidebar_service import sidebar_service
+    sidebar_service.invalidate()
+
     theme_mgr = getattr(current_app, 'theme_manager', None)
     if theme_mgr and hasattr(theme_mgr, 'reload_from_database'):
         try:
@@ -585,6 +592,14 @@ def _refresh_runtime_state() -> None:
         except Exception as exc:
             current_app.logger.warning('主题状态刷新失败: %s', exc)
 
+    # Other workers reload their plugin/theme state on their next check.
+    from app.services.runtime_state import runtime_state
+    try:
+        runtime_state.bump()
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.warning('运行时状态版本更新失败: %s', exc)
+
 
 def _add_extensions_to_zip(zipf: zipfile.ZipFile) -> None:
     """Add plugins and themes to the zip archive."""
@@ -0,0 +1,150 @@
+"""
+插件钩子耗时统计
+"""
+import os
+import random
+import threading
+from datetime import datetime
+
+# 按比例抽样统计钩子分发耗时（0 ~ 1），0 表示关闭；例如 0.1 表示每 10 次分发统计 1 次
+try:
+    HOOK_PROFILE_SAMPLE_RATE = min(max(float(os.getenv('HOOK_PROFILE_SAMPLE_RATE', 0)), 0.0), 1.0)
+except (TypeError, ValueError):
+    HOOK_PROFILE_SAMPLE_RATE = 0.0
+# 每个（钩子, 插件）保留最近多少个耗时样本用于计算 p95
+HOOK_PROFILE_RESERVOIR = 256
+
+
+class HookTiming:
+    """
+    一个（钩子类型, 钩子名, 插件）的耗时统计
+
+    calls/total 是实际抽样的次数与耗时；estimated_* 按抽样比例折算为全部分发，
+    抽样比例在运行中修改时折算结果仍然正确
+    """
+
+    __slots__ = ('calls', 'errors', 'total', 'max', 'estimated_calls', 'estimated_total', 'samples', '_next')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.estimated_calls = 0.0
+        self.estimated_total = 0.0
+        self.samples = []
+        self._next = 0
+
+    def add(self, duration, weight):
+        self.calls += 1
+        self.total += duration
+        self.estimated_calls += weight
+        self.estimated_total += duration * weight
+        if duration > self.max:
+            self.max = duration
+        # 环形缓冲区保存最近的样本
+        if len(self.samples) < HOOK_PROFILE_RESERVOIR:
+            self.samples.append(duration)
+        else:
+            self.samples[self._next] = duration
+            self._next = (self._next + 1) % HOOK_PROFILE_RESERVOIR
+
+    def percentile(self, fraction):
+        """最近样本的百分位耗时（秒）"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class HookProfiler:
+    """
+    进程内的插件钩子耗时聚合器
+
+    PluginManager 每次分发钩子时调用 sample() 决定是否计时，只有抽中的分发才为每个回调
+    调用两次 perf_counter 并 record()；未抽中时只多一次比较。回调抛出的异常始终计数。
+    统计只在当前 worker 内有效，重启后清空。
+    """
+
+    def __init__(self, sample_rate=HOOK_PROFILE_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.started_at = datetime.utcnow()
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """本次分发是否计时"""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _timing(self, key):
+        timing = self._timings.get(key)
+        if timing is None:
+            timing = self._timings.setdefault(key, HookTiming())
+        return timing
+
+    def record(self, hook_type, hook_name, plugin_name, duration):
+        """记录一次抽样的回调耗时（秒）"""
+        weight = 1.0 / self.sample_rate if self.sample_rate > 0 else 1.0
+        with self._lock:
+            self._timing((hook_type, hook_name, plugin_name)).add(duration, weight)
+
+    def record_error(self, hook_type, hook_name, plugin_name):
+        """记录一次回调异常（无论是否抽样）"""
+        with self._lock:
+            self._timing((hook_type, hook_name, plugin_name)).errors += 1
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._timings = {}
+            self.started_at = datetime.utcnow()
+
+    def report(self):
+        """
+        慢插件报告
+
+        Returns:
+            dict: sample_rate、started_at、hooks（按折算总耗时降序的每个钩子回调统计）
+                  与 plugins（按插件汇总的折算总耗时与异常数）
+        """
+        with self._lock:
+            items = [
+                (key, timing.calls, timing.errors, timing.total, timing.max, timing.estimated_calls,
+                 timing.estimated_total, timing.percentile(0.95))
+                for key, timing in self._timings.items()
+            ]
+
+        hooks = []
+        plugins = {}
+        for (hook_type, hook_name, plugin_name), calls, errors, total, maximum, est_calls, est_total, p95 in items:
+            hooks.append({
+                'hook_type': hook_type,
+                'hook_name': hook_name,
+                'plugin_name': plugin_name,
+                'calls': calls,
+                'estimated_calls': round(est_calls),
+                'errors': errors,
+                'total_ms': round(total * 1000, 3),
+                'estimated_total_ms': round(est_total * 1000, 3),
+                'avg_ms': round(total * 1000 / calls, 3) if calls else 0.0,
+                'p95_ms': round(p95 * 1000, 3),
+                'max_ms': round(maximum * 1000, 3)
+            })
+            summary = plugins.setdefault(plugin_name, {'plugin_name': plugin_name, 'hooks': 0, 'errors': 0,
+                                                       'estimated_total_ms': 0.0})
+            summary['hooks'] += 1
+            summary['errors'] += errors
+            summary['estimated_total_ms'] = round(summary['estimated_total_ms'] + est_total * 1000, 3)
+
+        hooks.sort(key=lambda item: (item['estimated_total_ms'], item['errors']), reverse=True)
+        return {
+            'sample_rate': self.sample_rate,
+            'started_at': self.started_at.isoformat(),
+            'hooks': hooks,
+            'plugins': sorted(plugins.values(), key=lambda item: (item['estimated_total_ms'], item['errors']),
+                              reverse=True)
+        }
+
+
+# 全局钩子耗时统计实例
+hook_profiler = HookProfiler()
@@ -2,15 +2,379 @@
 Markdown处理服务
 """
 import markdown
-from markdown.extensions import codehilite, tables, toc, fenced_code
+from markdown.extensions import Extension, codehilite, tables, toc, fenced_code
+from markdown.postprocessors import Postprocessor
+from markdown.treeprocessors import Treeprocessor
 from bleach import clean
 from bleach.sanitizer import ALLOWED_TAGS, ALLOWED_ATTRIBUTES
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import LifoQueue, Empty, Full
+import hashlib
+import html as html_lib
+import json
+import math
+import os
 import re
+import secrets
+import threading
+import types
+
+# 渲染管线版本号，修改渲染逻辑（而非扩展配置）时递增，使已缓存的渲染结果失效
+RENDER_PIPELINE_VERSION = 1
+
+# 渲染器池保留的空闲 Markdown 实例数量上限，超出的实例用完即丢弃
+RENDERER_POOL_SIZE = 8
+
+# 代码高亮缓存条目上限，可通过环境变量 MARKDOWN_HIGHLIGHT_CACHE_SIZE 调整，0 表示关闭
+try:
+    HIGHLIGHT_CACHE_SIZE = int(os.getenv('MARKDOWN_HIGHLIGHT_CACHE_SIZE', 512))
+except (TypeError, ValueError):
+    HIGHLIGHT_CACHE_SIZE = 512
+
+# 按块增量渲染：不少于该字符数的文档拆分为顶层块，逐块缓存渲染结果，0 表示关闭
+try:
+    BLOCK_RENDER_MIN_LENGTH = int(os.getenv('MARKDOWN_BLOCK_RENDER_MIN_LENGTH', 8000))
+except (TypeError, ValueError):
+    BLOCK_RENDER_MIN_LENGTH = 8000
+
+# 块渲染缓存条目上限
+try:
+    BLOCK_CACHE_SIZE = int(os.getenv('MARKDOWN_BLOCK_CACHE_SIZE', 4096))
+except (TypeError, ValueError):
+    BLOCK_CACHE_SIZE = 4096
+
+# 写入时清理：持久化的渲染结果在写入前已清理，读取时直接信任而不再调用 bleach；
+# 设置 MARKDOWN_SANITIZE_ON_WRITE=0 可在读取时对已存储的HTML再次清理
+SANITIZE_ON_WRITE = os.getenv('MARKDOWN_SANITIZE_ON_WRITE', '1').lower() not in ('0', 'false', 'no')
+
+# Markdown 语法检测只扫描文本开头的字符数，长文的语法几乎总会出现在开头部分
+MARKDOWN_DETECT_SCAN_LENGTH = 10000
+
+# 中文阅读速度（字/分钟），英文单词同样按一个计数
+READING_WORDS_PER_MINUTE = 300
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+_CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+_WORD_RE = re.compile(r"[A-Za-z0-9]+(?:['\u2019-][A-Za-z0-9]+)*")
+_FENCE_RE = re.compile(r'^(`{3,}|~{3,})')
+# 常见Markdown语法合并为一个预编译的表达式，各分支都限制在单行内匹配
+_MARKDOWN_SYNTAX_RE = re.compile(
+    r'^[ \t]{0,3}#{1,6}[ \t]'  # 标题
+    r'|\*\*[^\n]+?\*\*'  # 粗体
+    r'|\*[^\n]+?\*'  # 斜体
+    r'|^[ \t]{0,3}(?:```|~~~)'  # 代码块
+    r'|`[^`\n]+`'  # 行内代码
+    r'|!?\[[^\]\n]*\]\([^)\n]*\)'  # 链接与图片
+    r'|^[ \t]*(?:[-*+]|\d+\.)[ \t]+'  # 列表
+    r'|^[ \t]*>[ \t]'  # 引用
+    r'|\|[^\n]*\|',  # 表格
+    re.MULTILINE
+)
+# 空行之后以缩进、列表标记或引用开头的行仍属于上一个块
+_BLOCK_CONTINUATION_RE = re.compile(r'^(?:[ \t]|[*+-][ \t]|\d+[.)][ \t]|>)')
+# 跨块生效的语法：脚注、引用式链接定义、[TOC] 标记、原始HTML块、定义列表，出现时整篇渲染
+_DOCUMENT_SCOPE_RE = re.compile(r'\[\^|^ {0,3}\[[^\]\n]+\]:|^\[TOC\][ \t]*$|^ {0,3}<|^ {0,3}:[ \t]', re.MULTILINE)
+
+class RenderCache:
+    """渲染结果（代码块高亮、Markdown 块）的线程安全 LRU 缓存"""
+    
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """获取缓存内容，未命中返回 None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        """删除指定条目（不存在时忽略）"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def resize(self, maxsize):
+        """调整缓存容量"""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存与计数"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+highlight_cache = RenderCache(HIGHLIGHT_CACHE_SIZE)
+
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """
+    带缓存的 CodeHilite
+    
+    以（语言, 高亮选项, sha1(代码)）为键缓存 Pygments 输出，
+    相同代码块再次渲染时不再经过词法分析与语言猜测。
+    """
+    
+    def _cache_key(self, shebang):
+        formatter = self.pygments_formatter
+        if not isinstance(formatter, str):
+            formatter = f"{getattr(formatter, '__module__', '')}.{getattr(formatter, '__qualname__', repr(formatter))}"
+        options = repr(sorted((key, repr(value)) for key, value in self.options.items()))
+        digest = hashlib.sha1(self.src.encode('utf-8')).hexdigest()
+        return (self.lang, shebang, self.guess_lang, self.lang_prefix, formatter, options, digest)
+    
+    def hilite(self, shebang=True):
+        if not self.use_pygments or highlight_cache.maxsize <= 0:
+            return super().hilite(shebang)
+        
+        key = self._cache_key(shebang)
+        html = highlight_cache.get(key)
+        if html is None:
+            html = super().hilite(shebang)
+            highlight_cache.set(key, html)
+        return html
+
+
+def _bind_code_hilite(processor):
+    """
+    让单个处理器实例使用 CachedCodeHilite
+    
+    codehilite 与 fenced_code 的 run() 通过模块全局名 CodeHilite 创建高亮器，
+    这里为该实例绑定一个全局名替换后的 run() 副本，扩展模块本身不被修改，
+    其他 Markdown 实例仍使用原始的 CodeHilite。
+    """
+    run = type(processor).run
+    namespace = dict(run.__globals__, CodeHilite=CachedCodeHilite)
+    cached_run = types.FunctionType(run.__code__, namespace, run.__name__, run.__defaults__, run.__closure__)
+    processor.run = types.MethodType(cached_run, processor)
+
+
+class HighlightCacheExtension(Extension):
+    """
+    代码高亮缓存扩展
+    
+    只作用于注册了它的 Markdown 实例，需排在 codehilite 与 fenced_code 之后加载。
+    """
+    
+    def extendMarkdown(self, md):
+        if 'hilite' in md.treeprocessors:
+            _bind_code_hilite(md.treeprocessors['hilite'])
+        if 'fenced_code_block' in md.preprocessors:
+            _bind_code_hilite(md.preprocessors['fenced_code_block'])
+
+
+class RenderedDocument:
+    """一次Markdown转换得到的全部结果"""
+    
+    def __init__(self, html='', toc='', headings=None, plain_text='', excerpt='', word_count=0):
+        self.html = html  # 正文HTML
+        self.toc = toc  # 目录HTML
+        self.headings = headings or []  # 扁平化的标题列表 [{'level', 'id', 'name'}]
+        self.plain_text = plain_text  # 去除标签并解码实体后的纯文本（未转义，不可直接输出到HTML）
+        self.excerpt = excerpt  # 截取后的摘要（保留HTML实体，可直接输出）
+        self.word_count = word_count
+    
+    @property
+    def reading_time(self):
+        """预计阅读时间（分钟）"""
+        return estimate_reading_time(self.word_count)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'html': self.html,
+            'toc': self.toc,
+            'headings': self.headings,
+            'excerpt': self.excerpt,
+            'word_count': self.word_count,
+            'reading_time': self.reading_time
+        }
+    
+    def __repr__(self):
+        return f'<RenderedDocument words={self.word_count} headings={len(self.headings)}>'
+
+
+def estimate_reading_time(word_count):
+    """
+    估算阅读时间
+    
+    Args:
+        word_count (int): 字数
+        
+    Returns:
+        int: 阅读时间（分钟），有内容时至少为1
+    """
+    if not word_count:
+        return 0
+    return max(1, math.ceil(word_count / READING_WORDS_PER_MINUTE))
+
+
+def iter_blocks(text):
+    """
+    按文档顺序逐个产出可独立渲染的顶层块（惰性拆分）
+    
+    空行之后的缩进行、列表项和引用仍归入上一个块，
+    围栏代码块与块级公式内部不会拆分。
+    
+    Args:
+        text (str): Markdown文本
+        
+    Yields:
+        str: 块文本
+    """
+    current = []
+    fence = None
+    after_blank = False
+    in_dollar_math = False
+    math_depth = 0
+    
+    for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        if fence:
+            current.append(line)
+            if line.rstrip() == fence:
+                fence = None
+            continue
+        
+        if not line.strip():
+            after_blank = True
+            current.append(line)
+            continue
+        
+        if (after_blank and current and not in_dollar_math and math_depth <= 0
+                and not _BLOCK_CONTINUATION_RE.match(line)):
+            block = '\n'.join(current)
+            if block.strip():
+                yield block
+            current = []
+        after_blank = False
+        
+        match = _FENCE_RE.match(line)
+        if match:
+            fence = match.group(1)
+        if line.count('$$') % 2:
+            in_dollar_math = not in_dollar_math
+        math_depth += (line.count('\\begin{') - line.count('\\end{')
+                       + line.count('\\[') - line.count('\\]'))
+        current.append(line)
+    
+    block = '\n'.join(current)
+    if block.strip():
+        yield block
+
+
+def split_blocks(text):
+    """
+    将Markdown文档按空行拆分为可独立渲染的顶层块
+    
+    Args:
+        text (str): Markdown文本
+        
+    Returns:
+        list: 块文本列表
+    """
+    return list(iter_blocks(text))
+
+
+def _iter_toc_tokens(tokens):
+    """按文档顺序遍历嵌套的目录标记"""
+    for token in tokens or []:
+        yield token
+        yield from _iter_toc_tokens(token.get('children'))
+
+
+class _BlockHeadingTreeprocessor(Treeprocessor):
+    """
+    块渲染时为自动生成ID的标题写入占位ID
+    
+    标题ID需要在整篇文档范围内去重，块内无法确定，
+    因此记录每个标题的 slug 与块内已有的ID，拼接全文时再按文档顺序分配。
+    """
+    
+    def __init__(self, md, placeholder_prefix):
+        super().__init__(md)
+        self.placeholder_prefix = placeholder_prefix
+    
+    def run(self, root):
+        toc_processor = self.md.treeprocessors['toc']
+        slugs = []
+        used_ids = []
+        for el in root.iter():
+            if not isinstance(el.tag, str):
+                continue
+            if 'id' in el.attrib:
+                used_ids.append(el.attrib['id'])
+            elif toc_processor.header_rgx.match(el.tag):
+                inner_html = toc.render_inner_html(toc.remove_fnrefs(el), self.md)
+                name = toc.strip_tags(inner_html)
+                el.attrib['id'] = f'{self.placeholder_prefix}{len(slugs)}x'
+                slugs.append(toc_processor.slugify(html_lib.unescape(name), toc_processor.sep))
+        self.md.block_heading_slugs = slugs
+        self.md.block_used_ids = used_ids
+
+
+class _BlockOutputPostprocessor(Postprocessor):
+    """记录未去除首尾空白的输出，使拼接后块之间的空白与整篇渲染一致"""
+    
+    def run(self, text):
+        self.md.block_output = text
+        return text
+
+
+def _flatten_toc_tokens(tokens):
+    """将 toc 扩展生成的嵌套标题结构展开为列表"""
+    headings = []
+    for token in tokens or []:
+        headings.append({
+            'level': token.get('level'),
+            'id': token.get('id'),
+            'name': token.get('name')
+        })
+        headings.extend(_flatten_toc_tokens(token.get('children')))
+    return headings
+
 
 class MarkdownService:
     """Markdown处理服务类"""
     
-    def __init__(self):
+    def __init__(self, pool_size=RENDERER_POOL_SIZE):
+        self.sanitize_on_write = SANITIZE_ON_WRITE
+        
         # 配置允许的HTML标签和属性
         self.allowed_tags = list(ALLOWED_TAGS) + [
             'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
@@ -40,35 +404,229 @@ class MarkdownService:
             'h6': ['id']
         }
         
-        # 初始化Markdown处理器
-        self.md = markdown.Markdown(
-            extensions=[
-                'codehilite',
-                'fenced_code',
-                'tables',
-                'toc',
-                'nl2br',
-                'attr_list',
-                'def_list',
-                'footnotes',
-                'admonition',
-                'pymdownx.arithmatex'
-            ],
-            extension_configs={
-                'codehilite': {
-                    'css_class': 'highlight',
-                    'use_pygments': True
-                },
-                'toc': {
-                    'permalink': True,
-                    'permalink_class': 'headerlink'
-                },
-                'pymdownx.arithmatex': {
-                    'generic': True
-                }
+        self.extensions = [
+            'codehilite',
+            'fenced_code',
+            'tables',
+            'toc',
+            'nl2br',
+            'attr_list',
+            'def_list',
+            'footnotes',
+            'admonition',
+            'pymdownx.arithmatex'
+        ]
+        
+        self.extension_configs = {
+            'codehilite': {
+                'css_class': 'highlight',
+                'use_pygments': True
+            },
+            'toc': {
+                'permalink': True,
+                'permalink_class': 'headerlink'
+            },
+            'pymdownx.arithmatex': {
+                'generic': True
             }
+        }
+        
+        # Markdown 实例带有 TOC、脚注、公式等解析状态，不能在线程间共享，
+        # 每次渲染从池中借出独立实例，归还时重置
+        self._renderer_pool = LifoQueue(maxsize=pool_size)
+        self._block_renderer_pool = LifoQueue(maxsize=pool_size)
+        self._config_signature = None
+        
+        # 按块渲染的结果缓存；占位ID带随机前缀，避免与正文内容冲突
+        self.block_render_min_length = BLOCK_RENDER_MIN_LENGTH
+        self._block_cache = RenderCache(BLOCK_CACHE_SIZE)
+        self._heading_placeholder_prefix = f'nbh{secrets.token_hex(4)}n'
+        self._heading_placeholder_re = re.compile(re.escape(self._heading_placeholder_prefix) + r'(\d+)x')
+    
+    def create_renderer(self, block_mode=False):
+        """
+        创建一个新的Markdown处理器
+        
+        Args:
+            block_mode (bool): 是否用于按块渲染（标题写入占位ID并记录原始输出）
+            
+        Returns:
+            markdown.Markdown: Markdown处理器
+        """
+        md = markdown.Markdown(
+            extensions=self.extensions + [HighlightCacheExtension()],
+            extension_configs=self.extension_configs
+        )
+        if block_mode:
+            # 在 attr_list（8）之后、toc（5）之前运行
+            md.treeprocessors.register(
+                _BlockHeadingTreeprocessor(md, self._heading_placeholder_prefix), 'block_heading', 6
+            )
+            md.postprocessors.register(_BlockOutputPostprocessor(md), 'block_output', 0)
+        return md
+    
+    @contextmanager
+    def renderer(self, block_mode=False):
+        """
+        从池中借出一个Markdown处理器，退出上下文时重置并归还
+        
+        Args:
+            block_mode (bool): 是否借出按块渲染使用的处理器
+            
+        Yields:
+            markdown.Markdown: 当前线程独占的Markdown处理器
+        """
+        pool = self._block_renderer_pool if block_mode else self._renderer_pool
+        try:
+            md = pool.get_nowait()
+        except Empty:
+            md = self.create_renderer(block_mode)
+        try:
+            yield md
+        finally:
+            md.reset()
+            try:
+                pool.put_nowait(md)
+            except Full:
+                pass
+    
+    def use_block_render(self, text):
+        """
+        判断文档是否按块增量渲染
+        
+        只有足够长、且不含脚注、引用式链接定义、[TOC] 标记、原始HTML块和定义列表
+        这类跨块语法的文档才按块渲染，其余文档整篇渲染，两种方式输出一致。
+        
+        Args:
+            text (str): Markdown文本
+            
+        Returns:
+            bool: 是否按块渲染
+        """
+        return (
+            self.block_render_min_length > 0
+            and len(text) >= self.block_render_min_length
+            and _DOCUMENT_SCOPE_RE.search(text) is None
         )
     
+    def _convert(self, text, sanitize=True):
+        """
+        转换Markdown，长文档按块增量渲染
+        
+        Returns:
+            tuple: (HTML, 目录HTML, 嵌套的目录标记)
+        """
+        if self.use_block_render(text):
+            blocks = split_blocks(text)
+            if len(blocks) > 1:
+                return self._convert_blocks(blocks, sanitize)
+        
+        with self.renderer() as md:
+            html = md.convert(text)
+            toc_html = getattr(md, 'toc', '')
+            toc_tokens = getattr(md, 'toc_tokens', [])
+        if sanitize:
+            html = self.sanitize_html(html)
+        return html, toc_html, toc_tokens
+    
+    def _render_block(self, block):
+        """
+        渲染单个块，结果按块内容哈希缓存
+        
+        Returns:
+            dict: 原始输出、标题 slug、块内已有ID与目录标记（标题ID为占位符）
+        """
+        key = (self.config_signature, hashlib.sha1(block.encode('utf-8')).hexdigest())
+        entry = self._block_cache.get(key)
+        if entry is not None:
+            return entry
+        
+        with self.renderer(block_mode=True) as md:
+            md.convert(block)
+            entry = {
+                'output': md.block_output,
+                'sanitized': None,
+                'slugs': md.block_heading_slugs,
+                'used_ids': md.block_used_ids,
+                'toc_tokens': [
+                    {name: value for name, value in token.items() if name != 'children'}
+                    for token in _iter_toc_tokens(md.toc_tokens)
+                ]
+            }
+        self._block_cache.set(key, entry)
+        return entry
+    
+    def _convert_blocks(self, blocks, sanitize=True):
+        """
+        逐块渲染（只有未缓存的块才会转换）并拼接为整篇结果
+        
+        标题ID按文档顺序在全文范围内去重，目录由各块的标题重新生成，
+        与整篇渲染的结果一致。
+        
+        Returns:
+            tuple: (HTML, 目录HTML, 嵌套的目录标记)
+        """
+        entries = [self._render_block(block) for block in blocks]
+        
+        used_ids = set()
+        for entry in entries:
+            used_ids.update(entry['used_ids'])
+        
+        parts = []
+        flat_tokens = []
+        for entry in entries:
+            heading_ids = [toc.unique(slug, used_ids) for slug in entry['slugs']]
+            
+            def replace_placeholder(match, heading_ids=heading_ids):
+                return heading_ids[int(match.group(1))]
+            
+            output = entry['output']
+            if sanitize:
+                if entry['sanitized'] is None:
+                    entry['sanitized'] = self.sanitize_html(output)
+                output = entry['sanitized']
+            parts.append(self._heading_placeholder_re.sub(replace_placeholder, output))
+            
+            for token in entry['toc_tokens']:
+                token = dict(token)
+                token['id'] = self._heading_placeholder_re.sub(replace_placeholder, token['id'])
+                flat_tokens.append(token)
+        
+        toc_tokens = toc.nest_toc_tokens(flat_tokens)
+        with self.renderer() as md:
+            toc_html = md.serializer(md.treeprocessors['toc'].build_toc_div(toc_tokens))
+            for postprocessor in md.postprocessors:
+                toc_html = postprocessor.run(toc_html)
+        
+        return '\n'.join(parts).strip(), toc_html, toc_tokens
+    
+    @property
+    def config_signature(self):
+        """
+        渲染配置签名
+        
+        扩展、扩展配置或允许的标签/属性变化时签名随之变化，
+        用于判断持久化的渲染结果是否需要重建。
+        
+        Returns:
+            str: 配置签名（sha1）
+        """
+        if self._config_signature is not None:
+            return self._config_signature
+        payload = json.dumps({
+            'version': RENDER_PIPELINE_VERSION,
+            'markdown': markdown.__version__,
+            'extensions': self.extensions,
+            'extension_configs': self.extension_configs,
+            'allowed_tags': sorted(set(self.allowed_tags)),
+            'allowed_attributes': {
+                key: sorted(value) if isinstance(value, (list, tuple, set)) else repr(value)
+                for key, value in self.allowed_attributes.items()
+            }
+        }, sort_keys=True, default=repr)
+        self._config_signature = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        return self._config_signature
+    
     def render(self, text, sanitize=True):
         """
         将Markdown文本转换为HTML
@@ -83,24 +641,97 @@ class MarkdownService:
         if not text:
             return ''
         
-        # 转换Markdown为HTML
-        html = self.md.convert(text)
+        # 转换Markdown为HTML，并按需进行HTML清理
+        return self._convert(text, sanitize)[0]
+    
+    def get_highlight_stats(self):
+        """
+        获取代码高亮缓存的命中统计
         
-        # 如果需要，进行HTML清理
-        if sanitize:
-            html = clean(
-                html,
-                tags=self.allowed_tags,
-                attributes=self.allowed_attributes,
-                strip=True
-            )
+        Returns:
+            dict: 缓存大小、容量、命中与未命中次数
+        """
+        return highlight_cache.stats()
+    
+    def get_block_stats(self):
+        """
+        获取按块渲染缓存的命中统计
         
-        return html
+        Returns:
+            dict: 缓存大小、容量、命中与未命中次数
+        """
+        return self._block_cache.stats()
+    
+    def sanitize_html(self, html):
+        """
+        按允许的标签和属性清理HTML
+        
+        Args:
+            html (str): HTML文本
+            
+        Returns:
+            str: 清理后的HTML
+        """
+        return clean(
+            html,
+            tags=self.allowed_tags,
+            attributes=self.allowed_attributes,
+            strip=True
+        )
+    
+    def trusted_html(self, html):
+        """
+        返回可直接输出的已存储HTML
+        
+        写入时清理模式下，持久化的HTML在写入前已经过清理，直接信任；
+        否则在读取时再次清理。
+        
+        Args:
+            html (str): 已存储的HTML
+            
+        Returns:
+            str: 可直接输出的HTML
+        """
+        if not html or self.sanitize_on_write:
+            return html or ''
+        return self.sanitize_html(html)
+    
+    def render_document(self, text, sanitize=True, excerpt_length=150):
+        """
+        单次转换同时得到HTML、目录、标题列表、纯文本、摘要和字数
+        
+        Args:
+            text (str): Markdown文本
+            sanitize (bool): 是否进行HTML清理，默认为True
+            excerpt_length (int): 摘要长度
+            
+        Returns:
+            RenderedDocument: 渲染结果
+        """
+        if not text:
+            return RenderedDocument()
+        
+        html, toc_html, toc_tokens = self._convert(text, sanitize)
+        headings = _flatten_toc_tokens(toc_tokens)
+        
+        text_only = self.html_to_text(html)
+        plain_text = html_lib.unescape(text_only)
+        return RenderedDocument(
+            html=html,
+            toc=toc_html,
+            headings=headings,
+            plain_text=plain_text,
+            excerpt=self.truncate_text(text_only, excerpt_length),
+            word_count=self.count_words(plain_text)
+        )
     
     def render_excerpt(self, text, length=150, sanitize=True):
         """
         生成摘要，去除HTML标签
         
+        按块惰性渲染，收集到足够的纯文本后即停止，长文章不再整篇转换；
+        结果与整篇渲染后截取一致。
+        
         Args:
             text (str): Markdown文本
             length (int): 摘要长度
@@ -112,20 +743,88 @@ class MarkdownService:
         if not text:
             return ''
         
-        # 先转换为HTML
-        html = self.render(text, sanitize)
+        # 脚注、引用式链接等跨块语法会影响前面块的输出，只能整篇渲染
+        if _DOCUMENT_SCOPE_RE.search(text) is not None:
+            return self.render_document(text, sanitize, excerpt_length=length).excerpt
+        
+        # 逐块渲染并提取纯文本，取到超过摘要长度的文本即停止，后续块不再渲染
+        pieces = []
+        collected = -1
+        for block in iter_blocks(text):
+            entry = self._render_block(block)
+            output = entry['output']
+            if sanitize:
+                if entry['sanitized'] is None:
+                    entry['sanitized'] = self.sanitize_html(output)
+                output = entry['sanitized']
+            # 标题ID占位符只出现在标签属性中，去除标签后不影响纯文本
+            piece = self.html_to_text(output)
+            if not piece:
+                continue
+            pieces.append(piece)
+            collected += len(piece) + 1
+            if collected > length:
+                break
         
-        # 去除HTML标签
-        text_only = re.sub(r'<[^>]+>', '', html)
+        return self.truncate_text(' '.join(pieces), length)
+    
+    def html_to_text(self, html):
+        """
+        去除HTML标签并合并空白字符
+        
+        Args:
+            html (str): HTML文本
+            
+        Returns:
+            str: 纯文本
+        """
+        if not html:
+            return ''
+        text_only = _TAG_RE.sub('', html)
+        return _WHITESPACE_RE.sub(' ', text_only).strip()
+    
+    def truncate_text(self, text, length=150):
+        """
+        按字符截取纯文本，超出部分以省略号结尾
         
-        # 清理多余的空白字符
-        text_only = re.sub(r'\s+', ' ', text_only).strip()
+        Args:
+            text (str): 纯文本
+            length (int): 截取长度
+            
+        Returns:
+            str: 截取后的文本
+        """
+        if text and len(text) > length:
+            return text[:length] + '...'
+        return text or ''
+    
+    def count_words(self, text):
+        """
+        统计字数，中文按字计数，英文按单词计数
         
-        # 截取指定长度
-        if len(text_only) > length:
-            text_only = text_only[:length] + '...'
+        Args:
+            text (str): 纯文本
+            
+        Returns:
+            int: 字数
+        """
+        if not text:
+            return 0
+        cjk_count = len(_CJK_RE.findall(text))
+        word_count = len(_WORD_RE.findall(_CJK_RE.sub(' ', text)))
+        return cjk_count + word_count
+    
+    def estimate_reading_time(self, word_count):
+        """
+        估算阅读时间
         
-        return text_only
+        Args:
+            word_count (int): 字数
+            
+        Returns:
+            int: 阅读时间（分钟），有内容时至少为1
+        """
+        return estimate_reading_time(word_count)
     
     def get_toc(self, text):
         """
@@ -140,15 +839,8 @@ class MarkdownService:
         if not text:
             return ''
         
-        # 重置Markdown处理器状态
-        self.md.reset()
-        
-        # 转换文本
-        self.md.convert(text)
-        
-        # 获取目录
-        toc = getattr(self.md, 'toc', '')
-        return toc
+        # 转换文本并获取目录
+        return self._convert(text, sanitize=False)[1]
     
     def is_markdown(self, text):
         """
@@ -163,26 +855,8 @@ class MarkdownService:
         if not text:
             return False
         
-        # 检查常见的Markdown语法模式
-        markdown_patterns = [
-            r'^#{1,6}\s+',  # 标题
-            r'\*\*.*?\*\*',  # 粗体
-            r'\*.*?\*',  # 斜体
-            r'```.*?```',  # 代码块
-            r'`.*?`',  # 行内代码
-            r'\[.*?\]\(.*?\)',  # 链接
-            r'!\[.*?\]\(.*?\)',  # 图片
-            r'^\s*[-*+]\s+',  # 无序列表
-            r'^\s*\d+\.\s+',  # 有序列表
-            r'^\s*>\s+',  # 引用
-            r'\|.*\|',  # 表格
-        ]
-        
-        for pattern in markdown_patterns:
-            if re.search(pattern, text, re.MULTILINE | re.DOTALL):
-                return True
-        
-        return False
+        # 单个预编译表达式，只扫描开头部分，耗时与文章长度无关
+        return _MARKDOWN_SYNTAX_RE.search(text, 0, MARKDOWN_DETECT_SCAN_LENGTH) is not None
 
 # 创建全局实例
 markdown_service = MarkdownService()
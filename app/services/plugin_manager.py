@@ -6,10 +6,14 @@ import sys
 import importlib
 import importlib.util
 import inspect
+import time
+from collections.abc import MutableMapping
 from typing import Dict, List, Any, Callable
-from flask import current_app
+from flask import current_app, g, has_request_context
 from app import db
 from app.models.plugin import Plugin, PluginHook
+from app.services.hook_profiler import hook_profiler
+from app.services.runtime_state import runtime_state
 from app.utils import path_utils
 
 def hook(hook_name: str, priority: int = 10):
@@ -34,12 +38,58 @@ def filter(filter_name: str, priority: int = 10):
         return func
     return decorator
 
+class TemplateHookResults(MutableMapping):
+    """
+    视图传给模板的 plugin_hooks
+
+    模板第一次读取某个钩子时才执行回调，没有读取的钩子不执行；结果保存在映射中，
+    过滤器可以像普通字典一样追加或替换钩子内容
+    """
+
+    def __init__(self, plugin_manager, names):
+        self._plugin_manager = plugin_manager
+        self._names = list(names)
+        self._values = {}
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            if name not in self._names:
+                raise KeyError(name)
+            self._values[name] = self._plugin_manager.get_template_hooks(name)
+        return self._values[name]
+
+    def __setitem__(self, name, value):
+        self._values[name] = value
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self._values.pop(name, None)
+        if name in self._names:
+            self._names.remove(name)
+
+    def __contains__(self, name):
+        return name in self._values or name in self._names
+
+    def __iter__(self):
+        yield from self._names
+        yield from (name for name in self._values if name not in self._names)
+
+    def __len__(self):
+        return len(self._names) + sum(1 for name in self._values if name not in self._names)
+
+
 class PluginManager:
     """插件管理器"""
     
     def __init__(self):
         self.app = None
-        self.hooks = {}  # 钩子注册表 {hook_name: [hook_info, ...]}
+        self.hooks = {}  # 钩子注册表 {hook_name: [hook_info, ...]}，只通过注册/注销方法修改
+        # 按类型编译的分发表 {hook_name: (...)}：按优先级排序的不可变元组，注册表变化时整体替换
+        self._actions = {}  # (callback, accepted_args, plugin_name)
+        self._filters = {}  # (callback, accepted_args - 1, plugin_name)
+        self._template_hooks = {}  # (callback, plugin_name, (cache_ttl, cache_key) 或 None)
+        self._template_hook_cache = {}  # 声明可缓存的模板钩子输出 {(hook_name, callback): (key, expires_at, output)}
         self.plugins = {}  # 已加载的插件 {plugin_name: plugin_instance}
         self.plugin_modules = {}  # 插件模块 {plugin_name: module}
         self._last_active_plugin_ids = None  # 缓存活动插件ID集合
@@ -54,10 +104,8 @@ class PluginManager:
             self.discover_plugins()
             self.load_active_plugins()
         
-        # 注册请求前钩子，确保多 worker 环境下插件状态同步
-        @app.before_request
-        def _sync_plugin_state():
-            self.ensure_synced()
+        # 其他 worker 修改了运行时状态（版本号变化）时同步插件状态
+        runtime_state.subscribe(self.ensure_synced)
     
     def discover_plugins(self):
         """发现插件（仅扫描，不自动注册）"""
@@ -92,7 +140,7 @@ class PluginManager:
     def reload_runtime_state(self):
         """Unload all in-memory plugin state and reload currently active plugins."""
         # 清理钩子和已加载插件，避免重复注册
-        self.hooks.clear()
+        self._clear_plugin_hooks()
         self.plugins.clear()
         self.plugin_modules.clear()
         self._last_active_plugin_ids = None
@@ -101,7 +149,7 @@ class PluginManager:
         self.load_active_plugins()
 
     def ensure_synced(self):
-        """确保内存中的插件状态与数据库一致（用于多 worker 同步）"""
+        """确保内存中的插件状态与数据库一致（运行时状态版本变化时调用，用于多 worker 同步）"""
         try:
             # 获取当前数据库中活动插件的 ID 集合
             active_plugins = Plugin.query.filter_by(is_active=True).all()
@@ -109,7 +157,7 @@ class PluginManager:
             
             # 如果活动插件列表变化了，则重新加载
             if current_ids != self._last_active_plugin_ids:
-                self.hooks.clear()
+                self._clear_plugin_hooks()
                 self.plugins.clear()
                 self.plugin_modules.clear()
                 self.load_active_plugins()
@@ -118,6 +166,67 @@ class PluginManager:
             # 在数据库未初始化等异常情况下忽略
             pass
     
+    def _clear_plugin_hooks(self):
+        """清理插件注册的钩子，保留核心代码注册的钩子（无插件名）"""
+        self._remove_hooks(lambda hook: hook.get('plugin_name'))
+
+    def _remove_hooks(self, predicate: Callable[[Dict[str, Any]], Any], hook_names=None):
+        """从注册表中移除满足条件的钩子，并重新编译受影响的分发表"""
+        for hook_name in list(hook_names if hook_names is not None else self.hooks.keys()):
+            registered = self.hooks.get(hook_name)
+            if not registered:
+                continue
+            remaining = [hook for hook in registered if not predicate(hook)]
+            if len(remaining) == len(registered):
+                continue
+            if remaining:
+                self.hooks[hook_name] = remaining
+            else:
+                del self.hooks[hook_name]
+            self._compile_hooks(hook_name)
+
+    def _compile_hooks(self, hook_name: str):
+        """
+        编译某个钩子名的分发表
+
+        注册表已按优先级排序，这里按类型拆成不可变元组，参数个数提前取出，
+        执行钩子时只需遍历元组；替换整个元组，正在执行的分发不受影响
+        """
+        actions, filters, templates = [], [], []
+        for hook in self.hooks.get(hook_name, ()):
+            plugin_name = hook.get('plugin_name') or 'unknown'
+            hook_type = hook.get('type', 'action')
+            if hook_type == 'filter':
+                filters.append((hook['callback'], max(hook['accepted_args'] - 1, 0), plugin_name))
+            elif hook_type == 'template':
+                cache_ttl, cache_key = hook.get('cache_ttl'), hook.get('cache_key')
+                cache = (cache_ttl, cache_key) if cache_ttl or cache_key else None
+                templates.append((hook['callback'], plugin_name, cache))
+            else:
+                actions.append((hook['callback'], max(hook['accepted_args'], 0), plugin_name))
+
+        for table, entries in ((self._actions, actions), (self._filters, filters), (self._template_hooks, templates)):
+            if entries:
+                table[hook_name] = tuple(entries)
+            else:
+                table.pop(hook_name, None)
+
+        # 丢弃已注销回调的缓存输出
+        cached = {callback for callback, _, cache in templates if cache}
+        for key in [key for key in self._template_hook_cache if key[0] == hook_name and key[1] not in cached]:
+            self._template_hook_cache.pop(key, None)
+
+    def _add_hook(self, hook_name: str, hook_info: Dict[str, Any]):
+        """把钩子加入注册表（按优先级稳定排序）并重新编译分发表"""
+        registered = self.hooks.get(hook_name, []) + [hook_info]
+        registered.sort(key=lambda x: x['priority'])
+        self.hooks[hook_name] = registered
+        self._compile_hooks(hook_name)
+
+    def unregister_hook(self, hook_name: str, callback: Callable):
+        """注销某个钩子名下的回调（动作、过滤器或模板钩子）"""
+        self._remove_hooks(lambda hook: hook['callback'] == callback, [hook_name])
+    
     def _register_plugin(self, plugin_name: str, plugin_path: str):
         """注册插件到数据库"""
         # 检查插件是否已注册
@@ -219,6 +328,9 @@ class PluginManager:
                 plugin_instance = plugin_class()
                 self.plugins[plugin.name] = plugin_instance
                 
+                # 重新加载（例如安装后立即启用）时先移除上次注册的钩子，避免重复执行
+                self._remove_hooks(lambda hook: hook.get('plugin_name') == plugin.name)
+                
                 # 自动注册通过装饰器定义的钩子
                 self._register_decorated_hooks(plugin_instance)
                 
@@ -323,20 +435,16 @@ class PluginManager:
                      priority: int = 10, accepted_args: int = 1, 
                      plugin_name: str = None):
         """注册钩子"""
-        if hook_name not in self.hooks:
-            self.hooks[hook_name] = []
-        
         hook_info = {
             'callback': callback,
             'priority': priority,
             'accepted_args': accepted_args,
-            'plugin_name': plugin_name
+            'plugin_name': plugin_name,
+            'type': 'action'
         }
         
-        self.hooks[hook_name].append(hook_info)
-        
-        # 按优先级排序
-        self.hooks[hook_name].sort(key=lambda x: x['priority'])
+        # 加入注册表（按优先级排序）并重新编译分发表
+        self._add_hook(hook_name, hook_info)
         
         # 如果有插件名，保存到数据库
         if plugin_name:
@@ -357,9 +465,6 @@ class PluginManager:
                        priority: int = 10, accepted_args: int = 1,
                        plugin_name: str = None):
         """注册过滤器"""
-        if filter_name not in self.hooks:
-            self.hooks[filter_name] = []
-        
         hook_info = {
             'callback': callback,
             'priority': priority,
@@ -368,10 +473,8 @@ class PluginManager:
             'type': 'filter'
         }
         
-        self.hooks[filter_name].append(hook_info)
-        
-        # 按优先级排序
-        self.hooks[filter_name].sort(key=lambda x: x['priority'])
+        # 加入注册表（按优先级排序）并重新编译分发表
+        self._add_hook(filter_name, hook_info)
         
         # 保存到数据库
         if plugin_name:
@@ -389,23 +492,30 @@ class PluginManager:
                 db.session.commit()
     
     def register_template_hook(self, hook_name: str, callback: Callable,
-                              priority: int = 10, plugin_name: str = None):
-        """注册模板钩子"""
-        if hook_name not in self.hooks:
-            self.hooks[hook_name] = []
-        
+                              priority: int = 10, plugin_name: str = None,
+                              cache_ttl: float = None, cache_key: Callable = None):
+        """
+        注册模板钩子
+
+        模板钩子的输出在每个请求内最多计算一次。输出与当前请求和用户无关时，可以声明跨请求缓存：
+
+        Args:
+            cache_ttl: 输出在进程内缓存的秒数
+            cache_key: 返回失效键的函数，每次读取时调用，返回值变化时重新生成输出；
+                       与 cache_ttl 同时指定时满足任一条件即重新生成
+        """
         hook_info = {
             'callback': callback,
             'priority': priority,
             'accepted_args': 0,
             'plugin_name': plugin_name,
-            'type': 'template'
+            'type': 'template',
+            'cache_ttl': cache_ttl,
+            'cache_key': cache_key
         }
         
-        self.hooks[hook_name].append(hook_info)
-        
-        # 按优先级排序
-        self.hooks[hook_name].sort(key=lambda x: x['priority'])
+        # 加入注册表（按优先级排序）并重新编译分发表
+        self._add_hook(hook_name, hook_info)
         
         # 保存到数据库
         if plugin_name:
@@ -423,56 +533,111 @@ class PluginManager:
                 db.session.commit()
     
     def do_action(self, hook_name: str, *args, **kwargs):
-        """执行动作钩子"""
-        if hook_name in self.hooks:
-            for hook_info in self.hooks[hook_name]:
-                try:
-                    callback = hook_info['callback']
-                    accepted_args = hook_info['accepted_args']
-                    
-                    # 限制参数数量
-                    if len(args) > accepted_args:
-                        args = args[:accepted_args]
-                    
-                    callback(*args, **kwargs)
-                except Exception as e:
-                    plugin_name = hook_info.get('plugin_name', 'unknown')
-                    current_app.logger.error(f"执行钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
+        """执行动作钩子，每个回调最多接收其声明的位置参数个数"""
+        actions = self._actions.get(hook_name)
+        if actions is None:
+            return
+        sampled = hook_profiler.sample_rate and hook_profiler.sample()
+        for callback, accepted_args, plugin_name in actions:
+            started = time.perf_counter() if sampled else 0.0
+            try:
+                callback(*args[:accepted_args], **kwargs)
+            except Exception as e:
+                hook_profiler.record_error('action', hook_name, plugin_name)
+                current_app.logger.error(f"执行钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
+            if sampled:
+                hook_profiler.record('action', hook_name, plugin_name, time.perf_counter() - started)
     
     def apply_filters(self, filter_name: str, value: Any, *args, **kwargs):
-        """应用过滤器"""
-        if filter_name in self.hooks:
-            for hook_info in self.hooks[filter_name]:
-                if hook_info.get('type') == 'filter':
-                    try:
-                        callback = hook_info['callback']
-                        accepted_args = hook_info['accepted_args']
-                        
-                        # 限制参数数量，第一个参数是值
-                        filter_args = [value] + list(args[:accepted_args-1])
-                        value = callback(*filter_args, **kwargs)
-                    except Exception as e:
-                        plugin_name = hook_info.get('plugin_name', 'unknown')
-                        current_app.logger.error(f"应用过滤器 {filter_name} (插件: {plugin_name}) 失败: {e}")
+        """应用过滤器，第一个参数是值，其余位置参数按回调声明的个数截取"""
+        filters = self._filters.get(filter_name)
+        if filters is None:
+            return value
+        sampled = hook_profiler.sample_rate and hook_profiler.sample()
+        for callback, extra_args, plugin_name in filters:
+            started = time.perf_counter() if sampled else 0.0
+            try:
+                value = callback(value, *args[:extra_args], **kwargs)
+            except Exception as e:
+                hook_profiler.record_error('filter', filter_name, plugin_name)
+                current_app.logger.error(f"应用过滤器 {filter_name} (插件: {plugin_name}) 失败: {e}")
+            if sampled:
+                hook_profiler.record('filter', filter_name, plugin_name, time.perf_counter() - started)
         
         return value
     
     def get_template_hooks(self, hook_name: str):
-        """获取模板钩子"""
+        """
+        获取模板钩子的输出
+
+        同一请求内重复获取时直接返回第一次的结果（的副本），期间注册或注销了该钩子的回调时重新计算
+        """
+        template_hooks = self._template_hooks.get(hook_name)
+        if template_hooks is None:
+            return []
+
+        results = g.setdefault('_template_hook_results', {}) if has_request_context() else {}
+        memo = results.get(hook_name)
+        if memo is not None and memo[0] is template_hooks:
+            return list(memo[1])
+
         hooks = []
-        if hook_name in self.hooks:
-            for hook_info in self.hooks[hook_name]:
-                if hook_info.get('type') == 'template':
-                    try:
-                        callback = hook_info['callback']
-                        result = callback()
-                        if result:
-                            hooks.append(result)
-                    except Exception as e:
-                        plugin_name = hook_info.get('plugin_name', 'unknown')
-                        current_app.logger.error(f"获取模板钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
-        
-        return hooks
+        sampled = hook_profiler.sample_rate and hook_profiler.sample()
+        for callback, plugin_name, cache in template_hooks:
+            started = time.perf_counter() if sampled else 0.0
+            try:
+                if cache is None:
+                    result = callback()
+                else:
+                    result = self._cached_template_output(hook_name, callback, *cache)
+                if result:
+                    hooks.append(result)
+            except Exception as e:
+                hook_profiler.record_error('template', hook_name, plugin_name)
+                current_app.logger.error(f"获取模板钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
+            if sampled:
+                hook_profiler.record('template', hook_name, plugin_name, time.perf_counter() - started)
+
+        results[hook_name] = (template_hooks, hooks)
+        return list(hooks)
+
+    def _cached_template_output(self, hook_name: str, callback: Callable, cache_ttl, cache_key):
+        """返回声明可缓存的模板钩子输出，失效键变化或超过 cache_ttl 秒时重新生成"""
+        key = cache_key() if cache_key else None
+        now = time.monotonic()
+        entry = self._template_hook_cache.get((hook_name, callback))
+        if entry is not None and entry[0] == key and (entry[1] is None or now < entry[1]):
+            return entry[2]
+
+        output = callback()
+        self._template_hook_cache[(hook_name, callback)] = (key, now + cache_ttl if cache_ttl else None, output)
+        return output
+
+    def invalidate_template_hook_cache(self, hook_name: str = None, plugin_name: str = None):
+        """
+        清除模板钩子的跨请求缓存（插件数据修改后调用）
+
+        Args:
+            hook_name: 只清除该钩子的缓存，不指定时清除全部钩子
+            plugin_name: 只清除该插件注册的回调的缓存
+        """
+        for key in list(self._template_hook_cache):
+            if hook_name is not None and key[0] != hook_name:
+                continue
+            if plugin_name is not None and not any(
+                    hook['callback'] == key[1] and hook.get('plugin_name') == plugin_name
+                    for hook in self.hooks.get(key[0], ())):
+                continue
+            self._template_hook_cache.pop(key, None)
+
+    def template_hooks(self, *hook_names: str) -> TemplateHookResults:
+        """
+        视图使用的 plugin_hooks：只有模板实际读取的钩子才执行回调
+
+        Args:
+            hook_names: 提供给模板的钩子名
+        """
+        return TemplateHookResults(self, hook_names)
     
     def render_plugin_template(self, plugin_name: str, template_content: str, context: dict = None):
         """渲染插件模板，提供Flask模板上下文"""
@@ -554,6 +719,8 @@ class PluginManager:
         if plugin:
             plugin.activate()
             self._load_plugin(plugin)
+            self._last_active_plugin_ids = (self._last_active_plugin_ids or frozenset()) | {plugin.id}
+            runtime_state.bump()
             return True
         return False
     
@@ -571,13 +738,10 @@ class PluginManager:
                 del self.plugin_modules[plugin_name]
             
             # 移除插件的钩子
-            hooks_to_remove = []
-            for hook_name, hook_list in self.hooks.items():
-                self.hooks[hook_name] = [
-                    hook for hook in hook_list 
-                    if hook.get('plugin_name') != plugin_name
-                ]
+            self._remove_hooks(lambda hook: hook.get('plugin_name') == plugin_name)
             
+            self._last_active_plugin_ids = (self._last_active_plugin_ids or frozenset()) - {plugin.id}
+            runtime_state.bump()
             return True
         return False
     
@@ -661,6 +825,8 @@ class PluginBase:
             else:
                 # 设置整个配置字典
                 plugin.set_config(config_dict_or_key)
+            # 模板钩子的缓存输出可能依赖配置
+            plugin_manager.invalidate_template_hook_cache(plugin_name=self.name)
     
     def remove_config(self, key):
         """删除插件配置项"""
@@ -671,3 +837,4 @@ class PluginBase:
             if key in config:
                 del config[key]
                 plugin.set_config(config)
+                plugin_manager.invalidate_template_hook_cache(plugin_name=self.name)
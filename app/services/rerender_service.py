@@ -0,0 +1,200 @@
+"""Bulk re-rendering of the stored post and comment HTML in a process pool."""
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam
+
+from app import db
+
+RERENDER_CHUNK_SIZE = 200
+# Chunks queued per worker; bounds memory while keeping every worker busy.
+RERENDER_CHUNKS_IN_FLIGHT = 2
+
+
+def render_post_chunk(rows: Sequence[Tuple[int, str, Optional[str]]]) -> List[Dict[str, Any]]:
+    """Render ``(id, content, excerpt)`` rows into ``post_renders`` values (runs in workers)."""
+    from app.models.post_render import PostRender
+
+    return [
+        PostRender.build_values(SimpleNamespace(id=post_id, content=content, excerpt=excerpt))
+        for post_id, content, excerpt in rows
+    ]
+
+
+def render_comment_chunk(rows: Sequence[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """Render ``(id, content)`` rows into ``comment_renders`` values (runs in workers)."""
+    from app.models.comment_render import CommentRender
+
+    return [
+        CommentRender.build_values(SimpleNamespace(id=comment_id, content=content))
+        for comment_id, content in rows
+    ]
+
+
+class RerenderTarget:
+    """Describes one kind of content that can be re-rendered."""
+
+    def __init__(self, name, label, model, columns, render_model, key, render_chunk):
+        self.name = name
+        self.label = label
+        self.model = model
+        self.columns = columns
+        self.render_model = render_model
+        self.key = key
+        self.render_chunk = render_chunk
+
+    @property
+    def render_table(self):
+        return self.render_model.__table__
+
+    @property
+    def compared_columns(self) -> List[str]:
+        """Stored columns compared against a fresh render (all but keys and timestamps)."""
+        skip = {'id', self.key, 'created_at', 'updated_at'}
+        return [column.name for column in self.render_table.columns if column.name not in skip]
+
+
+def get_targets() -> Dict[str, RerenderTarget]:
+    """Return the re-renderable content kinds keyed by name."""
+    from app.models.comment import Comment
+    from app.models.comment_render import CommentRender
+    from app.models.post import Post
+    from app.models.post_render import PostRender
+
+    return {
+        'posts': RerenderTarget(
+            'posts', '文章', Post, (Post.id, Post.content, Post.excerpt),
+            PostRender, 'post_id', render_post_chunk
+        ),
+        'comments': RerenderTarget(
+            'comments', '评论', Comment, (Comment.id, Comment.content),
+            CommentRender, 'comment_id', render_comment_chunk
+        ),
+    }
+
+
+def iter_source_chunks(target: RerenderTarget, resume_from_id: int = 0,
+                       chunk_size: int = RERENDER_CHUNK_SIZE) -> Iterator[List[Tuple]]:
+    """Stream source rows in id order, ``chunk_size`` rows at a time, using keyset pagination."""
+    model = target.model
+    last_id = resume_from_id - 1
+    while True:
+        rows = (
+            db.session.query(*target.columns)
+            .filter(model.id > last_id)
+            .order_by(model.id)
+            .limit(chunk_size)
+            .all()
+        )
+        db.session.rollback()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        last_id = rows[-1][0]
+
+
+def rerender(target: RerenderTarget, workers: Optional[int] = None, chunk_size: int = RERENDER_CHUNK_SIZE,
+             resume_from_id: int = 0, dry_run: bool = False,
+             progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """Re-render every row of ``target`` and write changed results back in batches.
+
+    Chunks are rendered in a ``ProcessPoolExecutor`` (in-process when ``workers``
+    is 0 or 1) while the next chunks are read. Results are applied in id order,
+    so ``last_id`` in the progress stats is always safe to resume from.
+    With ``dry_run`` nothing is written; the stats only count the differences.
+    """
+    stats = {
+        'processed': 0,
+        'missing': 0,  # no stored render yet
+        'changed': 0,  # stored HTML/TOC/excerpt differs from the fresh render
+        'stale': 0,  # same output, but content hash or renderer signature is outdated
+        'written': 0,
+        'last_id': 0,
+    }
+    chunks = iter_source_chunks(target, resume_from_id, chunk_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for rows in chunks:
+            _apply_chunk(target, target.render_chunk(rows), dry_run, stats)
+            if progress:
+                progress(stats)
+        return stats
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in chunks:
+            pending.append(executor.submit(target.render_chunk, rows))
+            if len(pending) >= workers * RERENDER_CHUNKS_IN_FLIGHT:
+                _apply_chunk(target, pending.popleft().result(), dry_run, stats)
+                if progress:
+                    progress(stats)
+        while pending:
+            _apply_chunk(target, pending.popleft().result(), dry_run, stats)
+            if progress:
+                progress(stats)
+    return stats
+
+
+def _apply_chunk(target: RerenderTarget, values: List[Dict[str, Any]], dry_run: bool,
+                 stats: Dict[str, int]) -> None:
+    """Compare a rendered chunk with the stored rows and write inserts/updates in one transaction."""
+    if not values:
+        return
+
+    table = target.render_table
+    key_column = table.c[target.key]
+    compared = target.compared_columns
+    ids = [item[target.key] for item in values]
+
+    stored = {
+        row[target.key]: row
+        for row in db.session.execute(
+            db.select(*[table.c[name] for name in [target.key] + compared]).where(key_column.in_(ids))
+        ).mappings()
+    }
+    db.session.rollback()
+
+    inserts = []
+    updates = []
+    output_columns = [name for name in compared if name not in ('content_hash', 'renderer_signature')]
+    for item in values:
+        current = stored.get(item[target.key])
+        if current is None:
+            stats['missing'] += 1
+            inserts.append(item)
+        elif any(current[name] != item[name] for name in output_columns):
+            stats['changed'] += 1
+            updates.append(item)
+        elif any(current[name] != item[name] for name in compared):
+            stats['stale'] += 1
+            updates.append(item)
+
+    stats['processed'] += len(values)
+    stats['last_id'] = ids[-1]
+
+    if dry_run or not (inserts or updates):
+        return
+
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        if updates:
+            assignments = {name: bindparam(f'b_{name}') for name in compared}
+            assignments['updated_at'] = now
+            conn.execute(
+                table.update().where(key_column == bindparam('b_key')).values(assignments),
+                [
+                    {'b_key': item[target.key], **{f'b_{name}': item[name] for name in compared}}
+                    for item in updates
+                ]
+            )
+        if inserts:
+            conn.execute(table.insert(), [dict(item, created_at=now, updated_at=now) for item in inserts])
+    stats['written'] += len(inserts) + len(updates)
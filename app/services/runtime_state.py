@@ -0,0 +1,147 @@
+"""
+运行时状态版本（多 worker 同步插件与主题状态）
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import Integer, Text, cast, update
+
+from app import db
+from app.services.asset_service import is_asset_request
+
+# 数据库中保存运行时状态版本的设置键
+RUNTIME_STATE_VERSION_KEY = 'runtime_state_version'
+# 实例目录下的信号文件，版本变化时更新其修改时间，同一台机器上的 worker 立即感知
+RUNTIME_STATE_SIGNAL_FILE = 'runtime_state_version'
+# 信号文件没有变化时，最多间隔多少秒查询一次数据库中的版本（兜底多机部署），0 表示每个请求都查询
+try:
+    RUNTIME_STATE_CHECK_INTERVAL = float(os.getenv('RUNTIME_STATE_CHECK_INTERVAL', 5))
+except (TypeError, ValueError):
+    RUNTIME_STATE_CHECK_INTERVAL = 5.0
+
+
+class RuntimeState:
+    """
+    运行时状态版本
+
+    后台启用/停用插件、切换主题、修改主题配置、恢复备份时调用 bump()，把数据库中的
+    版本号加一并更新信号文件。每个请求只检查信号文件的修改时间，信号没有变化时
+    最多每 interval 秒查询一次版本号；版本变化时才调用订阅者重新同步插件和主题，
+    稳定状态下的请求不执行同步查询。
+    """
+
+    def __init__(self, interval=RUNTIME_STATE_CHECK_INTERVAL):
+        self.interval = interval
+        self.version = None
+        self.signal_path = None
+        self._signal_mtime = None
+        self._checked_at = 0.0
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """记录当前版本并注册请求前检查"""
+        self.signal_path = os.path.join(app.instance_path, RUNTIME_STATE_SIGNAL_FILE)
+        self._subscribers = []
+        with app.app_context():
+            self.version = self.read_version()
+        self._signal_mtime = self._read_signal_mtime()
+        self._checked_at = time.monotonic()
+
+        @app.before_request
+        def _check_runtime_state():
+            if not is_asset_request():
+                self.check()
+
+    def subscribe(self, callback):
+        """注册版本变化时调用的同步函数（按注册顺序调用）"""
+        self._subscribers.append(callback)
+
+    def read_version(self):
+        """查询数据库中的版本号，表或设置不存在时返回 0"""
+        from app.models.setting import SettingManager
+        return SettingManager.get(RUNTIME_STATE_VERSION_KEY, 0) or 0
+
+    def _read_signal_mtime(self):
+        if not self.signal_path:
+            return None
+        try:
+            return os.stat(self.signal_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _touch_signal(self):
+        """写入信号文件，更新修改时间"""
+        if not self.signal_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.signal_path), exist_ok=True)
+            with open(self.signal_path, 'w', encoding='utf-8') as signal_file:
+                signal_file.write(str(self.version))
+        except OSError:
+            # 信号文件只用于加速同一台机器上的通知，写入失败时依靠定期查询
+            pass
+
+    def check(self):
+        """
+        检查版本是否变化，变化时调用订阅者重新同步
+
+        Returns:
+            bool: 是否执行了同步
+        """
+        signal_mtime = self._read_signal_mtime()
+        if signal_mtime == self._signal_mtime and time.monotonic() - self._checked_at < self.interval:
+            return False
+
+        with self._lock:
+            self._signal_mtime = signal_mtime
+            self._checked_at = time.monotonic()
+            version = self.read_version()
+            if version == self.version:
+                return False
+            self.version = version
+
+        for callback in self._subscribers:
+            callback()
+        return True
+
+    def bump(self):
+        """
+        版本号加一（在修改插件/主题状态的 worker 中调用）
+
+        本 worker 的内存状态已经包含这次修改，不会因为自己的版本号再次同步；但加一之前数据库中的
+        版本与本 worker 已知的版本不同时，说明其他 worker 的修改还没有同步（检查间隔内或信号文件
+        不可见），记录新版本后会跳过它们，因此加一后调用订阅者同步一次。恢复备份后数据库中的
+        版本可能比本 worker 已知的版本小，此时改为已知版本加一，保证其他 worker 能看到变化
+        """
+        from app.models.setting import Setting, SettingManager
+
+        result = db.session.execute(
+            update(Setting)
+            .where(Setting.key == RUNTIME_STATE_VERSION_KEY)
+            .values(value=cast(cast(Setting.value, Integer) + 1, Text))
+        )
+        db.session.commit()
+        version = self.read_version() if result.rowcount else 0
+        # 加一之前数据库中的版本（设置不存在时为 0）
+        previous = version - 1 if result.rowcount else 0
+        missed = previous != (self.version or 0)
+        if version <= (self.version or 0):
+            version = (self.version or 0) + 1
+            SettingManager.set(RUNTIME_STATE_VERSION_KEY, version, 'integer', '插件与主题运行时状态版本', 'system',
+                               is_editable=False)
+
+        with self._lock:
+            self.version = version
+            self._touch_signal()
+            self._signal_mtime = self._read_signal_mtime()
+            self._checked_at = time.monotonic()
+
+        if missed:
+            for callback in self._subscribers:
+                callback()
+        return self.version
+
+
+runtime_state = RuntimeState()
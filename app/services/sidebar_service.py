@@ -0,0 +1,163 @@
+"""
+侧边栏数据服务
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from app import db
+
+# 侧边栏数据在进程内缓存的最长秒数；文章保存、更新、删除时立即失效，
+# 该时长用于兜底刷新其他 worker 的缓存以及分类/标签的直接修改，0 表示不缓存
+try:
+    SIDEBAR_CACHE_TTL = int(os.getenv('SIDEBAR_CACHE_TTL', 300))
+except (TypeError, ValueError):
+    SIDEBAR_CACHE_TTL = 300
+
+# 最新文章数量
+SIDEBAR_RECENT_POSTS = 5
+# 标签云权重等级（1 ~ TAG_CLOUD_LEVELS）
+TAG_CLOUD_LEVELS = 5
+
+
+def tag_cloud_weight(count, min_count, max_count, levels=TAG_CLOUD_LEVELS):
+    """
+    按文章数计算标签云权重，对数缩放避免少数热门标签压扁其余标签
+
+    Args:
+        count (int): 标签的文章数
+        min_count (int): 所有标签中的最小文章数
+        max_count (int): 所有标签中的最大文章数
+        levels (int): 权重等级数
+
+    Returns:
+        int: 1 ~ levels 之间的权重
+    """
+    if max_count <= min_count:
+        return 1
+    ratio = (math.log1p(count) - math.log1p(min_count)) / (math.log1p(max_count) - math.log1p(min_count))
+    return 1 + int(round(ratio * (levels - 1)))
+
+
+class SidebarService:
+    """
+    侧边栏数据服务
+
+    一次构建最新文章、带文章数的分类和带权重的标签云，缓存在进程内。
+    缓存的是与数据库会话无关的普通对象，可以在请求之间安全复用。
+    """
+
+    def __init__(self, ttl=SIDEBAR_CACHE_TTL):
+        self.ttl = ttl
+        self._data = None
+        self._built_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_data(self):
+        """
+        获取侧边栏数据，缓存缺失或过期时重新构建
+
+        Returns:
+            SimpleNamespace: recent_posts、categories、tag_cloud 与 built_at
+        """
+        data = self._data
+        if data is not None and time.monotonic() - self._built_at < self.ttl:
+            return data
+
+        generation = self._generation
+        data = self.build()
+        with self._lock:
+            # 构建期间发生失效时不写入，避免缓存旧数据
+            if self.ttl > 0 and generation == self._generation:
+                self._data = data
+                self._built_at = time.monotonic()
+        return data
+
+    def invalidate(self, **kwargs):
+        """使缓存失效（文章保存、更新、删除以及分类修改后调用）"""
+        with self._lock:
+            self._generation += 1
+            self._data = None
+
+    def build(self):
+        """
+        查询并构建侧边栏数据
+
+        Returns:
+            SimpleNamespace: 侧边栏数据
+        """
+        from app.models.post import Post, Category, Tag, post_tags
+
+        recent_posts = [
+            SimpleNamespace(id=row.id, title=row.title, slug=row.slug, published_at=row.published_at)
+            for row in (
+                db.session.query(Post.id, Post.title, Post.slug, Post.published_at)
+                .filter(Post.status == 'published')
+                .order_by(Post.published_at.desc())
+                .limit(SIDEBAR_RECENT_POSTS)
+            )
+        ]
+
+        category_counts = dict(
+            db.session.query(Post.category_id, db.func.count(Post.id))
+            .filter(Post.status == 'published', Post.category_id.isnot(None))
+            .group_by(Post.category_id)
+            .all()
+        )
+        categories = [
+            SimpleNamespace(
+                id=category.id,
+                name=category.name,
+                slug=category.slug,
+                description=category.description,
+                parent_id=category.parent_id,
+                post_count=category_counts.get(category.id, 0)
+            )
+            for category in Category.query.filter_by(is_active=True).all()
+        ]
+
+        tag_counts = dict(
+            db.session.query(post_tags.c.tag_id, db.func.count(Post.id))
+            .join(Post, Post.id == post_tags.c.post_id)
+            .filter(Post.status == 'published')
+            .group_by(post_tags.c.tag_id)
+            .all()
+        )
+        tags = Tag.query.all()
+        counts = [tag_counts.get(tag.id, 0) for tag in tags]
+        min_count, max_count = (min(counts), max(counts)) if counts else (0, 0)
+        tag_cloud = [
+            SimpleNamespace(
+                id=tag.id,
+                name=tag.name,
+                slug=tag.slug,
+                color=tag.color,
+                post_count=count,
+                weight=tag_cloud_weight(count, min_count, max_count)
+            )
+            for tag, count in zip(tags, counts)
+        ]
+
+        return SimpleNamespace(
+            recent_posts=recent_posts,
+            categories=categories,
+            tag_cloud=tag_cloud,
+            built_at=datetime.utcnow()
+        )
+
+
+def register_sidebar_hooks(plugin_manager):
+    """注册侧边栏缓存的失效钩子（重复调用不会重复注册）"""
+    for hook_name in ('after_post_save', 'after_post_update', 'after_post_delete'):
+        registered = plugin_manager.hooks.get(hook_name, [])
+        if any(hook['callback'] == sidebar_service.invalidate for hook in registered):
+            continue
+        plugin_manager.register_hook(hook_name, sidebar_service.invalidate, priority=5)
+
+
+# 全局侧边栏数据服务实例
+sidebar_service = SidebarService()
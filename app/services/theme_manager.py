@@ -5,16 +5,270 @@ import inspect
 import json
 import os
 import sys
+import threading
+import time
 import traceback
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy.orm import object_session
-from flask import current_app, render_template_string
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, TemplateNotFound, meta
+from sqlalchemy import inspect as sa_inspect
+from flask import (
+    Response, current_app, g, get_flashed_messages, has_request_context, render_template_string, request, session,
+    stream_with_context
+)
+from werkzeug.local import LocalProxy
+from werkzeug.utils import secure_filename
 
 from app import db
 from app.models.theme import Theme, ThemeHook
+from app.services.asset_service import AssetManifest, ThemeAsset, is_asset_request
+from app.services.markdown_service import RenderCache
+from app.services.runtime_state import runtime_state
 from app.utils import path_utils
 
+# 模板名中的主题前缀分隔符，例如 "default:base.html" 表示从 default 主题开始查找
+THEME_TEMPLATE_SEPARATOR = ':'
+# 继承链末端的核心模板目录（应用自身的 templates 目录）
+CORE_TEMPLATE_SOURCE = 'core'
+# precompile-themes 预编译的模板文件扩展名
+PRECOMPILE_TEMPLATE_EXTENSIONS = ('.html', '.htm', '.xml', '.txt', '.jinja', '.j2')
+# 管理员预览主题时最多缓存的 Jinja 环境数（按最近使用淘汰），0 表示不缓存
+try:
+    THEME_PREVIEW_CACHE_SIZE = int(os.getenv('THEME_PREVIEW_CACHE_SIZE', 5))
+except (TypeError, ValueError):
+    THEME_PREVIEW_CACHE_SIZE = 5
+# 会话中保存预览主题名的键
+PREVIEW_THEME_SESSION_KEY = 'preview_theme'
+# 后台激活主题时，激活请求最多等待预编译完成的秒数，超时后在主题管理页面查看进度
+THEME_ACTIVATION_WAIT = 10
+# 保存主题激活进度的设置键，各 worker 的主题管理页面都读取这一行
+THEME_ACTIVATION_SETTING_KEY = 'theme_activation'
+# 编译期间最多间隔多少秒写入一次进度
+THEME_ACTIVATION_SAVE_INTERVAL = 1.0
+# 进度超过多少秒没有更新时认为执行激活的 worker 已退出
+THEME_ACTIVATION_STALE_AFTER = 60
+# 流式渲染时累计多少字符发送一次（</head> 之前的内容总是先单独发送）
+THEME_STREAM_BUFFER_SIZE = 8192
+
+
+class ThemeTemplateLoader(BaseLoader):
+    """
+    按主题继承链（当前主题 → 父主题/default → 核心）查找模板
+
+    模板名可以带 ``主题名:`` 前缀，表示从继承链中的该主题开始向上查找；
+    从某个主题加载的模板再 extends/include 其他模板时，也从该主题开始查找，
+    因此回退到父主题的模板会继续使用父主题自己的基础模板。
+    """
+
+    def __init__(self, chain: List[Tuple[str, BaseLoader]], auto_reload: bool = False):
+        self.chain = chain
+        self.auto_reload = auto_reload
+        self._positions = {name: index for index, (name, _) in enumerate(chain)}
+        self._owners: Optional[Dict[str, str]] = None
+
+    def split(self, template: str) -> Tuple[Optional[str], str]:
+        """拆分模板名，返回 (前缀中的主题名或 None, 不含前缀的模板名)"""
+        owner, separator, name = template.partition(THEME_TEMPLATE_SEPARATOR)
+        if separator and owner in self._positions:
+            return owner, name
+        return None, template
+
+    def get_source(self, environment, template):
+        owner, name = self.split(template)
+        start = self._positions[owner] if owner else 0
+        for _, loader in self.chain[start:]:
+            try:
+                return loader.get_source(environment, name)
+            except TemplateNotFound:
+                continue
+        raise TemplateNotFound(template)
+
+    def source_of(self, environment, template: str) -> Optional[str]:
+        """返回实际提供该模板文件的主题名（从前缀指定的主题开始查找），不存在时返回 None"""
+        owner, name = self.split(template)
+        start = self._positions[owner] if owner else 0
+        for source, loader in self.chain[start:]:
+            try:
+                loader.get_source(environment, name)
+            except TemplateNotFound:
+                continue
+            return source
+        return None
+
+    def list_templates(self):
+        return sorted(self._build_owners())
+
+    def _build_owners(self) -> Dict[str, str]:
+        """扫描一次继承链中的模板，记录每个模板名由哪个主题提供"""
+        owners = {}
+        for source, loader in reversed(self.chain):
+            try:
+                names = loader.list_templates()
+            except (TypeError, OSError):
+                continue
+            for name in names:
+                owners[name] = source
+        self._owners = owners
+        return owners
+
+    def iter_qualified_names(self):
+        """
+        产出所有可能被引用的带前缀模板名
+
+        模板内的引用从所在主题开始查找，同一个模板可能以不同主题前缀被加载，
+        预编译时需要覆盖每一种。
+        """
+        reachable = set()
+        qualified = []
+        for source, loader in reversed(self.chain):
+            try:
+                reachable.update(loader.list_templates())
+            except (TypeError, OSError):
+                pass
+            qualified.extend(f"{source}{THEME_TEMPLATE_SEPARATOR}{name}" for name in sorted(reachable))
+        return reversed(qualified)
+
+    def resolve(self, template: str) -> Optional[str]:
+        """
+        解析模板所在的主题，返回带主题前缀的模板名，不存在时返回 None
+
+        结果来自主题激活后首次使用时建立的内存索引；开启自动重载时，
+        未命中会重新扫描一次以发现新增的模板。
+        """
+        prefix, name = self.split(template)
+        if prefix:
+            return template
+        owners = self._owners if self._owners is not None else self._build_owners()
+        owner = owners.get(name)
+        if owner is None and self.auto_reload:
+            owner = self._build_owners().get(name)
+        if owner is None:
+            return None
+        return f"{owner}{THEME_TEMPLATE_SEPARATOR}{name}"
+
+    def join_path(self, template: str, parent: str) -> str:
+        """模板内引用的其他模板从父模板所在的主题开始查找"""
+        if self.split(template)[0]:
+            return template
+        owner = self.split(parent)[0]
+        if owner:
+            return f"{owner}{THEME_TEMPLATE_SEPARATOR}{template}"
+        return template
+
+
+class ThemeBytecodeCache(FileSystemBytecodeCache):
+    """
+    主题模板字节码缓存
+
+    缓存键使用相对项目根目录的模板路径，预编译结果换到其他部署目录后仍然有效；
+    缓存目录只读时（例如随部署包发布的预编译结果）跳过写入，仍可读取已有的字节码。
+    """
+
+    def get_cache_key(self, name, filename=None):
+        return super().get_cache_key(name, path_utils.to_project_relative_path(filename))
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+class ThemeEnvironment(Environment):
+    """使用主题继承链解析模板引用的 Jinja 环境"""
+
+    def join_path(self, template, parent):
+        if isinstance(self.loader, ThemeTemplateLoader):
+            return self.loader.join_path(template, parent)
+        return template
+
+
+class ThemeActivation:
+    """
+    一次主题激活任务
+
+    先为新主题创建 Jinja 环境并编译全部模板，全部通过后才启用主题并替换环境；
+    主题自己的任一模板出错时保持原主题不变，错误供后台展示。
+
+    进度保存在 theme_activation 设置中，请求被分配到其他 worker 时也能看到；
+    load() 读取的是快照，只有执行激活的 worker 持有实时的任务。
+    """
+
+    def __init__(self, theme_name: str):
+        self.theme_name = theme_name
+        # compiling → activated / failed
+        self.status = 'compiling'
+        self.compiled = 0
+        self.errors: Dict[str, str] = {}
+        self.started_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+        self._saved_at = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.done.is_set()
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = time.time()
+        # 先写入结果再通知等待者，等待结束后的请求读取到的一定是最终状态
+        self.save()
+        self.done.set()
+
+    def progress(self, compiled: int):
+        """记录已编译的模板数，最多每 THEME_ACTIVATION_SAVE_INTERVAL 秒写入一次"""
+        self.compiled = compiled
+        if time.time() - self._saved_at >= THEME_ACTIVATION_SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """写入 theme_activation 设置（需要应用上下文），失败时只记录日志"""
+        from app.models.setting import SettingManager
+        self._saved_at = time.time()
+        state = dict(self.to_dict(), started_at=self.started_at, finished_at=self.finished_at,
+                     updated_at=self._saved_at)
+        try:
+            SettingManager.set(THEME_ACTIVATION_SETTING_KEY, state, 'json', '最近一次主题激活任务的进度',
+                               'system', is_editable=False)
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.warning(f"保存主题 {self.theme_name} 的激活进度失败: {exc}")
+
+    @classmethod
+    def load(cls) -> Optional['ThemeActivation']:
+        """
+        读取 theme_activation 设置中最近一次激活任务的快照
+
+        编译中的任务超过 THEME_ACTIVATION_STALE_AFTER 秒没有更新进度时，视为执行激活的 worker
+        已退出，按失败返回
+        """
+        from app.models.setting import SettingManager
+        state = SettingManager.get(THEME_ACTIVATION_SETTING_KEY)
+        if not state or not state.get('theme'):
+            return None
+        activation = cls(state['theme'])
+        activation.status = state.get('status', 'failed')
+        activation.compiled = state.get('compiled', 0)
+        activation.errors = dict(state.get('errors') or {})
+        activation.started_at = state.get('started_at') or activation.started_at
+        activation.finished_at = state.get('finished_at')
+        if activation.status == 'compiling' and time.time() - (state.get('updated_at') or 0) > THEME_ACTIVATION_STALE_AFTER:
+            activation.status = 'failed'
+            activation.errors.setdefault('', '激活任务已中断（执行激活的 worker 已退出）')
+        if activation.status != 'compiling':
+            activation.done.set()
+        return activation
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'theme': self.theme_name,
+            'status': self.status,
+            'compiled': self.compiled,
+            'errors': self.errors,
+            'duration': round((self.finished_at or time.time()) - self.started_at, 3),
+        }
+
 
 class ThemeManager:
     """主题管理器"""
@@ -28,17 +282,37 @@ class ThemeManager:
         self._registered_theme_blueprints = set()
         self._registered_theme_routes = set()
         self._extension_candidates = ('extensions', 'backend', 'frontend')
+        # 按主题名缓存的 Jinja 环境，模板只在首次使用时编译
+        self._environments: Dict[str, Environment] = {}
+        self._environment_lock = threading.Lock()
+        # 管理员预览其他主题使用的环境，有界 LRU，不影响当前主题的环境
+        self._preview_environments = RenderCache(THEME_PREVIEW_CACHE_SIZE)
+        # 调试报告：各模板实际读取的默认上下文变量
+        self._context_usage: Dict[str, Dict[str, Any]] = {}
+        # 按主题名缓存解析后的主题配置，只在 set_theme_config/激活/重新加载/跨 worker 同步时替换
+        self._theme_configs: Dict[str, Dict[str, Any]] = {}
+        # 最近一次主题激活任务（后台预编译模板）
+        self._activation: Optional[ThemeActivation] = None
+        self._activation_lock = threading.Lock()
 
     @property
     def current_theme(self) -> Optional[Theme]:
-        """Return the active Theme instance, re-attaching it when needed."""
-        if self._current_theme is not None:
-            if object_session(self._current_theme) is not None:
-                return self._current_theme
+        """Return the active Theme instance, fetching it again only when its data is gone.
+
+        An instance detached from an earlier request's session still carries its
+        loaded columns, so it is reused as is. Only one that was expired (by a
+        commit) before its session closed is fetched again; that copy is expunged
+        so later request commits cannot expire it.
+        """
+        theme = self._current_theme
+        if theme is not None:
+            state = sa_inspect(theme)
+            if state.session is not None or not state.expired_attributes:
+                return theme
         if self._current_theme_id is not None:
-            # Always fetch a fresh instance bound to the current session.
-            self._current_theme = Theme.query.get(self._current_theme_id)
+            self._current_theme = db.session.get(Theme, self._current_theme_id)
             if self._current_theme is not None:
+                db.session.expunge(self._current_theme)
                 return self._current_theme
 
         # 如果当前主题不可用，尝试重新加载一次
@@ -61,10 +335,50 @@ class ThemeManager:
             self.discover_themes()
             self.load_current_theme()
 
-        # 注册请求前钩子，确保多 worker 环境下主题状态同步
+        # 其他 worker 修改了运行时状态（版本号变化）时同步主题状态
+        runtime_state.subscribe(self.ensure_synced)
+
         @app.before_request
-        def _sync_theme_state():
-            self.ensure_synced()
+        def _select_request_theme():
+            if not is_asset_request():
+                self._select_preview_theme()
+
+    @property
+    def request_theme(self) -> Optional[Theme]:
+        """本次请求渲染使用的主题：管理员正在预览的主题，否则为当前主题"""
+        if has_request_context():
+            preview_theme = g.get('_preview_theme')
+            if preview_theme is not None:
+                return preview_theme
+        return self.current_theme
+
+    def _select_preview_theme(self):
+        """
+        处理管理员的主题预览：?preview_theme=<主题名> 开始预览（保存在会话中，之后的页面沿用），
+        ?preview_theme= 结束预览；非管理员忽略该参数
+        """
+        name = request.args.get(PREVIEW_THEME_SESSION_KEY)
+        if name is None and PREVIEW_THEME_SESSION_KEY not in session:
+            return
+
+        from flask_login import current_user
+        if not (current_user.is_authenticated and getattr(current_user, 'is_admin', False)):
+            return
+
+        if name is not None:
+            if name:
+                session[PREVIEW_THEME_SESSION_KEY] = name
+            else:
+                session.pop(PREVIEW_THEME_SESSION_KEY, None)
+
+        name = session.get(PREVIEW_THEME_SESSION_KEY)
+        if not name or name == self._last_active_theme_name:
+            return
+        theme = Theme.query.filter_by(name=name).first()
+        if theme is None:
+            session.pop(PREVIEW_THEME_SESSION_KEY, None)
+            return
+        g._preview_theme = theme
 
     def reload_from_database(self):
         """Refresh cached theme state after database changes."""
@@ -72,10 +386,14 @@ class ThemeManager:
         self._current_theme_id = None
         self._last_active_theme_name = None
         self.theme_hooks.clear()
+        self.clear_environments()
+        self._theme_configs.clear()
         self.load_current_theme()
 
     def ensure_synced(self):
-        """确保内存中的主题状态与数据库一致（用于多 worker 同步）"""
+        """确保内存中的主题状态与数据库一致（运行时状态版本变化时调用，用于多 worker 同步）"""
+        # 主题配置可能已被其他 worker 修改
+        self._theme_configs.clear()
         try:
             from app.models.setting import SettingManager
             db_active_theme = SettingManager.get('active_theme', 'default')
@@ -85,8 +403,11 @@ class ThemeManager:
                 self._current_theme = None
                 self._current_theme_id = None
                 self.theme_hooks.clear()
+                self.clear_environments()
                 self.load_current_theme()
                 self._last_active_theme_name = db_active_theme
+                # 其他 worker 切换了主题：在后台编译新主题的模板，避免首批访客承担编译耗时
+                self.warm_up_in_background(self._current_theme)
         except Exception:
             # 在数据库未初始化等异常情况下忽略
             pass
@@ -170,6 +491,7 @@ class ThemeManager:
             self._last_active_theme_name = theme_name
             self._load_theme_hooks(theme)
             self._load_theme_extensions(theme)
+            self._prepare_environment(theme)
         else:
             # 如果没有找到主题，尝试加载默认主题
             default_theme = Theme.query.filter_by(name='default').first()
@@ -181,6 +503,7 @@ class ThemeManager:
                 self._last_active_theme_name = 'default'
                 self._load_theme_hooks(default_theme)
                 self._load_theme_extensions(default_theme)
+                self._prepare_environment(default_theme)
 
     def _load_theme_hooks(self, theme: Theme):
         """加载主题钩子"""
@@ -536,88 +859,374 @@ class ThemeManager:
 
         return hooks
 
-    def render_template(self, template_name: str, **context):
-        """渲染主题模板"""
-        if not self.current_theme:
-            # 如果没有主题，使用默认模板
-            return render_template_string("<h1>未找到主题</h1>", **context)
+    def _templates_auto_reload(self) -> bool:
+        """模板文件修改后是否自动重新编译（TEMPLATES_AUTO_RELOAD，未设置时跟随 debug）"""
+        app = self.app or current_app
+        auto_reload = app.config.get('TEMPLATES_AUTO_RELOAD')
+        if auto_reload is None:
+            auto_reload = app.debug
+        return bool(auto_reload)
+
+    def _read_theme_json(self, theme_name: str, theme_path: str) -> Dict[str, Any]:
+        """读取主题目录下的 theme.json，不存在或解析失败时返回空字典"""
+        config_path = os.path.join(theme_path, 'theme.json')
+        if not os.path.exists(config_path):
+            return {}
+        try:
+            with open(config_path, 'r', encoding='utf-8') as config_file:
+                return json.load(config_file)
+        except Exception as exc:
+            current_app.logger.warning(f"读取主题 {theme_name} 的 theme.json 失败: {exc}")
+            return {}
+
+    def _get_theme_parent(self, theme_name: str, theme_path: str) -> Optional[str]:
+        """读取 theme.json 的 parent 字段，未声明时非 default 主题以 default 为父主题"""
+        parent = self._read_theme_json(theme_name, theme_path).get('parent')
+        if parent is None and theme_name != 'default':
+            parent = 'default'
+        return parent or None
+
+    def _resolve_theme_chain(self, theme: Theme) -> List[Tuple[str, str]]:
+        """解析主题继承链（当前主题 → 父主题/default），返回 [(主题名, 主题目录)]，每个主题只查询一次"""
+        chain = []
+        seen = set()
+        name, path = theme.name, theme.install_path
+        while name and path:
+            chain.append((name, path))
+            seen.add(name)
+            parent = self._get_theme_parent(name, path)
+            if not parent or parent in seen:
+                break
+            parent_theme = Theme.query.filter_by(name=parent).first()
+            parent_path = parent_theme.install_path if parent_theme else path_utils.project_path('themes', parent)
+            if not os.path.isdir(parent_path):
+                current_app.logger.warning(f"主题 {name} 的父主题 {parent} 不存在")
+                break
+            name, path = parent, parent_path
+        return chain
+
+    def _build_template_chain(self, theme: Theme,
+                              theme_chain: Optional[List[Tuple[str, str]]] = None) -> List[Tuple[str, BaseLoader]]:
+        """构建模板加载链（当前主题 → 父主题/default → 核心）"""
+        if theme_chain is None:
+            theme_chain = self._resolve_theme_chain(theme)
+        chain = [(name, FileSystemLoader(os.path.join(path, 'templates'))) for name, path in theme_chain]
+        core_loader = (self.app or current_app).jinja_loader
+        if core_loader is not None and CORE_TEMPLATE_SOURCE not in {name for name, _ in theme_chain}:
+            chain.append((CORE_TEMPLATE_SOURCE, core_loader))
+        return chain
+
+    def _build_asset_manifest(self, theme_chain: List[Tuple[str, str]], auto_reload: bool) -> AssetManifest:
+        """构建继承链的静态资源清单（内容指纹、theme.json 中的 asset_bundles 合并文件）"""
+        chain = []
+        for name, path in theme_chain:
+            bundles = self._read_theme_json(name, path).get('asset_bundles') or {}
+            if not isinstance(bundles, dict):
+                current_app.logger.warning(f"主题 {name} 的 asset_bundles 应为 {{合并文件: [文件列表]}}")
+                bundles = {}
+            chain.append((name, os.path.join(path, 'static'), bundles))
+        minify = bool((self.app or current_app).config.get('THEME_ASSET_MINIFY'))
+        return AssetManifest(chain, minify=minify, auto_reload=auto_reload)
+
+    def _bytecode_cache(self, theme: Theme, cache_dir: Optional[str] = None) -> Optional[ThemeBytecodeCache]:
+        """
+        获取主题的字节码缓存，目录按主题名和版本区分
+
+        Args:
+            theme: 主题
+            cache_dir: 缓存根目录，默认为 THEME_BYTECODE_CACHE_DIR，为空时不使用缓存
+        """
+        cache_dir = cache_dir or (self.app or current_app).config.get('THEME_BYTECODE_CACHE_DIR')
+        if not cache_dir:
+            return None
+        directory = os.path.join(cache_dir, secure_filename(f"{theme.name}-{theme.version}") or theme.name)
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            if not os.path.isdir(directory):
+                current_app.logger.warning(f"无法创建主题 {theme.name} 的模板字节码缓存目录: {directory}")
+                return None
+        return ThemeBytecodeCache(directory)
+
+    def _create_environment(self, theme: Theme, cache_dir: Optional[str] = None) -> Environment:
+        """创建按主题继承链加载模板的 Jinja 环境并注入全局函数"""
+        auto_reload = self._templates_auto_reload()
+        theme_chain = self._resolve_theme_chain(theme)
+        env = ThemeEnvironment(
+            loader=ThemeTemplateLoader(self._build_template_chain(theme, theme_chain), auto_reload=auto_reload),
+            auto_reload=auto_reload,
+            bytecode_cache=self._bytecode_cache(theme, cache_dir)
+        )
 
-        template_path = os.path.join(self.current_theme.install_path, 'templates', template_name)
+        # theme.json 中声明可以流式输出的模板（"*" 表示全部）
+        theme_json = self._read_theme_json(theme.name, theme.install_path) if theme.install_path else {}
+        env.stream_templates = frozenset(theme_json.get('stream_templates') or [])
+        env.flash_usage = {}
+        # 静态资源清单随环境一起在主题激活时构建
+        env.assets = self._build_asset_manifest(theme_chain, auto_reload)
 
-        # 如果当前主题没有该模板，尝试回退到default主题
-        if not os.path.exists(template_path):
-            default_theme = Theme.query.filter_by(name='default').first()
-            if default_theme and default_theme.name != self.current_theme.name:
-                default_template_path = os.path.join(default_theme.install_path, 'templates', template_name)
-                if os.path.exists(default_template_path):
-                    template_path = default_template_path
-                    current_app.logger.info(f"主题 {self.current_theme.name} 缺少模板 {template_name}，回退到default主题")
+        env.globals['get_theme_hooks'] = self.get_theme_hooks
+        env.globals['asset_url'] = env.assets.url
+        env.globals['get_theme_config'] = self.get_theme_config
+        env.globals['url_for'] = self._url_for_helper
+
+        try:
+            from flask import get_flashed_messages, request, session, g
+
+            env.globals['get_flashed_messages'] = get_flashed_messages
+            env.globals['request'] = request
+            env.globals['session'] = session
+            env.globals['g'] = g
+            env.globals['config'] = (self.app or current_app).config
+        except Exception:
+            pass
+
+        return env
+
+    def get_environment(self, theme: Theme) -> Environment:
+        """
+        获取主题使用的 Jinja 环境，同一主题复用同一个环境及其模板缓存
+
+        当前主题的环境常驻；预览的其他主题放在有界 LRU 中，来回切换预览不会重新编译模板
+        """
+        env = self._environments.get(theme.name)
+        if env is None and self._current_theme_id is not None and theme.id != self._current_theme_id:
+            env = self._preview_environments.get(theme.name)
+            if env is None:
+                env = self._create_environment(theme)
+                self._preview_environments.set(theme.name, env)
+            return env
+        if env is None:
+            with self._environment_lock:
+                env = self._environments.get(theme.name)
+                if env is None:
+                    env = self._create_environment(theme)
+                    self._environments[theme.name] = env
+        return env
+
+    def _prepare_environment(self, theme: Theme):
+        """主题加载时预先创建其 Jinja 环境并解析继承链"""
+        if not self.app or not theme:
+            return
+        self.get_environment(theme)
+
+    def precompile_templates(self, theme: Theme, cache_dir: Optional[str] = None) -> Tuple[int, Dict[str, str]]:
+        """
+        预编译主题继承链中的全部模板并写入字节码缓存
+
+        Args:
+            theme: 主题
+            cache_dir: 缓存根目录，默认为 THEME_BYTECODE_CACHE_DIR
+
+        Returns:
+            tuple: (编译成功的模板数, {模板名: 错误信息})
+        """
+        env = self._create_environment(theme, cache_dir)
+        if env.bytecode_cache is None:
+            raise RuntimeError('未配置模板字节码缓存目录（THEME_BYTECODE_CACHE_DIR）')
+        return self._compile_templates(env)
+
+    @staticmethod
+    def _compile_templates(env: Environment, activation: Optional[ThemeActivation] = None) -> Tuple[int, Dict[str, str]]:
+        """
+        加载并编译环境中继承链上的全部模板（包括 admin/ 等子目录），编译结果留在环境的模板缓存中
+
+        Returns:
+            tuple: (编译成功的模板数, {模板名: 错误信息})
+        """
+        compiled = 0
+        errors = {}
+        for name in env.loader.iter_qualified_names():
+            if not name.endswith(PRECOMPILE_TEMPLATE_EXTENSIONS):
+                continue
+            try:
+                env.get_template(name)
+                compiled += 1
+            except Exception as exc:
+                errors[name] = str(exc)
+            if activation is not None:
+                activation.progress(compiled)
+        return compiled, errors
+
+    def warm_up_in_background(self, theme: Optional[Theme]):
+        """在后台线程中编译主题环境的全部模板（模板缓存是线程安全的，可以与请求并行）"""
+        if not self.app or not theme:
+            return
+        env = self.get_environment(theme)
+        app = self.app
+
+        def run():
+            with app.app_context():
+                compiled, errors = self._compile_templates(env)
+                for name, error in errors.items():
+                    app.logger.warning(f"主题 {theme.name} 的模板 {name} 编译失败: {error}")
 
-        # 在渲染前补充常用上下文变量，避免主题模板因缺少变量而报错
+        threading.Thread(target=run, name=f'theme-warm-up-{theme.name}', daemon=True).start()
+
+    def clear_environments(self):
+        """丢弃已缓存的 Jinja 环境（主题切换或重新加载时调用）"""
+        with self._environment_lock:
+            self._environments.clear()
+        self._preview_environments.clear()
+
+    def _default_context_loaders(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """视图未提供时注入的默认上下文变量及其加载函数，加载失败时返回空值"""
         try:
             from app.models.post import Post, Category, Tag
             from app.models.setting import SettingManager
-            from flask_login import current_user as flask_current_user
         except Exception:
             Post = Category = Tag = None
             SettingManager = None
-            flask_current_user = None
 
-        if 'recent_posts' not in context:
+        def recent_posts():
             try:
-                if Post is not None:
-                    context['recent_posts'] = Post.query.filter_by(status='published').order_by(
-                        Post.published_at.desc()
-                    ).limit(5).all()
-                else:
-                    context['recent_posts'] = []
+                if Post is None:
+                    return []
+                return Post.query.filter_by(status='published').order_by(
+                    Post.published_at.desc()
+                ).limit(5).all()
             except Exception:
-                context['recent_posts'] = []
+                return []
 
-        if 'categories' not in context:
+        def categories():
             try:
-                if Category is not None:
-                    context['categories'] = Category.query.filter_by(is_active=True).all()
-                else:
-                    context['categories'] = []
+                return Category.query.filter_by(is_active=True).all() if Category is not None else []
             except Exception:
-                context['categories'] = []
+                return []
 
-        if 'tags' not in context:
+        def tags():
             try:
-                if Tag is not None:
-                    context['tags'] = Tag.query.all()
-                else:
-                    context['tags'] = []
+                return Tag.query.all() if Tag is not None else []
             except Exception:
-                context['tags'] = []
+                return []
 
-        if 'site_title' not in context:
+        def site_title():
             try:
-                context['site_title'] = SettingManager.get('site_title', 'Noteblog') if SettingManager else None
+                return SettingManager.get('site_title', 'Noteblog') if SettingManager else None
             except Exception:
-                context['site_title'] = None
+                return None
 
-        if 'page_title' not in context:
+        def page_title():
+            # 视图提供了 site_title 时以其为准，否则读取站点标题设置
+            base_title = context.get('site_title')
             try:
-                base_title = context.get('site_title')
                 if not base_title:
                     base_title = SettingManager.get('site_title', 'Noteblog') if SettingManager else 'Noteblog'
-                context['page_title'] = base_title
+                return base_title
             except Exception:
-                context['page_title'] = context.get('site_title') or 'Noteblog'
+                return base_title or 'Noteblog'
 
-        if 'site_description' not in context:
+        def site_description():
             try:
-                context['site_description'] = SettingManager.get('site_description', '') if SettingManager else ''
+                return SettingManager.get('site_description', '') if SettingManager else ''
             except Exception:
-                context['site_description'] = ''
+                return ''
 
-        if 'allow_comments' not in context:
+        def allow_comments():
             try:
-                context['allow_comments'] = SettingManager.get('allow_comments', True) if SettingManager else True
+                return SettingManager.get('allow_comments', True) if SettingManager else True
             except Exception:
-                context['allow_comments'] = True
+                return True
+
+        def sidebar():
+            from app.services.sidebar_service import sidebar_service
+            return sidebar_service.get_data()
+
+        return {
+            'sidebar': sidebar,
+            'recent_posts': recent_posts,
+            'categories': categories,
+            'tags': tags,
+            'site_title': site_title,
+            'page_title': page_title,
+            'site_description': site_description,
+            'allow_comments': allow_comments
+        }
+
+    @staticmethod
+    def _lazy_default(name: str, loader, used: set) -> LocalProxy:
+        """
+        包装默认上下文变量：模板首次读取时才加载，结果在同一请求内（g）复用
+
+        Args:
+            name: 变量名
+            loader: 加载函数
+            used: 记录本次渲染实际读取了哪些默认变量
+        """
+        def resolve():
+            used.add(name)
+            values = g.setdefault('_theme_default_context', {})
+            if name not in values:
+                values[name] = loader()
+            return values[name]
+
+        return LocalProxy(resolve)
+
+    def context_report_enabled(self) -> bool:
+        """是否统计模板实际使用的默认上下文（THEME_CONTEXT_REPORT，未设置时跟随 debug）"""
+        app = self.app or current_app
+        enabled = app.config.get('THEME_CONTEXT_REPORT')
+        if enabled is None:
+            enabled = app.debug
+        return bool(enabled)
+
+    def _record_context_usage(self, template_name: str, injected: List[str], used: set):
+        """记录模板本次渲染注入及实际读取的默认上下文变量（调试报告）"""
+        if not self.context_report_enabled():
+            return
+        entry = self._context_usage.setdefault(template_name, {'renders': 0, 'injected': set(), 'used': {}})
+        entry['renders'] += 1
+        entry['injected'].update(injected)
+        for name in used:
+            entry['used'][name] = entry['used'].get(name, 0) + 1
+        current_app.logger.debug(
+            f"模板 {template_name} 使用的默认上下文: {', '.join(sorted(used)) or '无'}；"
+            f"未使用: {', '.join(name for name in injected if name not in used) or '无'}"
+        )
+
+    def get_context_usage_report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各模板实际使用的默认上下文变量统计
+
+        Returns:
+            dict: {模板名: {'renders': 渲染次数, 'used': {变量名: 读取的渲染次数},
+                   'unused': [注入后从未读取的变量]}}
+        """
+        report = {}
+        for template_name, entry in sorted(self._context_usage.items()):
+            report[template_name] = {
+                'renders': entry['renders'],
+                'used': dict(sorted(entry['used'].items())),
+                'unused': sorted(name for name in entry['injected'] if name not in entry['used'])
+            }
+        return report
+
+    def _prepare_render(self, template_name: str, context: Dict[str, Any]):
+        """
+        解析模板并补充默认上下文
+
+        Returns:
+            tuple: (env, 解析后的模板名或 None, 上下文, 注入的默认变量, 已读取的默认变量集合)
+        """
+        # 按主题继承链解析模板，当前主题缺少的模板回退到父主题/default
+        env = self.get_environment(self.request_theme)
+        resolved_name = env.loader.resolve(template_name)
+
+        # 在渲染前补充常用上下文变量，避免主题模板因缺少变量而报错；
+        # 视图未提供的变量以惰性代理注入，只有模板读取时才查询，同一请求内复用
+        try:
+            from app.models.setting import SettingManager
+            from flask_login import current_user as flask_current_user
+        except Exception:
+            SettingManager = None
+            flask_current_user = None
+
+        injected_defaults = []
+        used_defaults = set()
+        for name, loader in self._default_context_loaders(context).items():
+            if name not in context:
+                context[name] = self._lazy_default(name, loader, used_defaults)
+                injected_defaults.append(name)
 
         if 'current_user' not in context:
             context['current_user'] = flask_current_user
@@ -632,55 +1241,158 @@ class ThemeManager:
         from app.services.plugin_manager import plugin_manager
         context = plugin_manager.apply_filters('template_context', context)
 
-        if os.path.exists(template_path):
-            # 使用 Jinja2 渲染模板
-            from jinja2 import Environment, FileSystemLoader
-
-            if template_path.startswith(os.path.join(self.current_theme.install_path, 'templates')):
-                template_dir = os.path.join(self.current_theme.install_path, 'templates')
-            else:
-                default_theme = Theme.query.filter_by(name='default').first()
-                if default_theme:
-                    template_dir = os.path.join(default_theme.install_path, 'templates')
-                else:
-                    template_dir = os.path.join(self.current_theme.install_path, 'templates')
-
-            env = Environment(loader=FileSystemLoader(template_dir))
+        return env, resolved_name, context, injected_defaults, used_defaults
 
-            env.globals['get_theme_hooks'] = self.get_theme_hooks
-            env.globals['get_theme_config'] = self.get_theme_config
-            env.globals['url_for'] = self._url_for_helper
-
-            try:
-                from flask import get_flashed_messages, request, session, g
+    def render_template(self, template_name: str, **context):
+        """渲染主题模板"""
+        if not self.request_theme:
+            # 如果没有主题，使用默认模板
+            return render_template_string("<h1>未找到主题</h1>", **context)
 
-                env.globals['get_flashed_messages'] = get_flashed_messages
-                env.globals['request'] = request
-                env.globals['session'] = session
-                env.globals['g'] = g
-                env.globals['config'] = current_app.config
-            except Exception:
-                pass
+        env, resolved_name, context, injected_defaults, used_defaults = self._prepare_render(template_name, context)
 
+        if resolved_name is not None:
             try:
-                template = env.get_template(template_name)
-                return template.render(**context)
+                template = env.get_template(resolved_name)
+                html = template.render(**context)
+                self._record_context_usage(template_name, injected_defaults, used_defaults)
+                return html
             except Exception as e:
                 current_app.logger.error(f"渲染模板 {template_name} 失败: {e}")
                 return f"<h1>模板渲染错误</h1><p>{e}</p>"
         else:
-            return f"<h1>模板未找到</h1><p>{template_path}</p>"
+            return f"<h1>模板未找到</h1><p>{template_name}</p>"
+
+    def streaming_enabled(self) -> bool:
+        """是否启用流式渲染（THEME_STREAMING，默认关闭）"""
+        return bool((self.app or current_app).config.get('THEME_STREAMING'))
+
+    def is_stream_safe(self, template_name: str) -> bool:
+        """当前主题是否在 theme.json 的 stream_templates 中声明该模板可以流式输出"""
+        theme = self.request_theme
+        if not theme:
+            return False
+        stream_templates = getattr(self.get_environment(theme), 'stream_templates', ())
+        return '*' in stream_templates or template_name in stream_templates
+
+    def _reads_flashed_messages(self, env: Environment, template_name: str) -> bool:
+        """模板及其继承、包含的模板中是否调用了 get_flashed_messages（模板不自动重载时按环境缓存）"""
+        cached = env.flash_usage.get(template_name)
+        if cached is not None:
+            return cached
+
+        reads = False
+        pending = [template_name]
+        seen = set()
+        while pending and not reads:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            try:
+                source = env.loader.get_source(env, name)[0]
+            except TemplateNotFound:
+                continue
+            reads = 'get_flashed_messages' in source
+            pending.extend(
+                env.join_path(reference, name)
+                for reference in meta.find_referenced_templates(env.parse(source))
+                if reference
+            )
+
+        if not env.auto_reload:
+            env.flash_usage[template_name] = reads
+        return reads
+
+    def render_response(self, template_name: str, **context):
+        """
+        渲染主题模板作为视图返回值
+
+        启用 THEME_STREAMING 且主题声明模板可流式输出时返回流式 Response，
+        否则与 render_template 相同，返回完整的 HTML 字符串
+        """
+        if (not has_request_context() or not self.request_theme
+                or not self.streaming_enabled() or not self.is_stream_safe(template_name)):
+            return self.render_template(template_name, **context)
+        return self.stream_template(template_name, **context)
+
+    def stream_template(self, template_name: str, **context) -> Response:
+        """
+        以流式 Response 渲染主题模板
+
+        模板在返回响应前完成加载和编译，找不到模板或语法错误时仍返回普通错误页；
+        输出在 </head> 之后立即发送，之后每累计 THEME_STREAM_BUFFER_SIZE 个字符发送一次。
+        状态码和响应头在输出开始前已经发送，渲染中途出错只能记录日志并结束输出。
+        """
+        env, resolved_name, context, injected_defaults, used_defaults = self._prepare_render(template_name, context)
+        if resolved_name is None:
+            return Response(f"<h1>模板未找到</h1><p>{template_name}</p>", mimetype='text/html')
+        try:
+            template = env.get_template(resolved_name)
+        except Exception as e:
+            current_app.logger.error(f"渲染模板 {template_name} 失败: {e}")
+            return Response(f"<h1>模板渲染错误</h1><p>{e}</p>", mimetype='text/html')
+
+        # 会话 Cookie 在输出开始前已经写出，模板会显示闪现消息时需要提前从会话中取出（结果缓存在请求上下文中）
+        if self._reads_flashed_messages(env, resolved_name):
+            get_flashed_messages()
+
+        # 视图返回后 Flask-SQLAlchemy 会在应用上下文结束时关闭会话，模板中的延迟加载随之失败；
+        # 把本次请求的会话从作用域注册表中取出交给输出过程，输出结束或连接关闭时再关闭
+        db_session = db.session()
+        db.session.registry.clear()
+
+        def generate():
+            db.session.registry.set(db_session)
+            chunks = []
+            size = 0
+            head_sent = False
+            try:
+                for chunk in template.generate(**context):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if not head_sent and '</head>' in chunk:
+                        head_sent = True
+                    elif size < THEME_STREAM_BUFFER_SIZE:
+                        continue
+                    yield ''.join(chunks)
+                    chunks = []
+                    size = 0
+                self._record_context_usage(template_name, injected_defaults, used_defaults)
+            except Exception as e:
+                current_app.logger.error(f"流式渲染模板 {template_name} 失败: {e}")
+            if chunks:
+                yield ''.join(chunks)
+
+        response = Response(stream_with_context(generate()), mimetype='text/html')
+        response.call_on_close(db_session.close)
+        # 避免 nginx 等反向代理缓冲整个响应
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
     def get_theme_config(self):
-        """获取主题配置"""
-        if self.current_theme:
-            return self.current_theme.get_config()
-        return {}
+        """
+        获取本次请求所用主题（当前主题或管理员预览的主题）的配置
+
+        模板会在循环中反复调用，返回按主题缓存的已解析字典（只读），不再每次解析 JSON
+        """
+        theme = self.request_theme
+        if not theme:
+            return {}
+        config = self._theme_configs.get(theme.name)
+        if config is None:
+            config = theme.get_config()
+            self._theme_configs[theme.name] = config
+        return config
 
     def set_theme_config(self, config_dict: Dict):
         """设置主题配置"""
-        if self.current_theme:
-            self.current_theme.set_config(config_dict)
+        theme = self.current_theme
+        if theme:
+            # 缓存的主题实例可能已脱离会话，通过当前会话中的实例写入
+            db.session.get(Theme, theme.id).set_config(config_dict)
+            self._theme_configs[theme.name] = dict(config_dict)
+            runtime_state.bump()
 
     def get_theme_info(self, theme_name: str = None):
         """获取主题信息"""
@@ -699,19 +1411,117 @@ class ThemeManager:
         return [theme.to_dict() for theme in themes]
 
     def activate_theme(self, theme_name: str):
-        """激活主题"""
-        theme = Theme.query.filter_by(name=theme_name).first()
-        if theme:
+        """
+        激活主题：先编译新主题的全部模板，全部通过后再切换
+
+        Returns:
+            bool: 是否已启用，编译失败的模板见 get_activation()
+        """
+        activation = ThemeActivation(theme_name)
+        activation.save()
+        with self._activation_lock:
+            self._activation = activation
+        self._run_activation(activation)
+        return activation.status == 'activated'
+
+    def start_activation(self, theme_name: str, wait: Optional[float] = None) -> ThemeActivation:
+        """
+        在后台线程中激活主题，期间继续使用原主题
+
+        Args:
+            theme_name: 主题名称
+            wait: 最多等待完成的秒数，None 表示立即返回
+
+        Returns:
+            ThemeActivation: 激活任务；同一主题正在激活（包括在其他 worker 中）时返回已有任务
+        """
+        with self._activation_lock:
+            activation = self._activation
+            if activation is None or activation.finished or activation.theme_name != theme_name:
+                shared = ThemeActivation.load()
+                if shared is not None and not shared.finished and shared.theme_name == theme_name:
+                    # 其他 worker 正在激活，快照不会更新，不必等待
+                    return shared
+
+                activation = ThemeActivation(theme_name)
+                activation.save()
+                self._activation = activation
+                app = self.app
+
+                def run():
+                    with app.app_context():
+                        self._run_activation(activation)
+
+                threading.Thread(target=run, name=f'theme-activation-{theme_name}', daemon=True).start()
+
+        if wait:
+            activation.done.wait(wait)
+        return activation
+
+    def get_activation(self) -> Optional[ThemeActivation]:
+        """
+        最近一次主题激活任务
+
+        本 worker 正在执行的任务直接返回；否则读取 theme_activation 设置，
+        激活由其他 worker 执行时同样可以看到进度与结果
+        """
+        local = self._activation
+        if local is not None and not local.finished:
+            return local
+        shared = ThemeActivation.load()
+        if shared is not None and (local is None or shared.started_at >= local.started_at):
+            return shared
+        return local
+
+    def _run_activation(self, activation: ThemeActivation):
+        """编译新主题的模板，没有错误时启用主题并原子地替换 Jinja 环境"""
+        try:
+            theme = Theme.query.filter_by(name=activation.theme_name).first()
+            if not theme:
+                activation.errors[''] = f'主题 {activation.theme_name} 不存在'
+                activation.finish('failed')
+                return
+
+            # 预览过的主题复用其环境，已编译的模板不必重新编译
+            env = self._preview_environments.get(theme.name) or self._create_environment(theme)
+            activation.compiled, errors = self._compile_templates(env, activation)
+            # 只有主题自己的模板出错时才阻止激活；继承自父主题的模板与当前线上一致，只记录日志
+            for name, error in errors.items():
+                if env.loader.source_of(env, name) == theme.name:
+                    activation.errors[name] = error
+                else:
+                    current_app.logger.warning(f"主题 {theme.name} 继承的模板 {name} 编译失败，不影响激活: {error}")
+            if activation.errors:
+                current_app.logger.warning(
+                    f"主题 {theme.name} 有 {len(activation.errors)} 个模板编译失败，未切换主题"
+                )
+                activation.finish('failed')
+                return
+
             theme.activate()
-            self.current_theme = theme
+            with self._environment_lock:
+                previous_environments = self._environments
+                self._environments = {theme.name: env}
+                self._theme_configs = {}
+                self.current_theme = theme
+            self._preview_environments.delete(theme.name)
+            # 原主题的环境转入预览缓存，切换回去或预览时不必重新编译
+            for name, previous_env in previous_environments.items():
+                if name != theme.name:
+                    self._preview_environments.set(name, previous_env)
+            self._last_active_theme_name = theme.name
             self._load_theme_hooks(theme)
             self._load_theme_extensions(theme)
 
             from app.models.setting import SettingManager
-            SettingManager.set('active_theme', theme_name)
-
-            return True
-        return False
+            SettingManager.set('active_theme', theme.name)
+            runtime_state.bump()
+            activation.finish('activated')
+        except Exception as exc:
+            current_app.logger.error(f"激活主题 {activation.theme_name} 失败: {exc}")
+            db.session.rollback()
+            activation.errors[''] = str(exc)
+            activation.finish('failed')
 
     def get_current_theme(self):
         """获取当前主题"""
@@ -719,14 +1529,38 @@ class ThemeManager:
 
     def get_theme_static_url(self, static_file: str):
         """获取主题静态文件URL"""
-        if self.current_theme:
-            return f"/themes/{self.current_theme.name}/static/{static_file}"
+        if self.request_theme:
+            return f"/themes/{self.request_theme.name}/static/{static_file}"
         return f"/themes/default/static/{static_file}"
 
+    def find_asset(self, theme_name: str, filename: str) -> Optional[ThemeAsset]:
+        """
+        按URL路径查找静态资源的当前版本
+
+        先查当前主题继承链的清单，再查该主题的预览环境；不依赖请求上下文，
+        静态文件请求不执行预览主题选择，快速通道中也可以调用
+
+        Args:
+            theme_name: URL 中的主题名
+            filename: URL 中相对 static 目录的路径（可以带已过期的指纹）
+
+        Returns:
+            ThemeAsset: 资源；不在已知清单中时返回 None
+        """
+        theme = self.current_theme
+        if theme is None:
+            return None
+        asset = self.get_environment(theme).assets.lookup(theme_name, filename)
+        if asset is None:
+            preview_env = self._preview_environments.get(theme_name)
+            if preview_env is not None:
+                asset = preview_env.assets.lookup(theme_name, filename)
+        return asset
+
     def get_theme_template_path(self, template_name: str):
         """获取主题模板路径"""
-        if self.current_theme:
-            return os.path.join(self.current_theme.install_path, 'templates', template_name)
+        if self.request_theme:
+            return os.path.join(self.request_theme.install_path, 'templates', template_name)
         return None
 
     def theme_exists(self, theme_name: str):
@@ -0,0 +1,37 @@
+"""Helpers for bringing an existing database schema up to date with the models."""
+from __future__ import annotations
+
+from typing import List
+
+from app import db
+
+
+def add_missing_columns() -> List[str]:
+    """Add nullable model columns that are missing from existing tables.
+
+    ``db.create_all()`` only creates missing tables, so databases created by an
+    older release never receive columns added to existing models later. Only
+    nullable columns are added (existing rows get NULL); anything else needs a
+    real migration. Returns the ``table.column`` names that were added.
+    """
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable or column.primary_key:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                conn.exec_driver_sql(
+                    f'ALTER TABLE {preparer.quote(table.name)} '
+                    f'ADD COLUMN {preparer.quote(column.name)} {column_type}'
+                )
+                added.append(f'{table.name}.{column.name}')
+
+    return added
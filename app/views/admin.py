@@ -11,11 +11,14 @@ from app import db
 from app.models.user import User
 from app.models.post import Post, Category, Tag
 from app.models.comment import Comment
+from app.models.comment_render import invalidate_comment_html
+from app.services.sidebar_service import sidebar_service
 from app.models.plugin import Plugin
 from app.models.theme import Theme
 from app.models.setting import SettingManager
+from app.services.hook_profiler import hook_profiler
 from app.services.plugin_manager import plugin_manager
-from app.services.theme_manager import theme_manager
+from app.services.theme_manager import theme_manager, THEME_ACTIVATION_WAIT
 from app.utils import path_utils
 from app.services.backup_service import (
     create_backup_archive,
@@ -470,6 +473,7 @@ def create_category():
         
         db.session.add(category)
         db.session.commit()
+        sidebar_service.invalidate()
         
         flash('分类创建成功', 'success')
         return redirect(url_for('admin.categories'))
@@ -527,6 +531,7 @@ def edit_category(category_id):
         category.sort_order = sort_order
         
         db.session.commit()
+        sidebar_service.invalidate()
         
         flash('分类更新成功', 'success')
         return redirect(url_for('admin.categories'))
@@ -556,6 +561,7 @@ def delete_category(category_id):
     
     db.session.delete(category)
     db.session.commit()
+    sidebar_service.invalidate()
     
     flash('分类删除成功', 'success')
     return redirect(url_for('admin.categories'))
@@ -639,6 +645,7 @@ def mark_comment_spam(comment_id):
 def delete_comment(comment_id):
     """删除评论"""
     comment = Comment.query.get_or_404(comment_id)
+    reply_ids = [row.id for row in Comment.query.with_entities(Comment.id).filter_by(parent_id=comment_id)]
     
     # 删除该评论的所有回复
     Comment.query.filter_by(parent_id=comment_id).delete()
@@ -646,6 +653,7 @@ def delete_comment(comment_id):
     # 删除评论本身
     db.session.delete(comment)
     db.session.commit()
+    invalidate_comment_html(comment_id, *reply_ids)
     
     flash('评论删除成功', 'success')
     return redirect(url_for('admin.comments'))
@@ -825,6 +833,34 @@ def configure_plugin(plugin_name):
     
     return theme_manager.render_template('admin/plugin_configure.html', **context)
 
+@bp.route('/plugins/performance')
+@login_required
+@admin_required
+def plugins_performance():
+    """插件钩子耗时报告（当前 worker）"""
+    context = _get_base_context('插件性能')
+    context.update({
+        'report': hook_profiler.report(),
+    })
+    
+    return theme_manager.render_template('admin/plugin_performance.html', **context)
+
+@bp.route('/api/plugins/performance')
+@login_required
+@admin_required
+def api_plugins_performance():
+    """API：插件钩子耗时报告（当前 worker）"""
+    return jsonify(hook_profiler.report())
+
+@bp.route('/plugins/performance/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_plugins_performance():
+    """清空插件钩子耗时统计"""
+    hook_profiler.reset()
+    flash('插件性能统计已清空', 'success')
+    return redirect(url_for('admin.plugins_performance'))
+
 # 主题管理
 @bp.route('/themes')
 @login_required
@@ -836,6 +872,7 @@ def themes():
     context = _get_base_context('主题管理')
     context.update({
         'themes': themes,
+        'activation': theme_manager.get_activation(),
     })
     
     return theme_manager.render_template('admin/themes.html', **context)
@@ -844,14 +881,25 @@ def themes():
 @login_required
 @admin_required
 def activate_theme(theme_name):
-    """激活主题"""
-    if theme_manager.activate_theme(theme_name):
+    """激活主题（后台预编译全部模板，全部通过后才切换）"""
+    activation = theme_manager.start_activation(theme_name, wait=THEME_ACTIVATION_WAIT)
+    if activation.status == 'activated':
         flash('主题激活成功', 'success')
+    elif activation.status == 'failed':
+        flash(f'主题激活失败，{len(activation.errors)} 个模板存在错误，当前主题未改变', 'error')
     else:
-        flash('主题激活失败', 'error')
+        flash('正在预编译主题模板，全部通过后自动启用', 'info')
     
     return redirect(url_for('admin.themes'))
 
+@bp.route('/themes/activation')
+@login_required
+@admin_required
+def theme_activation_status():
+    """最近一次主题激活任务的进度与模板错误"""
+    activation = theme_manager.get_activation()
+    return jsonify(activation.to_dict() if activation else {})
+
 # 设置管理
 @bp.route('/settings')
 @login_required
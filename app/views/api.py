@@ -2,14 +2,16 @@
 API 视图
 """
 from datetime import datetime
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import User
 from app.models.post import Post, Category, Tag
 from app.models.comment import Comment
+from app.models.comment_render import invalidate_comment_html
 from app.models.setting import SettingManager
 from app.services.plugin_manager import plugin_manager
+from app.services.markdown_service import markdown_service
 
 bp = Blueprint('api', __name__)
 
@@ -84,7 +86,8 @@ def api_post(post_id):
         if not current_user.is_authenticated or (not current_user.is_admin and post.author_id != current_user.id):
             return api_response(message='无权访问', status=403)
     
-    return api_response(data=post.to_dict())
+    include_html = request.args.get('include_html', '').lower() in ('1', 'true', 'yes')
+    return api_response(data=post.to_dict(include_html=include_html))
 
 @bp.route('/posts', methods=['POST'])
 @login_required
@@ -487,6 +490,7 @@ def api_update_comment(comment_id):
     if requires_review:
         comment.is_approved = False
     db.session.commit()
+    invalidate_comment_html(comment.id)
 
     plugin_manager.do_action('after_comment_update', comment=comment)
 
@@ -622,9 +626,17 @@ def api_stats():
             'spam': Comment.query.filter_by(is_spam=True).count()
         },
         'categories': Category.query.count(),
-        'tags': Tag.query.count()
+        'tags': Tag.query.count(),
+        'markdown': {
+            'highlight_cache': markdown_service.get_highlight_stats(),
+            'block_cache': markdown_service.get_block_stats()
+        }
     }
     
+    theme_manager = getattr(current_app, 'theme_manager', None)
+    if theme_manager is not None and theme_manager.context_report_enabled():
+        stats['theme_context_usage'] = theme_manager.get_context_usage_report()
+    
     return api_response(data=stats)
 
 # 错误处理
@@ -3,15 +3,21 @@
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm.attributes import set_committed_value
 from app import db
 from app.models.post import Post, Category, Tag, post_tags
 from app.models.comment import Comment
+from app.models.comment_render import CommentRender
+from app.models.post_render import PostRender
 from app.models.setting import SettingManager
 from app.services.plugin_manager import plugin_manager
 from app.services.theme_manager import theme_manager
 
 bp = Blueprint('main', __name__)
 
+# 前台页面提供给主题模板的插件钩子（模板读取时才执行）
+PAGE_TEMPLATE_HOOKS = ('content_top', 'sidebar_bottom', 'head_assets', 'scripts_assets')
+
 @bp.route('/')
 def index():
     """首页"""
@@ -22,10 +28,8 @@ def index():
     posts = Post.query.filter_by(status='published').order_by(
         Post.is_top.desc(), Post.published_at.desc()
     ).paginate(page=page, per_page=per_page, error_out=False)
-    
-    # 获取分类和标签
-    categories = Category.query.filter_by(is_active=True).all()
-    tags = Tag.query.all()
+    # 文章卡片读取摘要等渲染结果，一次性加载
+    PostRender.prefetch(posts.items)
     
     # 触发钩子
     plugin_manager.do_action('before_index_render', posts=posts)
@@ -34,25 +38,18 @@ def index():
     site_brand = SettingManager.get('site_title', 'Noteblog')
     context = {
         'posts': posts,
-        'categories': categories,
-        'tags': tags,
         'site_title': site_brand,
         'page_title': site_brand,
         'site_description': SettingManager.get('site_description', ''),
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
     
     # 应用过滤器
     context = plugin_manager.apply_filters('index_context', context)
     
     # 使用主题模板渲染
-    return theme_manager.render_template('index.html', **context)
+    return theme_manager.render_response('index.html', **context)
 
 @bp.route('/post/<slug>')
 def post_detail(slug):
@@ -62,8 +59,10 @@ def post_detail(slug):
     # 增加浏览量
     post.increment_view()
     
-    # 获取评论
+    # 获取评论（回复与顶级评论同属本文，一次性设置回复列表并加载渲染结果）
     comments = post.get_approved_comments()
+    Comment.attach_replies(comments)
+    CommentRender.prefetch(comments)
     
     # 计算上一条和下一条文章用于导航
     post_time = post.published_at or post.created_at
@@ -107,22 +106,21 @@ def post_detail(slug):
         'site_title': site_brand,
         'page_title': f"{post.title} - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
     
     # 应用过滤器
     context = plugin_manager.apply_filters('post_context', context, post)
     
     # 应用内容和标题过滤器
-    post.content = plugin_manager.apply_filters('post_content', post.content, post)
+    content = plugin_manager.apply_filters('post_content', post.content, post)
+    if content != post.content:
+        # 过滤后的内容只用于本次渲染：不记为修改（不会刷新到 posts 表），渲染结果只缓存在实例上
+        set_committed_value(post, 'content', content)
+        PostRender.render_transient(post)
     context['page_title'] = plugin_manager.apply_filters('page_title', context['page_title'])
     
-    return theme_manager.render_template('post.html', **context)
+    return theme_manager.render_response('post.html', **context)
 
 @bp.route('/category/<slug>')
 def category(slug):
@@ -136,6 +134,7 @@ def category(slug):
     ).order_by(Post.published_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
+    PostRender.prefetch(posts.items)
     
     site_brand = SettingManager.get('site_title', 'Noteblog')
     context = {
@@ -144,15 +143,10 @@ def category(slug):
         'site_title': site_brand,
         'page_title': f"{category.name} - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
     
-    return theme_manager.render_template('category.html', **context)
+    return theme_manager.render_response('category.html', **context)
 
 @bp.route('/tag/<slug>')
 def tag(slug):
@@ -167,6 +161,7 @@ def tag(slug):
     ).order_by(Post.published_at.desc())
     
     posts = posts_query.paginate(page=page, per_page=per_page, error_out=False)
+    PostRender.prefetch(posts.items)
     
     site_brand = SettingManager.get('site_title', 'Noteblog')
     context = {
@@ -175,15 +170,10 @@ def tag(slug):
         'site_title': site_brand,
         'page_title': f"{tag.name} - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
     
-    return theme_manager.render_template('tag.html', **context)
+    return theme_manager.render_response('tag.html', **context)
 
 @bp.route('/search')
 def search():
@@ -210,6 +200,7 @@ def search():
         posts = posts_query.paginate(page=page, per_page=per_page, error_out=False)
         results = posts.items
         total = posts.total
+        PostRender.prefetch(results)
     
     site_brand = SettingManager.get('site_title', 'Noteblog')
     title_prefix = f"搜索: {query}" if query else '搜索'
@@ -221,15 +212,10 @@ def search():
         'site_title': site_brand,
         'page_title': f"{title_prefix} - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
     
-    return theme_manager.render_template('search.html', **context)
+    return theme_manager.render_response('search.html', **context)
 
 @bp.route('/comment', methods=['POST'])
 def add_comment():
@@ -326,15 +312,10 @@ def archives():
         'site_title': site_brand,
         'page_title': f"归档 - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
     
-    return theme_manager.render_template('archives.html', **context)
+    return theme_manager.render_response('archives.html', **context)
 
 
 @bp.route('/categories')
@@ -347,14 +328,9 @@ def categories_list():
         'site_title': site_brand,
         'page_title': f"分类 - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
-    return theme_manager.render_template('categories.html', **context)
+    return theme_manager.render_response('categories.html', **context)
 
 
 @bp.route('/tags')
@@ -378,14 +354,9 @@ def tags_list():
         'site_title': site_brand,
         'page_title': f"标签 - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
-    return theme_manager.render_template('tags.html', **context)
+    return theme_manager.render_response('tags.html', **context)
 
 @bp.route('/page/<slug>')
 def page(slug):
@@ -401,15 +372,10 @@ def page(slug):
         'site_title': site_brand,
         'page_title': f"{page.title} - {site_brand}",
         'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
+        'plugin_hooks': plugin_manager.template_hooks(*PAGE_TEMPLATE_HOOKS)
     }
     
-    return theme_manager.render_template('page.html', **context)
+    return theme_manager.render_response('page.html', **context)
 
 @bp.route('/feed')
 def feed():
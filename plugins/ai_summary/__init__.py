@@ -17,6 +17,7 @@ except Exception:  # 避免导入期失败
 
 from app import db
 from app.models.post import Post
+from app.services.markdown_service import markdown_service
 from app.services.plugin_manager import PluginBase
 from .models import PostAISummary
 
@@ -258,9 +259,9 @@ class AISummaryPlugin(PluginBase):
         temperature = float(self._get_cfg().get('temperature', 0.7))
         max_tokens = int(self._get_cfg().get('max_tokens', 300))
 
-        # 构造提示词（控制长度）
+        # 构造提示词（控制长度），正文使用渲染后的纯文本，避免 Markdown 标记占用篇幅
         title = self._truncate(post.title or '', 120)
-        content = self._truncate(post.content or '', 4000)
+        content = self._truncate(markdown_service.render_document(post.content or '').plain_text, 4000)
         system_prompt = '你是博客文章的总结助手，用不超过120字中文概括要点，保留关键词，避免赘述，不输出多余说明。'
         user_prompt = f'标题：{title}\n正文：\n{content}\n请输出一段中文摘要：'
 
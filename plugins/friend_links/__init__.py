@@ -114,14 +114,9 @@ class FriendLinksPlugin(PluginBase):
         }
         
         # 使用插件管理器的模板渲染方法，提供Flask上下文
-        html_content = current_app.plugin_manager.render_plugin_template(
+        return current_app.plugin_manager.render_plugin_template(
             self.name, template_content, context
         )
-        
-        # 注册 JavaScript 和 CSS 加载钩子
-        self._register_assets()
-        
-        return html_content
     
     def _register_assets(self):
         """注册资源文件（CSS 和 JavaScript）"""
@@ -194,14 +189,28 @@ class FriendLinksPlugin(PluginBase):
     
     def register_hooks(self):
         """注册插件钩子"""
-        # 注册侧边栏底部钩子
+        # 注册侧边栏底部钩子；组件与请求无关，跨请求缓存，失效键来自数据库，
+        # 任一 worker 修改链接或配置后所有 worker 的下一次渲染都会重新生成
         if hasattr(current_app, 'plugin_manager'):
             current_app.plugin_manager.register_template_hook(
                 'sidebar_bottom', 
                 self.render_sidebar_widget, 
                 priority=10, 
-                plugin_name=self.name
+                plugin_name=self.name,
+                cache_key=self.widget_cache_key
             )
+            
+            # 注册 JavaScript 和 CSS 加载钩子（只注册一次，不在每次渲染组件时重复注册）
+            self._register_assets()
+    
+    def widget_cache_key(self):
+        """侧边栏组件的失效键：友链数量、最后修改时间与插件配置的修改时间（一次聚合查询）"""
+        from app import db
+        from app.models.plugin import Plugin
+        config_updated_at = db.select(Plugin.updated_at).where(Plugin.name == self.name).scalar_subquery()
+        return tuple(db.session.execute(
+            db.select(db.func.count(FriendLink.id), db.func.max(FriendLink.updated_at), config_updated_at)
+        ).one())
 
 
 # 插件入口点
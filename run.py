@@ -11,10 +11,12 @@ from flask_migrate import upgrade
 from app import create_app, db
 from app.models.user import User
 from app.models.setting import Setting
+from app.utils.schema import add_missing_columns
 
 # 如果命令是 init 或 full-init，则在创建 app 前临时设置环境变量以跳过插件/主题加载，
 # 避免在首次创建数据库表时访问尚不存在的插件/主题表导致错误。
-_INIT_COMMANDS = {'init', 'full-init'}
+# precompile-themes 只读取主题文件，同样无需加载插件和主题扩展（可在部署构建阶段运行）。
+_INIT_COMMANDS = {'init', 'full-init', 'precompile-themes'}
 if len(sys.argv) > 1 and sys.argv[1] in _INIT_COMMANDS:
     os.environ.setdefault('SKIP_PLUGIN_INIT', '1')
 
@@ -74,6 +76,8 @@ def _bootstrap_database(drop_existing: bool = False):
 
     click.echo('→ 正在创建数据库表...')
     db.create_all()
+    for column in add_missing_columns():
+        click.echo(f'  已添加字段 {column}')
     click.echo('✓ 数据库表创建完成')
 
     click.echo('→ 正在写入默认设置...')
@@ -117,6 +121,111 @@ def migrate():
         click.echo('✓ 数据库迁移完成')
 
 
+def _backfill_is_markdown(model, batch_size):
+    """为 is_markdown 为空的记录补写 Markdown 标记（保留原有的更新时间）"""
+    from app.services.markdown_service import markdown_service
+
+    table = model.__table__
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(model.id, model.content).filter(
+            model.id > last_id, model.is_markdown.is_(None)
+        ).order_by(model.id).limit(batch_size).all()
+        if not rows:
+            break
+        for row in rows:
+            db.session.execute(
+                table.update()
+                .where(table.c.id == row.id)
+                .values(is_markdown=markdown_service.is_markdown(row.content), updated_at=table.c.updated_at)
+            )
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+    return updated
+
+
+@cli.command('backfill-renders')
+@click.option('--force', is_flag=True, help='忽略已有结果，重新渲染全部文章和评论')
+@click.option('--batch-size', default=200, show_default=True, help='每批处理的记录数')
+def backfill_renders(force, batch_size):
+    """创建渲染结果表与字段，并为文章和评论补写写入时清理的HTML与 Markdown 标记"""
+    from app.models.post import Post
+    from app.models.comment import Comment
+    from app.models.post_render import PostRender
+    from app.models.comment_render import CommentRender
+
+    with app.app_context():
+        click.echo('→ 正在创建缺失的渲染结果表和字段...')
+        db.create_all()
+        for column in add_missing_columns():
+            click.echo(f'  已添加字段 {column}')
+        PostRender._table_ready = None
+        CommentRender._table_ready = None
+
+        for label, model in (('文章', Post), ('评论', Comment)):
+            updated = _backfill_is_markdown(model, batch_size)
+            click.echo(f'✓ {label}: 补写 Markdown 标记 {updated} 条')
+
+        for label, model in (('文章', PostRender), ('评论', CommentRender)):
+            click.echo(f'→ 正在补写{label}渲染结果...')
+            checked, rendered = model.backfill(
+                force=force,
+                batch_size=batch_size,
+                progress=lambda done, changed: click.echo(f'  已检查 {done} 条，重新渲染 {changed} 条')
+            )
+            click.echo(f'✓ {label}: 共检查 {checked} 条，重新渲染 {rendered} 条')
+    click.echo('🎉 渲染结果补写完成')
+
+
+@cli.command()
+@click.option('--target', type=click.Choice(['all', 'posts', 'comments']), default='all', show_default=True,
+              help='重新渲染的内容类型')
+@click.option('--workers', type=int, default=None, help='渲染进程数，默认为CPU核数，1 表示不使用进程池')
+@click.option('--chunk-size', default=200, show_default=True, help='每批读取、渲染与写入的记录数')
+@click.option('--resume-from-id', default=0, show_default=True, help='从该ID（含）开始处理，用于中断后继续')
+@click.option('--dry-run', is_flag=True, help='只统计渲染结果的差异，不写入数据库')
+def rerender(target, workers, chunk_size, resume_from_id, dry_run):
+    """使用进程池批量重新渲染全部文章和评论（升级扩展或修改允许标签后使用）"""
+    from app.services import rerender_service
+
+    with app.app_context():
+        db.create_all()
+        for column in add_missing_columns():
+            click.echo(f'  已添加字段 {column}')
+
+        targets = rerender_service.get_targets()
+        names = ['posts', 'comments'] if target == 'all' else [target]
+        for name in names:
+            item = targets[name]
+            total = item.model.query.filter(item.model.id >= resume_from_id).count()
+            click.echo(f'→ 正在重新渲染{item.label}（共 {total} 条，从ID {resume_from_id} 开始）...')
+
+            def report(stats, label=item.label, total=total):
+                click.echo(
+                    f"  {label}: {stats['processed']}/{total}，最后ID {stats['last_id']}，"
+                    f"新增 {stats['missing']}，内容变化 {stats['changed']}，仅签名过期 {stats['stale']}"
+                )
+
+            stats = rerender_service.rerender(
+                item,
+                workers=workers,
+                chunk_size=chunk_size,
+                resume_from_id=resume_from_id,
+                dry_run=dry_run,
+                progress=report
+            )
+            if dry_run:
+                click.echo(
+                    f"✓ {item.label}: 检查 {stats['processed']} 条，将新增 {stats['missing']} 条、"
+                    f"内容变化 {stats['changed']} 条、仅更新签名 {stats['stale']} 条（未写入）"
+                )
+            else:
+                click.echo(f"✓ {item.label}: 处理 {stats['processed']} 条，写入 {stats['written']} 条")
+    click.echo('🎉 重新渲染完成')
+
+
 @cli.command()
 @click.option('--username', prompt=True, help='管理员用户名')
 @click.option('--email', prompt=True, help='管理员邮箱')
@@ -150,6 +259,33 @@ def create_admin(username, email, password):
         click.echo(f'✓ 管理员用户 {username} 创建成功')
 
 
+@cli.command('precompile-themes')
+@click.option('--cache-dir', default=None, help='字节码缓存目录，默认为 THEME_BYTECODE_CACHE_DIR（实例目录下的 jinja_cache）')
+def precompile_themes(cache_dir):
+    """预编译所有已安装主题的模板，部署或重启后首次请求无需再编译"""
+    from app.models.theme import Theme
+    from app.services.theme_manager import theme_manager
+
+    with app.app_context():
+        db.create_all()
+        theme_manager.discover_themes()
+        cache_dir = os.path.abspath(cache_dir) if cache_dir else app.config.get('THEME_BYTECODE_CACHE_DIR')
+        if not cache_dir:
+            click.echo('❌ 未配置模板字节码缓存目录，请设置 THEME_BYTECODE_CACHE_DIR 或使用 --cache-dir')
+            sys.exit(1)
+
+        failed = False
+        for theme in Theme.query.order_by(Theme.name).all():
+            compiled, errors = theme_manager.precompile_templates(theme, cache_dir)
+            click.echo(f'✓ {theme.name} ({theme.version}): 预编译 {compiled} 个模板')
+            for name, error in errors.items():
+                failed = True
+                click.echo(f'  ❌ {name}: {error}')
+        click.echo(f'🎉 模板预编译完成，缓存目录: {cache_dir}')
+        if failed:
+            sys.exit(1)
+
+
 @cli.command()
 def reset_admin():
     """重置管理员密码"""
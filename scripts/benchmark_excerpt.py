@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+文章摘要生成基准测试
+比较整篇渲染后截取与按块惰性生成摘要在小、中、超长文章上的耗时，并校验两者结果一致
+"""
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.markdown_service import MarkdownService
+
+SECTION = """## 第 {i} 节
+
+这是第 {i} 节的正文，包含 **加粗**、*斜体*、`行内代码` 和 [链接](https://example.com/{i})。
+
+```python
+def func_{i}(x):
+    return x * {i}
+```
+
+- 列表项 {i}
+- 另一个列表项
+
+| 列 | 值 |
+| --- | --- |
+| a | {i} |
+"""
+
+
+def build_post(size):
+    """生成不少于 size 个字符的文章"""
+    parts = ["# 示例文章\n\n开篇段落，介绍本文的主要内容。"]
+    total = len(parts[0])
+    i = 0
+    while total < size:
+        section = SECTION.format(i=i)
+        parts.append(section)
+        total += len(section) + 1
+        i += 1
+    return "\n".join(parts)
+
+
+def measure(func, repeat):
+    """返回多次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run_benchmark(repeat=20, length=150):
+    """逐个尺寸比较两种实现，缓存清空后计时"""
+    service = MarkdownService()
+    ok = True
+    print(f"{'尺寸':<8}{'字符数':>10}{'整篇渲染(ms)':>16}{'按块生成(ms)':>16}{'加速比':>10}")
+    for label, size in (('小', 1000), ('中', 10000), ('超长', 100000)):
+        text = build_post(size)
+
+        def full():
+            return service.render_document(text, excerpt_length=length).excerpt
+
+        def streaming():
+            # 清空块缓存，测量首次生成摘要的耗时
+            service._block_cache.clear()
+            return service.render_excerpt(text, length)
+
+        if full() != streaming():
+            print(f"❌ {label}文章的摘要与整篇渲染结果不一致")
+            ok = False
+            continue
+
+        full_ms = measure(full, repeat)
+        streaming_ms = measure(streaming, repeat)
+        print(f"{label:<8}{len(text):>10}{full_ms:>16.2f}{streaming_ms:>16.2f}{full_ms / streaming_ms:>9.1f}x")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='文章摘要生成基准测试')
+    parser.add_argument('--repeat', type=int, default=20, help='每种尺寸的重复次数')
+    parser.add_argument('--length', type=int, default=150, help='摘要长度')
+    args = parser.parse_args()
+
+    sys.exit(0 if run_benchmark(args.repeat, args.length) else 1)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+插件钩子分发基准测试
+比较重构前逐个扫描注册表的实现（基线代码原样复制）与预编译分发表在 0、1、20 个回调时执行动作、过滤器、
+模板钩子的单次开销，并校验两者在基准的注册方式下结果一致；
+指定 --sample-rate 时另外测量钩子耗时统计在该抽样比例下增加的开销
+"""
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import current_app
+
+from app.services.hook_profiler import hook_profiler
+from app.services.plugin_manager import PluginManager
+
+CALLBACK_COUNTS = (0, 1, 20)
+
+
+# 以下三个函数逐字复制自重构前（基线提交）PluginManager 的同名方法，只把 self 换成 manager 参数。
+# 注意旧 do_action 不区分钩子类型，并且逐个回调累积截短 args；基准中 bench_action 只注册了
+# accepted_args 相同的动作，因此与新实现（只执行动作、每个回调各自截取 args[:accepted_args]）结果一致
+
+
+def legacy_do_action(manager, hook_name, *args, **kwargs):
+    """执行动作钩子"""
+    if hook_name in manager.hooks:
+        for hook_info in manager.hooks[hook_name]:
+            try:
+                callback = hook_info['callback']
+                accepted_args = hook_info['accepted_args']
+                
+                # 限制参数数量
+                if len(args) > accepted_args:
+                    args = args[:accepted_args]
+                
+                callback(*args, **kwargs)
+            except Exception as e:
+                plugin_name = hook_info.get('plugin_name', 'unknown')
+                current_app.logger.error(f"执行钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
+
+
+def legacy_apply_filters(manager, filter_name, value, *args, **kwargs):
+    """应用过滤器"""
+    if filter_name in manager.hooks:
+        for hook_info in manager.hooks[filter_name]:
+            if hook_info.get('type') == 'filter':
+                try:
+                    callback = hook_info['callback']
+                    accepted_args = hook_info['accepted_args']
+                    
+                    # 限制参数数量，第一个参数是值
+                    filter_args = [value] + list(args[:accepted_args-1])
+                    value = callback(*filter_args, **kwargs)
+                except Exception as e:
+                    plugin_name = hook_info.get('plugin_name', 'unknown')
+                    current_app.logger.error(f"应用过滤器 {filter_name} (插件: {plugin_name}) 失败: {e}")
+    
+    return value
+
+
+def legacy_get_template_hooks(manager, hook_name):
+    """获取模板钩子"""
+    hooks = []
+    if hook_name in manager.hooks:
+        for hook_info in manager.hooks[hook_name]:
+            if hook_info.get('type') == 'template':
+                try:
+                    callback = hook_info['callback']
+                    result = callback()
+                    if result:
+                        hooks.append(result)
+                except Exception as e:
+                    plugin_name = hook_info.get('plugin_name', 'unknown')
+                    current_app.logger.error(f"获取模板钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
+    
+    return hooks
+
+
+def build_manager(count):
+    """注册 count 个动作、过滤器与模板钩子（不关联插件，不写数据库）"""
+    manager = PluginManager()
+    calls = []
+    for i in range(count):
+        manager.register_hook('bench_action', lambda post, user: calls.append(post), priority=i, accepted_args=2)
+        manager.register_filter('bench_filter', lambda value, post: value + 1, priority=count - i, accepted_args=2)
+        manager.register_template_hook('bench_template', lambda i=i: f'<div>{i}</div>', priority=i)
+    return manager, calls
+
+
+def measure(func, repeat, rounds=5):
+    """返回多次调用的平均耗时（微秒），取最快的一轮以减少机器负载的干扰"""
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000000 / repeat
+
+
+def run_benchmark(repeat=20000):
+    """逐个回调数量比较两种实现"""
+    ok = True
+    print(f"{'钩子':<16}{'回调数':>8}{'扫描注册表(us)':>18}{'分发表(us)':>14}{'加速比':>10}")
+    for count in CALLBACK_COUNTS:
+        manager, calls = build_manager(count)
+        cases = (
+            ('do_action',
+             lambda: legacy_do_action(manager, 'bench_action', 'post', 'user', 'extra'),
+             lambda: manager.do_action('bench_action', 'post', 'user', 'extra')),
+            ('apply_filters',
+             lambda: legacy_apply_filters(manager, 'bench_filter', 0, 'post', 'extra'),
+             lambda: manager.apply_filters('bench_filter', 0, 'post', 'extra')),
+            ('template_hooks',
+             lambda: legacy_get_template_hooks(manager, 'bench_template'),
+             lambda: manager.get_template_hooks('bench_template')),
+        )
+        for label, legacy, compiled in cases:
+            calls.clear()
+            expected = (legacy(), list(calls))
+            calls.clear()
+            if (compiled(), list(calls)) != expected:
+                print(f"❌ {label} 在 {count} 个回调时与旧实现结果不一致")
+                ok = False
+                continue
+
+            legacy_us = measure(legacy, repeat)
+            compiled_us = measure(compiled, repeat)
+            calls.clear()
+            print(f"{label:<16}{count:>8}{legacy_us:>18.3f}{compiled_us:>14.3f}{legacy_us / compiled_us:>9.1f}x")
+    return ok
+
+
+def run_profile_overhead(sample_rate, repeat=20000):
+    """比较关闭与开启耗时统计时，20 个回调的单次分发耗时"""
+    manager, calls = build_manager(20)
+    cases = (
+        ('do_action', lambda: manager.do_action('bench_action', 'post', 'user', 'extra')),
+        ('apply_filters', lambda: manager.apply_filters('bench_filter', 0, 'post', 'extra')),
+        ('template_hooks', lambda: manager.get_template_hooks('bench_template')),
+    )
+    print(f"\n{'钩子':<16}{'关闭统计(us)':>16}{f'抽样 {sample_rate:g}(us)':>18}{'开销':>10}")
+    for label, dispatch in cases:
+        hook_profiler.sample_rate = 0
+        disabled_us = measure(dispatch, repeat)
+        hook_profiler.sample_rate = sample_rate
+        sampled_us = measure(dispatch, repeat)
+        calls.clear()
+        print(f"{label:<16}{disabled_us:>16.3f}{sampled_us:>18.3f}{(sampled_us / disabled_us - 1) * 100:>9.1f}%")
+    hook_profiler.sample_rate = 0
+    hook_profiler.reset()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='插件钩子分发基准测试')
+    parser.add_argument('--repeat', type=int, default=20000, help='每轮的重复次数')
+    parser.add_argument('--sample-rate', type=float, default=0, help='测量钩子耗时统计在该抽样比例下的开销')
+    args = parser.parse_args()
+
+    ok = run_benchmark(args.repeat)
+    if args.sample_rate > 0:
+        run_profile_overhead(args.sample_rate, args.repeat)
+    sys.exit(0 if ok else 1)
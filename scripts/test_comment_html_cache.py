@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+评论HTML缓存测试
+验证重复读取命中进程内缓存，内容变化后（即使更新时间不变）缓存失效、审核操作不使缓存失效，
+并且评论回复不再逐条查询
+"""
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'comment_cache.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User, Post, Comment, CommentRender
+from app.models.comment_render import comment_html_cache
+
+
+class QueryCounter:
+    """统计代码块内执行的SQL语句数量"""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+
+
+def setup_data():
+    """创建一篇文章、一条顶级评论及其回复"""
+    db.create_all()
+    user = User('cache_admin', 'cache@example.com', 'password123', is_admin=True, is_active=True)
+    db.session.add(user)
+    db.session.commit()
+
+    post = Post('评论缓存', '正文', user.id, slug='comment-cache', status='published')
+    db.session.add(post)
+    db.session.commit()
+
+    parent = Comment('顶级评论 **加粗**', post.id, is_approved=True, author_name='guest',
+                     author_email='g@example.com')
+    db.session.add(parent)
+    db.session.commit()
+    for index in range(3):
+        db.session.add(Comment(f'回复 *{index}*', post.id, parent_id=parent.id, is_approved=True,
+                               author_name='guest', author_email='g@example.com'))
+    db.session.commit()
+    return post, parent
+
+
+def test_cache_hit_and_invalidation(parent):
+    """重复读取不再查询数据库，内容变化后重新读取，审核后继续命中"""
+    print("测试评论HTML缓存命中...")
+    comment_html_cache.clear()
+    first = parent.get_content_html()
+    with QueryCounter() as counter:
+        second = parent.get_content_html()
+    if first != second or counter.count:
+        print(f"✗ 重复读取执行了 {counter.count} 条查询")
+        return False
+    print("✓ 重复读取命中缓存")
+
+    print("测试编辑后缓存失效...")
+    parent.content = '编辑后的 `评论`'
+    db.session.commit()
+    if '<code>评论</code>' not in parent.get_content_html():
+        print("✗ 编辑后仍返回旧HTML")
+        return False
+    print("✓ 编辑后返回新HTML")
+
+    print("测试不修改更新时间的内容变化...")
+    updated_at = parent.updated_at
+    db.session.execute(
+        Comment.__table__.update().where(Comment.id == parent.id)
+        .values(content='其他进程写入的 ~~内容~~', updated_at=updated_at)
+    )
+    db.session.commit()
+    db.session.expire(parent)
+    if parent.updated_at != updated_at or '其他进程写入的' not in parent.get_content_html():
+        print("✗ 内容变化但更新时间相同时仍返回旧HTML")
+        return False
+    print("✓ 缓存版本包含内容哈希，更新时间相同也返回新HTML")
+
+    print("测试审核操作不使缓存失效...")
+    html = parent.get_content_html()
+    for action in (parent.reject, parent.mark_as_spam, parent.approve):
+        action()
+        db.session.refresh(parent)  # 提交后重新加载评论本身，不计入统计
+        with QueryCounter() as counter:
+            if parent.get_content_html() != html or counter.count:
+                print(f"✗ {action.__name__} 后没有命中缓存（{counter.count} 条查询）")
+                return False
+    print("✓ 审核操作不修改内容，缓存继续命中")
+    return True
+
+
+def test_replies_without_per_comment_queries(post):
+    """设置回复列表后，模板读取回复与渲染结果不再逐条查询"""
+    print("测试评论回复批量加载...")
+    CommentRender.backfill()
+    comment_html_cache.clear()
+    comments = post.get_approved_comments()
+    Comment.attach_replies(comments)
+    CommentRender.prefetch(comments)
+
+    with QueryCounter() as counter:
+        for comment in comments:
+            if comment.parent_id is None:
+                replies = comment.get_replies()
+                if comment.get_reply_count() != 3 or [r.content for r in replies] != [f'回复 *{i}*' for i in range(3)]:
+                    print("✗ 回复列表不正确")
+                    return False
+            comment.get_content_html()
+    if counter.count:
+        print(f"✗ 渲染评论列表执行了 {counter.count} 条查询")
+        return False
+    print("✓ 回复与HTML均无额外查询")
+    return True
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        post, parent = setup_data()
+        ok = all([
+            test_cache_hit_and_invalidation(parent),
+            test_replies_without_per_comment_queries(post)
+        ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
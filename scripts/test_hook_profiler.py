@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+插件钩子耗时统计测试
+验证关闭时只统计异常、开启后按（钩子, 插件）记录次数、总耗时与 p95、抽样比例折算后的次数，
+以及后台报告页面、JSON 接口与清空统计
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'hook_profiler.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+
+
+def setup_data():
+    """创建数据表、默认设置与管理员"""
+    from app.models import User
+    from app.models.setting import SettingManager
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+        db.session.add(User('profile_admin', 'profile@example.com', 'password123', is_admin=True, is_active=True))
+        db.session.commit()
+
+
+def slow_widget():
+    time.sleep(0.002)
+    return '<div>slow</div>'
+
+
+def broken_action(*args):
+    raise RuntimeError('broken')
+
+
+def find(report, hook_name, plugin_name):
+    for entry in report['hooks']:
+        if entry['hook_name'] == hook_name and entry['plugin_name'] == plugin_name:
+            return entry
+    return None
+
+
+def test_disabled(app, profiler):
+    """关闭时不计时，回调异常仍然计数"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试关闭时的统计...")
+    profiler.sample_rate = 0
+    with app.app_context():
+        plugin_manager.register_hook('profile_action', broken_action, plugin_name='broken_plugin')
+    try:
+        with app.test_request_context('/'):
+            for _ in range(3):
+                plugin_manager.do_action('profile_action', 'value')
+        app.test_client().get('/')
+    finally:
+        plugin_manager.unregister_hook('profile_action', broken_action)
+
+    report = profiler.report()
+    broken = find(report, 'profile_action', 'broken_plugin')
+    if broken is None or broken['errors'] != 3 or broken['calls'] != 0:
+        print(f"✗ 异常计数不正确: {broken}")
+        return False
+    if any(entry['calls'] for entry in report['hooks']):
+        print("✗ 关闭时记录了耗时")
+        return False
+    print("✓ 关闭时不计时，3 次异常全部计数")
+    return True
+
+
+def test_slow_plugin(app, profiler):
+    """全部抽样时，慢插件的模板钩子排在报告最前，次数与 p95 正确"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试慢插件报告...")
+    profiler.reset()
+    profiler.sample_rate = 1.0
+    with app.app_context():
+        plugin_manager.register_template_hook('sidebar_bottom', slow_widget, plugin_name='slow_plugin')
+    try:
+        client = app.test_client()
+        for _ in range(5):
+            client.get('/')
+    finally:
+        plugin_manager.unregister_hook('sidebar_bottom', slow_widget)
+
+    report = profiler.report()
+    slow = find(report, 'sidebar_bottom', 'slow_plugin')
+    if slow is None or slow['calls'] != 5 or slow['estimated_calls'] != 5:
+        print(f"✗ 慢插件的次数不正确: {slow}")
+        return False
+    if slow['p95_ms'] < 2 or slow['total_ms'] < 10 or report['hooks'][0] is not slow:
+        print(f"✗ 慢插件的耗时或排序不正确: {slow}")
+        return False
+    if report['plugins'][0]['plugin_name'] != 'slow_plugin':
+        print(f"✗ 按插件汇总的排序不正确: {report['plugins']}")
+        return False
+    print(f"✓ 5 次请求，p95 {slow['p95_ms']} ms，排在报告首位")
+    return True
+
+
+def test_sampling(app, profiler):
+    """按比例抽样时，折算后的次数接近实际分发次数"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试抽样折算...")
+    profiler.reset()
+    profiler.sample_rate = 0.25
+    random.seed(1)
+    callback = lambda value: None
+    with app.app_context():
+        plugin_manager.register_hook('profile_sampled', callback, plugin_name='sampled_plugin')
+    try:
+        with app.test_request_context('/'):
+            for _ in range(2000):
+                plugin_manager.do_action('profile_sampled', 'value')
+    finally:
+        plugin_manager.unregister_hook('profile_sampled', callback)
+        profiler.sample_rate = 1.0
+
+    sampled = find(profiler.report(), 'profile_sampled', 'sampled_plugin')
+    if sampled is None or not 300 < sampled['calls'] < 700 or not 1600 < sampled['estimated_calls'] < 2400:
+        print(f"✗ 抽样次数不正确: {sampled}")
+        return False
+    print(f"✓ 2000 次分发抽样 {sampled['calls']} 次，折算为 {sampled['estimated_calls']} 次")
+    return True
+
+
+def test_admin_report(app, profiler):
+    """后台报告页面与 JSON 接口，清空后报告为空"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试后台报告...")
+    profiler.reset()
+    profiler.sample_rate = 1.0
+    with app.app_context():
+        plugin_manager.register_template_hook('sidebar_bottom', slow_widget, plugin_name='slow_plugin')
+    client = app.test_client()
+    try:
+        client.get('/')
+    finally:
+        plugin_manager.unregister_hook('sidebar_bottom', slow_widget)
+
+    client.post('/auth/login', data={'username': 'profile_admin', 'password': 'password123'})
+    page = client.get('/admin/plugins/performance')
+    data = client.get('/admin/api/plugins/performance').get_json()
+    reset = client.post('/admin/plugins/performance/reset')
+    anonymous = app.test_client().get('/admin/api/plugins/performance')
+
+    if page.status_code != 200 or 'slow_plugin' not in page.get_data(as_text=True):
+        print(f"✗ 报告页面不正确: {page.status_code}")
+        return False
+    if not data or find(data, 'sidebar_bottom', 'slow_plugin') is None or data['sample_rate'] != 1.0:
+        print(f"✗ JSON 报告不正确: {data}")
+        return False
+    if reset.status_code != 302 or find(profiler.report(), 'sidebar_bottom', 'slow_plugin') is not None:
+        print("✗ 清空统计失败")
+        return False
+    if anonymous.status_code == 200:
+        print("✗ 未登录用户可以读取报告")
+        return False
+    print("✓ 报告页面与 JSON 接口列出慢插件，清空后统计重新开始")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    from app.services.hook_profiler import hook_profiler
+    ok = all([
+        test_disabled(app, hook_profiler),
+        test_slow_plugin(app, hook_profiler),
+        test_sampling(app, hook_profiler),
+        test_admin_report(app, hook_profiler)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
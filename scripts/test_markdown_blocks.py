@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Markdown 按块增量渲染测试
+随机组合各类块生成文档，比对按块渲染与整篇渲染的结果，验证编辑后只重新渲染变化的块，
+以及按块生成的摘要与整篇渲染后截取一致
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.markdown_service import MarkdownService, split_blocks
+
+BLOCK_SAMPLES = [
+    "# 标题", "# Intro", "## Intro", "### Intro {#intro}", "Intro\n=====", "Sub\n---",
+    "para with *em*\nline two", "- a\n- b", "- a\n\n    nested para", "* x", "1. one\n2. two",
+    "> quote\n> more", "> q2", "| a | b |\n| - | - |\n| 1 | 2 |",
+    "```python\nx = 1\n\n\ny = 2\n```", "~~~\nraw\n\n~~~", "    indented code",
+    "$$\na\n\nb\n$$", "inline $x$ math", "\\begin{align}\na\n\n\\end{align}",
+    "!!! note \"T\"\n    body\n\n    more", "***", "text {: .cls }", "Para with `code` and **bold**",
+    "# Intro_1", "## 1.2 Heading", "#### H4 `code`", "a  \nb", "+ plus", "\t tab indented"
+]
+
+
+def build_services():
+    """分别创建整篇渲染与按块渲染的服务实例"""
+    full = MarkdownService()
+    full.block_render_min_length = 0
+    blocks = MarkdownService()
+    blocks.block_render_min_length = 1
+    return full, blocks
+
+
+def test_block_render_matches_full(documents=300, seed=0):
+    """按块渲染的HTML、目录与整篇渲染一致"""
+    print(f"🔍 按块渲染一致性测试: {documents} 篇随机文档")
+    full, blocks = build_services()
+    rng = random.Random(seed)
+
+    compared = 0
+    for _ in range(documents):
+        parts = [rng.choice(BLOCK_SAMPLES) for _ in range(rng.randint(2, 12))]
+        text = "\n\n".join(parts)
+        if not blocks.use_block_render(text) or len(split_blocks(text)) < 2:
+            continue
+        compared += 1
+        for sanitize in (True, False):
+            expected = full.render_document(text, sanitize)
+            actual = blocks.render_document(text, sanitize)
+            if (actual.html, actual.toc, actual.headings) != (expected.html, expected.toc, expected.headings):
+                print(f"❌ 渲染结果不一致 (sanitize={sanitize}):\n{text!r}")
+                return False
+
+    print(f"✓ {compared} 篇文档按块渲染与整篇渲染一致")
+    return True
+
+
+def test_excerpt_matches_full(documents=300, seed=0):
+    """按块惰性生成的摘要与整篇渲染后截取一致"""
+    print(f"🔍 摘要一致性测试: {documents} 篇随机文档")
+    full, blocks = build_services()
+    rng = random.Random(seed)
+    samples = BLOCK_SAMPLES + ["正文[^1]\n\n[^1]: 脚注", "<b>原始</b> & 实体 &amp; 5 < 6"]
+
+    for _ in range(documents):
+        text = "\n\n".join(rng.choice(samples) for _ in range(rng.randint(1, 12)))
+        for length in (10, 50, 150):
+            for sanitize in (True, False):
+                expected = full.render_document(text, sanitize, excerpt_length=length).excerpt
+                actual = blocks.render_excerpt(text, length, sanitize)
+                if actual != expected:
+                    print(f"❌ 摘要不一致 (length={length}, sanitize={sanitize}):\n{text!r}")
+                    return False
+
+    print(f"✓ {documents} 篇文档的摘要与整篇渲染一致")
+    return True
+
+
+def test_document_scope_fallback():
+    """脚注、引用式链接等跨块语法回退为整篇渲染"""
+    print("🔍 跨块语法回退测试")
+    _, blocks = build_services()
+    samples = [
+        "正文[^1]\n\n段落\n\n[^1]: 脚注",
+        "[链接][ref]\n\n段落\n\n[ref]: https://example.com",
+        "[TOC]\n\n# 标题\n\n段落",
+        "<div>\n\n原始HTML\n\n</div>",
+        "术语\n: 定义\n\n术语\n: 定义"
+    ]
+    for text in samples:
+        if blocks.use_block_render(text):
+            print(f"❌ 未回退整篇渲染: {text!r}")
+            return False
+    print("✓ 跨块语法均整篇渲染")
+    return True
+
+
+def build_long_document(sections=120):
+    """生成包含重复标题、代码块与表格的长文档"""
+    section = """## 第 {i} 节
+
+这是第 {i} 节的正文，包含 **加粗**、*斜体*、`行内代码` 和 [链接](https://example.com/{i})。
+
+```python
+def func_{i}(x):
+    return x * {i}
+```
+
+| 列 | 值 |
+| --- | --- |
+| a | {i} |
+"""
+    return "# 长文\n\n" + "\n".join(section.format(i=i) for i in range(sections))
+
+
+def test_incremental_edit(sections=120):
+    """编辑一个段落后只重新渲染该段落所在的块"""
+    print(f"🔍 增量编辑测试: {sections} 节长文档")
+    full, blocks = build_services()
+    text = build_long_document(sections)
+
+    start = time.perf_counter()
+    full.render_document(text)
+    full_ms = (time.perf_counter() - start) * 1000
+
+    blocks.render_document(text)
+    misses_before = blocks.get_block_stats()['misses']
+
+    edited = text.replace('这是第 60 节的正文', '这是第 60 节修改后的正文')
+    start = time.perf_counter()
+    actual = blocks.render_document(edited)
+    edit_ms = (time.perf_counter() - start) * 1000
+
+    new_misses = blocks.get_block_stats()['misses'] - misses_before
+    if new_misses != 1:
+        print(f"❌ 编辑后重新渲染了 {new_misses} 个块，期望 1 个")
+        return False
+    if actual.html != full.render_document(edited).html:
+        print("❌ 编辑后按块渲染结果与整篇渲染不一致")
+        return False
+
+    print(f"✓ 编辑后只重新渲染 1 个块: 整篇 {full_ms:.1f}ms, 增量 {edit_ms:.1f}ms")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Markdown 按块增量渲染测试')
+    parser.add_argument('--documents', type=int, default=300, help='随机文档数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    ok = all([
+        test_block_render_matches_full(args.documents, args.seed),
+        test_excerpt_matches_full(args.documents, args.seed),
+        test_document_scope_fallback(),
+        test_incremental_edit()
+    ])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Markdown 并发渲染压力测试
+用 M 个线程并发渲染 N 篇文档，并与单线程渲染结果逐一比对
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.markdown_service import MarkdownService
+
+
+def build_document(index):
+    """生成包含标题、脚注、公式和代码块的测试文档"""
+    return f"""# 文档 {index}
+
+## 第一节 {index}
+
+正文段落 {index}，引用脚注[^n{index}]，行内公式 $a_{index} + b$。
+
+$$
+E_{index} = mc^2
+$$
+
+```python
+def func_{index}():
+    return {index}
+```
+
+## 第二节 {index}
+
+| 列 | 值 |
+| --- | --- |
+| index | {index} |
+
+[^n{index}]: 脚注内容 {index}
+"""
+
+
+def render_pair(service, text):
+    """渲染正文与目录"""
+    return service.render(text), service.get_toc(text)
+
+
+def test_markdown_concurrency(documents=200, threads=8, rounds=3):
+    """并发渲染并与单线程结果比对"""
+    print(f"🔍 并发渲染测试: {documents} 篇文档, {threads} 个线程, {rounds} 轮")
+
+    docs = [build_document(i) for i in range(documents)]
+
+    # 单线程基准结果使用独立的服务实例
+    baseline_service = MarkdownService()
+    expected = [render_pair(baseline_service, text) for text in docs]
+
+    service = MarkdownService()
+    tasks = [i for _ in range(rounds) for i in range(documents)]
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda i: (i, render_pair(service, docs[i])), tasks))
+
+    mismatches = [i for i, result in results if result != expected[i]]
+    if mismatches:
+        print(f"❌ {len(mismatches)} 次渲染结果与单线程不一致，例如文档 {mismatches[0]}")
+        return False
+
+    print(f"✓ {len(results)} 次并发渲染结果与单线程一致")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Markdown 并发渲染压力测试')
+    parser.add_argument('--documents', type=int, default=200, help='文档数量 N')
+    parser.add_argument('--threads', type=int, default=8, help='线程数量 M')
+    parser.add_argument('--rounds', type=int, default=3, help='每篇文档渲染轮数')
+    args = parser.parse_args()
+
+    ok = test_markdown_concurrency(args.documents, args.threads, args.rounds)
+    sys.exit(0 if ok else 1)
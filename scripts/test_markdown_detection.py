@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Markdown 语法检测测试
+验证合并后的预编译检测结果，以及超长文本的检测耗时与长度无关
+"""
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.markdown_service import markdown_service
+
+
+def test_detection_samples():
+    """常见Markdown语法应被识别，纯文本不应被识别"""
+    print("测试Markdown语法检测...")
+    markdown_samples = [
+        '# 标题', '### 三级标题', '正文 **粗体** 正文', '正文 *斜体* 正文', '```python\nprint(1)\n```',
+        '使用 `code` 命令', '[链接](https://example.com)', '![图片](a.png)', '- 列表项', '* 列表项',
+        '1. 有序列表', '> 引用内容', '| 列 | 值 |', '第一段\n\n## 第二段标题'
+    ]
+    plain_samples = ['', '纯文本内容。', 'Hello world', '价格 5 * 3 元', '邮箱 user@example.com', '#话题标签']
+
+    for text in markdown_samples:
+        if not markdown_service.is_markdown(text):
+            print(f"✗ 未识别Markdown: {text!r}")
+            return False
+    for text in plain_samples:
+        if markdown_service.is_markdown(text):
+            print(f"✗ 误识别为Markdown: {text!r}")
+            return False
+
+    print(f"✓ {len(markdown_samples) + len(plain_samples)} 个样例检测正确")
+    return True
+
+
+def test_detection_is_bounded():
+    """超长且不含Markdown语法的文本检测耗时应与长度无关"""
+    print("测试超长文本检测耗时...")
+    timings = []
+    for size in (10 ** 4, 10 ** 6):
+        # 不含任何Markdown语法时需要扫描到检测范围末尾
+        text = ('纯文本内容，没有任何标记。\n' * size)[:size]
+        start = time.perf_counter()
+        markdown_service.is_markdown(text)
+        timings.append(time.perf_counter() - start)
+
+    small, large = timings
+    print(f"  1万字符: {small * 1000:.2f}ms, 100万字符: {large * 1000:.2f}ms")
+    if large > max(small * 20, 0.05):
+        print("✗ 检测耗时随文本长度增长")
+        return False
+
+    print("✓ 检测耗时与文本长度无关")
+    return True
+
+
+if __name__ == "__main__":
+    ok = test_detection_samples() and test_detection_is_bounded()
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
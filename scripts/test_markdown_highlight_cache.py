@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+代码高亮缓存测试
+验证只修改正文时不再调用 Pygments、命中与未命中计数、按 MARKDOWN_HIGHLIGHT_CACHE_SIZE 淘汰最久未使用的条目，
+以及缓存只作用于服务自己的 Markdown 实例
+"""
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['MARKDOWN_HIGHLIGHT_CACHE_SIZE'] = '2'
+
+import markdown
+from markdown.extensions import codehilite, fenced_code
+
+ORIGINAL_CODE_HILITE = codehilite.CodeHilite
+
+from app.services.markdown_service import MarkdownService, highlight_cache
+
+# 统计 Pygments 的调用次数（codehilite 模块中 highlight 的调用）
+pygments_calls = [0]
+_highlight = codehilite.highlight
+
+
+def counting_highlight(*args, **kwargs):
+    pygments_calls[0] += 1
+    return _highlight(*args, **kwargs)
+
+
+codehilite.highlight = counting_highlight
+
+
+def code_block(name):
+    return f"```python\ndef {name}(x):\n    return x * 2\n```"
+
+
+def render(service, text):
+    """渲染并返回本次调用 Pygments 的次数"""
+    before = pygments_calls[0]
+    service.render(text)
+    return pygments_calls[0] - before
+
+
+def test_prose_edit():
+    """只修改代码块之外的正文，不再调用 Pygments"""
+    print("测试只修改正文...")
+    service = MarkdownService()
+    service.block_render_min_length = 0
+    highlight_cache.clear()
+
+    first = render(service, f"第一版正文\n\n{code_block('alpha')}\n\n结尾")
+    stats = service.get_highlight_stats()
+    edited = render(service, f"修改后的正文，多了一句\n\n{code_block('alpha')}\n\n新的结尾")
+    edited_stats = service.get_highlight_stats()
+
+    if first != 1 or edited != 0:
+        print(f"✗ Pygments 调用次数不正确: 首次 {first}，修改正文后 {edited}")
+        return False
+    if (stats['hits'], stats['misses']) != (0, 1) or (edited_stats['hits'], edited_stats['misses']) != (1, 1):
+        print(f"✗ 命中计数不正确: {stats} {edited_stats}")
+        return False
+    print("✓ 修改正文后代码块命中缓存，没有调用 Pygments")
+    return True
+
+
+def test_lru_eviction():
+    """超过容量时淘汰最久未使用的代码块"""
+    print("测试LRU淘汰...")
+    service = MarkdownService()
+    service.block_render_min_length = 0
+    highlight_cache.clear()
+
+    misses = [render(service, code_block(name)) for name in ('alpha', 'beta', 'gamma')]
+    size = service.get_highlight_stats()['size']
+    recent = render(service, code_block('gamma'))
+    evicted = render(service, code_block('alpha'))
+
+    if highlight_cache.maxsize != 2 or size != 2:
+        print(f"✗ 缓存容量不正确: maxsize={highlight_cache.maxsize} size={size}")
+        return False
+    if misses != [1, 1, 1] or recent != 0 or evicted != 1:
+        print(f"✗ 淘汰顺序不正确: {misses} {recent} {evicted}")
+        return False
+    print("✓ 容量为 2 时最早的代码块被淘汰，最近使用的仍然命中")
+    return True
+
+
+def test_scoped_to_service():
+    """不修改扩展模块，其他 Markdown 实例不使用缓存"""
+    print("测试缓存作用范围...")
+    highlight_cache.clear()
+    text = code_block('delta')
+    outputs = [markdown.markdown(text, extensions=['codehilite', 'fenced_code']) for _ in range(2)]
+    stats = highlight_cache.stats()
+
+    if codehilite.CodeHilite is not ORIGINAL_CODE_HILITE or fenced_code.CodeHilite is not ORIGINAL_CODE_HILITE:
+        print("✗ 扩展模块的 CodeHilite 被替换")
+        return False
+    if stats['hits'] or stats['misses'] or outputs[0] != outputs[1]:
+        print(f"✗ 其他 Markdown 实例使用了缓存: {stats}")
+        return False
+    print("✓ 扩展模块未被修改，其他 Markdown 实例不经过缓存")
+    return True
+
+
+if __name__ == "__main__":
+    ok = all([
+        test_prose_edit(),
+        test_lru_eviction(),
+        test_scoped_to_service()
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
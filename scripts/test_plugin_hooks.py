@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+插件钩子分发测试
+验证按优先级（相同优先级按注册顺序）执行、do_action 只执行动作且每个回调各自截取 args[:accepted_args]、
+过滤器按声明的个数截取额外参数，以及 unregister_hook 从注册表与分发表中移除回调
+"""
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.plugin_manager import PluginManager
+
+
+def test_dispatch_order():
+    """按优先级从小到大执行，相同优先级按注册顺序"""
+    print("测试执行顺序...")
+    manager = PluginManager()
+    calls = []
+    manager.register_hook('order_hook', lambda: calls.append('late'), priority=20, accepted_args=0)
+    manager.register_hook('order_hook', lambda: calls.append('first'), priority=5, accepted_args=0)
+    manager.register_hook('order_hook', lambda: calls.append('second'), priority=10, accepted_args=0)
+    manager.register_hook('order_hook', lambda: calls.append('third'), priority=10, accepted_args=0)
+    manager.register_filter('order_filter', lambda value: value + 'b', priority=20)
+    manager.register_filter('order_filter', lambda value: value + 'a', priority=10)
+
+    manager.do_action('order_hook')
+    filtered = manager.apply_filters('order_filter', '')
+    if calls != ['first', 'second', 'third', 'late'] or filtered != 'ab':
+        print(f"✗ 执行顺序不正确: {calls} {filtered}")
+        return False
+    print("✓ 按优先级执行，相同优先级保持注册顺序")
+    return True
+
+
+def test_arity_slicing():
+    """每个动作各自截取 args[:accepted_args]，前一个回调接收的参数少不影响后面的回调"""
+    print("测试参数截取...")
+    manager = PluginManager()
+    received = []
+    manager.register_hook('arity_hook', lambda *args, **kwargs: received.append((args, kwargs)), accepted_args=1)
+    manager.register_hook('arity_hook', lambda *args, **kwargs: received.append((args, kwargs)), accepted_args=3,
+                          priority=20)
+    manager.register_hook('arity_hook', lambda *args, **kwargs: received.append((args, kwargs)), accepted_args=0,
+                          priority=30)
+    manager.register_filter('arity_filter', lambda value, *args: (value, args), accepted_args=2)
+
+    manager.do_action('arity_hook', 'a', 'b', 'c', extra=1)
+    filtered = manager.apply_filters('arity_filter', 'value', 'x', 'y')
+    expected = [(('a',), {'extra': 1}), (('a', 'b', 'c'), {'extra': 1}), ((), {'extra': 1})]
+    if received != expected:
+        print(f"✗ 动作接收的参数不正确: {received}")
+        return False
+    if filtered != ('value', ('x',)):
+        print(f"✗ 过滤器接收的参数不正确: {filtered}")
+        return False
+    print("✓ 每个回调按各自声明的个数截取位置参数，关键字参数全部传入")
+    return True
+
+
+def test_actions_only():
+    """同名的过滤器与模板钩子不会被 do_action 执行"""
+    print("测试只执行动作...")
+    manager = PluginManager()
+    calls = []
+    manager.register_hook('mixed_hook', lambda value: calls.append('action'))
+    manager.register_filter('mixed_hook', lambda value: calls.append('filter') or value)
+    manager.register_template_hook('mixed_hook', lambda: calls.append('template') or '<div></div>')
+
+    manager.do_action('mixed_hook', 'value')
+    if calls != ['action']:
+        print(f"✗ do_action 执行了其他类型的回调: {calls}")
+        return False
+    print("✓ do_action 只执行动作")
+    return True
+
+
+def test_unregister_hook():
+    """注销后回调不再执行，其他回调与其他钩子名不受影响"""
+    print("测试注销回调...")
+    manager = PluginManager()
+    calls = []
+
+    def removed(*args):
+        calls.append('removed')
+
+    def kept(*args):
+        calls.append('kept')
+
+    manager.register_hook('unregister_hook', removed)
+    manager.register_hook('unregister_hook', kept, priority=20)
+    manager.register_hook('other_hook', removed)
+    manager.register_filter('unregister_filter', lambda value: value + 1)
+    manager.register_template_hook('unregister_template', removed)
+
+    manager.unregister_hook('unregister_hook', removed)
+    manager.unregister_hook('unregister_template', removed)
+    manager.do_action('unregister_hook', 'value')
+    manager.do_action('other_hook', 'value')
+    templates = manager.get_template_hooks('unregister_template')
+    manager.unregister_hook('unregister_hook', kept)
+
+    if calls != ['kept', 'removed'] or templates:
+        print(f"✗ 注销后的执行结果不正确: {calls} {templates}")
+        return False
+    if 'unregister_hook' in manager.hooks and manager.hooks['unregister_hook']:
+        print(f"✗ 注册表中仍有已注销的回调: {manager.hooks['unregister_hook']}")
+        return False
+    if manager.apply_filters('unregister_filter', 1) != 2:
+        print("✗ 注销动作影响了其他钩子名的过滤器")
+        return False
+    print("✓ 注销的回调不再执行，其他回调与钩子名不受影响")
+    return True
+
+
+if __name__ == "__main__":
+    ok = all([
+        test_dispatch_order(),
+        test_arity_slicing(),
+        test_actions_only(),
+        test_unregister_hook()
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+文章渲染结果缓存测试
+验证 post_content 过滤器改写的内容只用于本次渲染、不会写入 post_renders，
+以及文章列表页一次性加载渲染结果而不是逐篇查询
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'post_render.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User, Post, PostRender
+from app.models.setting import SettingManager
+from app.services.plugin_manager import plugin_manager
+
+
+class RenderStatements:
+    """记录代码块内涉及 post_renders 表的SQL语句"""
+
+    def __init__(self):
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        if 'post_renders' in statement:
+            self.statements.append(statement.lstrip().split(None, 1)[0].upper())
+
+    @property
+    def writes(self):
+        return [s for s in self.statements if s in ('INSERT', 'UPDATE', 'DELETE')]
+
+    @property
+    def selects(self):
+        return [s for s in self.statements if s == 'SELECT']
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+
+
+def setup_data():
+    """创建 5 篇已发布的文章并写入渲染结果"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+        user = User('render_admin', 'render@example.com', 'password123', is_admin=True, is_active=True)
+        db.session.add(user)
+        db.session.commit()
+        for index in range(5):
+            db.session.add(Post(f'文章 {index}', f'# 标题 {index}\n\n正文 **{index}**', user.id,
+                                slug=f'post-{index}', status='published',
+                                published_at=datetime(2024, 1, 1) + timedelta(days=index)))
+        db.session.commit()
+        PostRender.backfill()
+
+
+def stored_hash(post_id):
+    return db.session.query(PostRender.content_hash).filter_by(post_id=post_id).scalar()
+
+
+def test_filtered_content_not_stored(client):
+    """post_content 过滤器的结果出现在页面中，但两次详情页与一次首页都不改写 post_renders"""
+    print("测试 post_content 过滤器不改写渲染结果...")
+
+    def append_notice(content, post):
+        return content + '\n\n过滤器追加的段落'
+
+    post = Post.query.filter_by(slug='post-0').first()
+    committed_hash = PostRender.compute_hash(post)
+    plugin_manager.register_filter('post_content', append_notice, accepted_args=2)
+    try:
+        with RenderStatements() as recorder:
+            pages = [client.get('/post/post-0').get_data(as_text=True) for _ in range(2)]
+            client.get('/')
+    finally:
+        plugin_manager.unregister_hook('post_content', append_notice)
+
+    if not all('过滤器追加的段落' in html for html in pages):
+        print("✗ 详情页没有使用过滤后的内容")
+        return False
+    if recorder.writes:
+        print(f"✗ 浏览页面时写入了 post_renders: {recorder.writes}")
+        return False
+    db.session.expire_all()
+    if stored_hash(post.id) != committed_hash or db.session.get(Post, post.id).content.endswith('过滤器追加的段落'):
+        print("✗ 保存的渲染结果或文章内容被过滤器改写")
+        return False
+    print("✓ 过滤后的内容只用于本次渲染，post_renders 保持已提交内容的渲染")
+    return True
+
+
+def test_list_prefetch(client):
+    """首页读取 5 篇文章的摘要只查询一次 post_renders"""
+    print("测试列表页批量加载渲染结果...")
+    with RenderStatements() as recorder:
+        html = client.get('/').get_data(as_text=True)
+    if '文章 4' not in html:
+        print("✗ 首页没有渲染文章列表")
+        return False
+    if len(recorder.selects) != 1 or recorder.writes:
+        print(f"✗ 首页执行了 {len(recorder.selects)} 次查询、{len(recorder.writes)} 次写入")
+        return False
+    print("✓ 列表页一次查询加载全部渲染结果")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    with app.app_context():
+        client = app.test_client()
+        ok = all([
+            test_filtered_content_not_stored(client),
+            test_list_prefetch(client)
+        ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+批量重新渲染测试
+验证进程池渲染写入的结果、--dry-run 差异统计与 --resume-from-id 续跑
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'rerender.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+from app.models import User, Post, Comment, PostRender, CommentRender
+from app.services import rerender_service
+
+
+def build_content(index):
+    """生成测试文章内容"""
+    return f"""# 文章 {index}
+
+正文段落 {index}，包含 **加粗** 与 `代码`。
+
+```python
+print({index})
+```
+
+<script>alert({index})</script>
+"""
+
+
+def setup_data(posts):
+    """创建文章与评论，并清空写入钩子产生的渲染结果"""
+    db.create_all()
+    user = User('rerender_admin', 'rerender@example.com', 'password123', is_admin=True, is_active=True)
+    db.session.add(user)
+    db.session.commit()
+
+    for index in range(posts):
+        post = Post(f'文章 {index}', build_content(index), user.id, slug=f'post-{index}', status='published')
+        db.session.add(post)
+        db.session.flush()
+        db.session.add(Comment(f'评论 *{index}*', post.id, is_approved=True, author_name='guest',
+                               author_email='g@example.com'))
+    db.session.commit()
+
+    PostRender.query.delete()
+    CommentRender.query.delete()
+    db.session.commit()
+
+
+def check_stored_matches_render():
+    """存储的渲染结果应与重新渲染的结果一致"""
+    for row in PostRender.query.order_by(PostRender.post_id).limit(20):
+        post = db.session.get(Post, row.post_id)
+        expected = PostRender.build_values(post)
+        if any(getattr(row, name) != value for name, value in expected.items()):
+            print(f"✗ 文章 {row.post_id} 的渲染结果与重新渲染不一致")
+            return False
+    return True
+
+
+def test_rerender(posts=300, workers=4):
+    """进程池渲染、差异统计与续跑"""
+    targets = rerender_service.get_targets()
+
+    print(f"测试进程池重新渲染（{posts} 篇文章，{workers} 个进程）...")
+    start = time.perf_counter()
+    stats = rerender_service.rerender(targets['posts'], workers=workers, chunk_size=50)
+    elapsed = time.perf_counter() - start
+    if stats['written'] != posts or PostRender.query.count() != posts:
+        print(f"✗ 写入数量不正确: {stats}")
+        return False
+    if not check_stored_matches_render():
+        return False
+    print(f"✓ 写入 {stats['written']} 篇文章渲染结果，耗时 {elapsed:.2f}s")
+
+    comment_stats = rerender_service.rerender(targets['comments'], workers=workers, chunk_size=50)
+    if comment_stats['written'] != posts:
+        print(f"✗ 评论写入数量不正确: {comment_stats}")
+        return False
+    print(f"✓ 写入 {comment_stats['written']} 条评论渲染结果")
+
+    print("测试 --dry-run 差异统计...")
+    changed_ids = [row.post_id for row in PostRender.query.order_by(PostRender.post_id).limit(3)]
+    PostRender.query.filter(PostRender.post_id == changed_ids[0]).update({'content_html': '<p>旧结果</p>'})
+    PostRender.query.filter(PostRender.post_id == changed_ids[1]).update({'renderer_signature': 'old'})
+    PostRender.query.filter(PostRender.post_id == changed_ids[2]).delete()
+    db.session.commit()
+
+    stats = rerender_service.rerender(targets['posts'], workers=workers, chunk_size=50, dry_run=True)
+    if (stats['changed'], stats['stale'], stats['missing'], stats['written']) != (1, 1, 1, 0):
+        print(f"✗ 差异统计不正确: {stats}")
+        return False
+    print("✓ 差异统计正确且未写入")
+
+    print("测试 --resume-from-id 续跑...")
+    stats = rerender_service.rerender(targets['posts'], workers=1, chunk_size=50, resume_from_id=changed_ids[1])
+    if stats['processed'] != posts - changed_ids[1] + 1 or stats['written'] != 2:
+        print(f"✗ 续跑结果不正确: {stats}")
+        return False
+    stats = rerender_service.rerender(targets['posts'], workers=workers, chunk_size=50)
+    if stats['written'] != 1 or not check_stored_matches_render():
+        print(f"✗ 补齐剩余差异失败: {stats}")
+        return False
+    print("✓ 续跑只处理指定ID之后的记录，全部差异已修复")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='批量重新渲染测试')
+    parser.add_argument('--posts', type=int, default=300, help='文章数量')
+    parser.add_argument('--workers', type=int, default=4, help='渲染进程数')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        setup_data(args.posts)
+        ok = test_rerender(args.posts, args.workers)
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+运行时状态版本测试
+验证稳定状态下的请求不再查询插件和主题状态、其他 worker 更新版本号后通过信号文件立即同步、
+信号文件不可见时按检查间隔查询版本号、本 worker 的修改不会触发重复同步，
+以及本 worker 修改前尚未同步的其他 worker 的修改不会被跳过
+"""
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'runtime_state.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from sqlalchemy import event, text
+
+from app import create_app, db
+
+SYNC_SETTING_KEYS = ('active_theme', 'runtime_state_version')
+
+
+class SyncQueryCounter:
+    """统计代码块内的全部SQL，以及其中用于同步插件/主题状态的查询"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+        self.sync = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, *args):
+        self.total += 1
+        if 'FROM plugins' in statement or (
+                'FROM settings' in statement and any(key in str(parameters) for key in SYNC_SETTING_KEYS)):
+            self.sync += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def setup_data():
+    """创建数据表与默认设置"""
+    from app.models.setting import SettingManager
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+
+
+def rendered_theme(client):
+    """从页面引用的主题样式表判断渲染所用的主题"""
+    html = client.get('/').get_data(as_text=True)
+    for name in ('aurora', 'default'):
+        if f'/themes/{name}/static/' in html:
+            return name
+    return None
+
+
+def change_from_other_worker(app, theme_name, signal=True):
+    """模拟另一个 worker：直接修改数据库中的主题并把版本号加一，可选更新信号文件"""
+    from app.services.runtime_state import runtime_state
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text("UPDATE settings SET value = :name WHERE key = 'active_theme'"), {'name': theme_name})
+            version = conn.execute(text("SELECT value FROM settings WHERE key = 'runtime_state_version'")).scalar()
+            if version is None:
+                conn.execute(text("INSERT INTO settings (key, value, value_type, category) "
+                                  "VALUES ('runtime_state_version', '1', 'integer', 'system')"))
+            else:
+                conn.execute(text("UPDATE settings SET value = :value WHERE key = 'runtime_state_version'"),
+                             {'value': str(int(version) + 1)})
+    if signal:
+        with open(runtime_state.signal_path, 'a', encoding='utf-8'):
+            pass
+        os.utime(runtime_state.signal_path, ns=(time.time_ns(), time.time_ns() + 1000))
+
+
+def test_steady_state(app, engine):
+    """稳定状态下页面请求不查询插件和主题状态，静态文件请求不执行任何SQL"""
+    print("测试稳定状态下的请求...")
+    client = app.test_client()
+    client.get('/')
+    with SyncQueryCounter(engine) as pages:
+        for _ in range(5):
+            client.get('/')
+    with SyncQueryCounter(engine) as static:
+        response = client.get('/themes/default/static/js/app.js')
+    if pages.sync:
+        print(f"✗ 5 个页面请求执行了 {pages.sync} 次同步查询")
+        return False
+    if response.status_code != 200 or static.total:
+        print(f"✗ 静态文件请求执行了 {static.total} 次SQL: {response.status_code}")
+        return False
+    print(f"✓ 5 个页面请求 0 次同步查询（共 {pages.total} 次SQL），静态文件请求 0 次SQL")
+    return True
+
+
+def test_signal_file(app):
+    """其他 worker 更新版本号与信号文件后，下一个请求立即同步"""
+    print("测试信号文件通知...")
+    client = app.test_client()
+    change_from_other_worker(app, 'aurora')
+    theme = rendered_theme(client)
+    if theme != 'aurora':
+        print(f"✗ 没有同步其他 worker 切换的主题: {theme}")
+        return False
+    print("✓ 信号文件变化后下一个请求使用新主题")
+    return True
+
+
+def test_interval_fallback(app):
+    """信号文件不可见（多机部署）时按检查间隔查询版本号"""
+    from app.services.runtime_state import runtime_state
+
+    print("测试按间隔查询版本号...")
+    client = app.test_client()
+    runtime_state.interval = 0.5
+    try:
+        client.get('/')
+        change_from_other_worker(app, 'default', signal=False)
+        before = rendered_theme(client)
+        time.sleep(0.6)
+        after = rendered_theme(client)
+    finally:
+        runtime_state.interval = 5
+    if (before, after) != ('aurora', 'default'):
+        print(f"✗ 间隔内外的主题不正确: {before} → {after}")
+        return False
+    print("✓ 检查间隔内不查询，间隔过后同步为新主题")
+    return True
+
+
+def test_local_change(app):
+    """本 worker 启用插件后版本号加一，后续请求不重复同步"""
+    from app.services.plugin_manager import plugin_manager
+    from app.services.runtime_state import runtime_state
+
+    print("测试本 worker 的修改...")
+    client = app.test_client()
+    with app.test_request_context('/'):
+        before = runtime_state.version
+        activated = plugin_manager.activate_plugin('weather_showcase')
+        after = runtime_state.version
+
+    reloads = []
+    plugin_manager.load_active_plugins = lambda: reloads.append('plugins')
+    try:
+        client.get('/')
+        client.get('/')
+    finally:
+        del plugin_manager.load_active_plugins
+    if not activated or after != before + 1:
+        print(f"✗ 启用插件没有更新版本号: {before} → {after}")
+        return False
+    if reloads or 'weather_showcase' not in plugin_manager.plugins:
+        print(f"✗ 本 worker 的修改触发了重复同步: {reloads}")
+        return False
+    print(f"✓ 版本号 {before} → {after}，后续请求没有重新加载插件")
+    return True
+
+
+def test_unsynced_change_before_bump(app):
+    """其他 worker 的修改尚未同步时本 worker 更新版本号，仍会同步其他 worker 的修改"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试更新版本号前尚未同步的修改...")
+    client = app.test_client()
+    before = rendered_theme(client)
+    # 信号文件不可见且在检查间隔内：本 worker 还不知道主题已切换
+    change_from_other_worker(app, 'aurora', signal=False)
+    stale = rendered_theme(client)
+    with app.test_request_context('/'):
+        plugin_manager.deactivate_plugin('weather_showcase')
+    after = rendered_theme(client)
+    if (before, stale, after) != ('default', 'default', 'aurora'):
+        print(f"✗ 更新版本号时跳过了其他 worker 的修改: {before} → {stale} → {after}")
+        return False
+    if 'weather_showcase' in plugin_manager.plugins:
+        print("✗ 本 worker 的修改丢失")
+        return False
+    print("✓ 本 worker 更新版本号时同步了其他 worker 切换的主题")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+    ok = all([
+        test_steady_state(app, engine),
+        test_signal_file(app),
+        test_interval_fallback(app),
+        test_local_change(app),
+        test_unsynced_change_before_bump(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
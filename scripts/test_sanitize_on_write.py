@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+写入时清理测试
+验证补写后存储的HTML与清理结果一致，且读取路径不再调用 bleach
+"""
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'sanitize.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+from app.models import User, Post, Comment, PostRender, CommentRender
+from app.services.markdown_service import markdown_service
+
+UNSAFE_MARKDOWN = """# 标题
+
+<script>alert('xss')</script>
+
+<a href="javascript:alert(1)" onclick="steal()">链接</a> **加粗**
+
+<img src="x.png" onerror="alert(1)">
+"""
+
+
+def expected_html(text):
+    """单独执行 Markdown 转换与清理，作为比对基准"""
+    return markdown_service.sanitize_html(markdown_service.render(text, sanitize=False))
+
+
+def setup_data():
+    """创建包含危险HTML的文章和评论，并清空已写入的渲染结果模拟旧数据"""
+    db.create_all()
+    user = User('sanitize_admin', 'sanitize@example.com', 'password123', is_admin=True, is_active=True)
+    db.session.add(user)
+    db.session.commit()
+
+    post = Post('XSS', UNSAFE_MARKDOWN, user.id, slug='xss', status='published', excerpt='<b onclick="x()">摘要</b>')
+    db.session.add(post)
+    db.session.commit()
+
+    comment = Comment(UNSAFE_MARKDOWN, post.id, is_approved=True, author_name='guest', author_email='g@example.com')
+    db.session.add(comment)
+    db.session.commit()
+
+    PostRender.query.delete()
+    CommentRender.query.delete()
+    db.session.commit()
+    return post.id, comment.id
+
+
+def test_backfill_matches_sanitized_output(post_id, comment_id):
+    """补写后存储的HTML应与清理结果完全一致"""
+    print("测试补写结果...")
+    checked, rendered = PostRender.backfill()
+    assert (checked, rendered) == (1, 1), (checked, rendered)
+    checked, rendered = CommentRender.backfill()
+    assert (checked, rendered) == (1, 1), (checked, rendered)
+
+    # 已是最新结果时不应重复渲染
+    assert PostRender.backfill() == (1, 0)
+    assert CommentRender.backfill() == (1, 0)
+
+    post_row = PostRender.query.filter_by(post_id=post_id).one()
+    comment_row = CommentRender.query.filter_by(comment_id=comment_id).one()
+    assert post_row.content_html == expected_html(UNSAFE_MARKDOWN)
+    assert post_row.excerpt_html == expected_html('<b onclick="x()">摘要</b>')
+    assert comment_row.content_html == expected_html(UNSAFE_MARKDOWN)
+    for html in (post_row.content_html, comment_row.content_html):
+        assert '<script' not in html and 'onerror' not in html and 'javascript:' not in html
+    print("✓ 存储的HTML与清理结果一致")
+
+
+def test_read_path_skips_bleach(app, post_id, comment_id):
+    """写入时清理模式下读取不应调用 bleach"""
+    print("测试读取路径...")
+    original = markdown_service.sanitize_html
+
+    def forbidden(html):
+        raise AssertionError('读取路径调用了 sanitize_html')
+
+    markdown_service.sanitize_html = forbidden
+    try:
+        with app.app_context():
+            post = db.session.get(Post, post_id)
+            comment = db.session.get(Comment, comment_id)
+            assert post.get_content_html() == PostRender.query.filter_by(post_id=post_id).one().content_html
+            assert post.get_excerpt_html()
+            assert comment.get_content_html() == CommentRender.query.filter_by(comment_id=comment_id).one().content_html
+
+        client = app.test_client()
+        response = client.get(f'/api/posts/{post_id}?include_html=1')
+        assert response.status_code == 200, response.status_code
+        assert response.get_json()['data']['content_html']
+    finally:
+        markdown_service.sanitize_html = original
+    print("✓ 读取文章、评论与 API 均未调用 bleach")
+
+
+def test_read_time_sanitize_mode(app, comment_id):
+    """关闭写入时清理后，读取时会对已存储的HTML再次清理"""
+    print("测试读取时清理模式...")
+    calls = []
+    expected = expected_html(UNSAFE_MARKDOWN)
+    original = markdown_service.sanitize_html
+
+    def tracking(html):
+        calls.append(html)
+        return original(html)
+
+    markdown_service.sanitize_on_write = False
+    markdown_service.sanitize_html = tracking
+    try:
+        with app.app_context():
+            comment = db.session.get(Comment, comment_id)
+            assert comment.get_content_html() == expected
+    finally:
+        markdown_service.sanitize_on_write = True
+        markdown_service.sanitize_html = original
+    assert len(calls) == 1, len(calls)
+    print("✓ 读取时清理模式正常")
+
+
+if __name__ == "__main__":
+    app = create_app()
+    try:
+        with app.app_context():
+            post_id, comment_id = setup_data()
+            test_backfill_matches_sanitized_output(post_id, comment_id)
+        test_read_path_skips_bleach(app, post_id, comment_id)
+        test_read_time_sanitize_mode(app, comment_id)
+    except AssertionError as exc:
+        print(f"❌ 测试失败: {exc}")
+        sys.exit(1)
+    print("所有测试通过！")
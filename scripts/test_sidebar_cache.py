@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+侧边栏数据缓存测试
+验证缓存命中时页面渲染不再查询侧边栏数据、文章保存/更新/删除后立即失效，以及分类文章数与标签云权重
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'sidebar.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from sqlalchemy import event
+
+from app import create_app, db
+
+
+class SidebarQueryCounter:
+    """统计代码块内侧边栏数据构建执行的SQL数量"""
+
+    def __init__(self):
+        from app.services.sidebar_service import sidebar_service
+        self.service = sidebar_service
+        self.count = 0
+        self._building = False
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        if self._building:
+            self.count += 1
+
+    def _build(self):
+        self._building = True
+        try:
+            return type(self.service).build(self.service)
+        finally:
+            self._building = False
+
+    def __enter__(self):
+        self.service.build = self._build
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+        del self.service.build
+
+
+def setup_data():
+    """创建分类、标签与文章：python 标签 6 篇，flask 标签 1 篇，empty 标签 0 篇"""
+    from app.models import User, Post, Category, Tag
+    from app.models.setting import SettingManager
+
+    db.create_all()
+    SettingManager.init_default_settings()
+    user = User('sidebar_admin', 'sidebar@example.com', 'password123', is_admin=True, is_active=True)
+    category = Category('技术', slug='tech')
+    db.session.add_all([user, category])
+    db.session.flush()
+
+    python, flask, empty = Tag('python', slug='python'), Tag('flask', slug='flask'), Tag('empty', slug='empty')
+    db.session.add_all([python, flask, empty])
+    for index in range(6):
+        post = Post(f'文章 {index}', f'正文 {index}', user.id, slug=f'post-{index}', status='published',
+                    category_id=category.id, published_at=datetime(2024, 1, 1) + timedelta(days=index))
+        post.tags.append(python)
+        if index == 0:
+            post.tags.append(flask)
+        db.session.add(post)
+    db.session.add(Post('草稿', '草稿正文', user.id, slug='draft', status='draft', category_id=category.id))
+    db.session.commit()
+    return user
+
+
+def test_cached_between_requests(client):
+    """第二次渲染页面直接使用缓存的侧边栏数据"""
+    from app.services.sidebar_service import sidebar_service
+
+    print("测试侧边栏数据跨请求缓存...")
+    sidebar_service.invalidate()
+    with SidebarQueryCounter() as first:
+        response = client.get('/archives')
+    with SidebarQueryCounter() as second:
+        client.get('/archives')
+    if response.status_code != 200 or '文章 5' not in response.get_data(as_text=True):
+        print(f"✗ 页面没有渲染最新文章: {response.status_code}")
+        return False
+    if not first.count or second.count:
+        print(f"✗ 缓存未生效: 第一次 {first.count} 次查询，第二次 {second.count} 次查询")
+        return False
+    print(f"✓ 第一次渲染 {first.count} 次侧边栏查询，第二次 0 次")
+    return True
+
+
+def test_counts_and_weights():
+    """分类文章数只统计已发布文章，标签云权重在 1~5 之间"""
+    from app.services.sidebar_service import sidebar_service, TAG_CLOUD_LEVELS
+
+    print("测试分类文章数与标签云权重...")
+    data = sidebar_service.get_data()
+    counts = {category.slug: category.post_count for category in data.categories}
+    weights = {tag.slug: (tag.post_count, tag.weight) for tag in data.tag_cloud}
+    if counts != {'tech': 6}:
+        print(f"✗ 分类文章数不正确: {counts}")
+        return False
+    if weights != {'python': (6, TAG_CLOUD_LEVELS), 'flask': (1, 2), 'empty': (0, 1)}:
+        print(f"✗ 标签云权重不正确: {weights}")
+        return False
+    print(f"✓ 分类文章数与标签云权重正确: {weights}")
+    return True
+
+
+def test_invalidated_by_post_hooks(user):
+    """文章保存、更新、删除的钩子使缓存立即失效"""
+    from app.models import Post
+    from app.services.plugin_manager import plugin_manager
+    from app.services.sidebar_service import sidebar_service
+
+    print("测试文章钩子使侧边栏缓存失效...")
+    sidebar_service.get_data()
+
+    post = Post('新文章', '新正文', user.id, slug='new-post', status='published',
+                published_at=datetime.utcnow())
+    db.session.add(post)
+    db.session.commit()
+    plugin_manager.do_action('after_post_save', post=post)
+    if '新文章' not in [item.title for item in sidebar_service.get_data().recent_posts]:
+        print("✗ 保存文章后侧边栏没有更新")
+        return False
+
+    post.title = '改过的标题'
+    db.session.commit()
+    plugin_manager.do_action('after_post_update', post=post)
+    if sidebar_service.get_data().recent_posts[0].title != '改过的标题':
+        print("✗ 更新文章后侧边栏没有更新")
+        return False
+
+    db.session.delete(post)
+    db.session.commit()
+    plugin_manager.do_action('after_post_delete', post=post)
+    if 'new-post' in [item.slug for item in sidebar_service.get_data().recent_posts]:
+        print("✗ 删除文章后侧边栏没有更新")
+        return False
+    print("✓ 保存、更新、删除文章后侧边栏立即刷新")
+    return True
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        admin = setup_data()
+        ok = all([
+            test_cached_between_requests(app.test_client()),
+            test_counts_and_weights(),
+            test_invalidated_by_post_hooks(admin)
+        ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
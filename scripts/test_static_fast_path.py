@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+静态文件快速通道测试
+验证主题、插件、上传目录的静态文件请求不触发状态同步与插件请求钩子、预览主题的指纹资源可以永久缓存，
+以及开启 STATIC_WSGI_FAST_PATH 后静态文件在进入 Flask 之前返回且不越出静态目录
+"""
+import os
+import re
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+UPLOAD_DIR = os.path.join(WORK_DIR, 'uploads')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'static_fast_path.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['UPLOAD_FOLDER'] = UPLOAD_DIR
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+
+ASSET_URLS = (
+    '/themes/default/static/js/app.js',
+    '/static/plugins/friend_links/css/friend_links.css',
+    '/uploads/photo.txt',
+)
+
+
+def setup_data():
+    """创建数据表、管理员与一个上传文件"""
+    from app.models import User
+    from app.models.setting import SettingManager
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    with open(os.path.join(UPLOAD_DIR, 'photo.txt'), 'w', encoding='utf-8') as upload_file:
+        upload_file.write('uploaded')
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+        db.session.add(User('static_admin', 'static@example.com', 'password123', is_admin=True, is_active=True))
+        db.session.commit()
+
+
+def fingerprinted_url(html, theme_name):
+    match = re.search(rf'/themes/{theme_name}/static/[\w/]+\.[0-9a-f]{{10}}\.(?:css|js)', html)
+    return match.group(0) if match else None
+
+
+class RequestWorkCounter:
+    """统计状态检查与插件 before_request/after_request 钩子的调用次数"""
+
+    def __init__(self):
+        from app.services.plugin_manager import plugin_manager
+        from app.services.runtime_state import runtime_state
+        self.plugin_manager = plugin_manager
+        self.runtime_state = runtime_state
+        self.calls = []
+
+    def _check(self):
+        self.calls.append('check')
+        return type(self.runtime_state).check(self.runtime_state)
+
+    def _before(self):
+        self.calls.append('before')
+
+    def _after(self, response):
+        self.calls.append('after')
+
+    def __enter__(self):
+        self.runtime_state.check = self._check
+        self.plugin_manager.register_hook('before_request', self._before, accepted_args=0)
+        self.plugin_manager.register_hook('after_request', self._after)
+        return self
+
+    def __exit__(self, *exc):
+        del self.runtime_state.check
+        self.plugin_manager.unregister_hook('before_request', self._before)
+        self.plugin_manager.unregister_hook('after_request', self._after)
+
+
+def test_asset_requests_skip_hooks(app):
+    """静态文件请求不检查运行时状态、不触发插件请求钩子，页面请求照常执行"""
+    print("测试静态文件请求跳过同步与请求钩子...")
+    client = app.test_client()
+    bundle_url = fingerprinted_url(client.get('/').get_data(as_text=True), 'default')
+    with RequestWorkCounter() as assets:
+        statuses = [client.get(url).status_code for url in ASSET_URLS + (bundle_url,)]
+    with RequestWorkCounter() as page:
+        client.get('/')
+    if statuses != [200] * len(statuses) or assets.calls:
+        print(f"✗ 静态文件请求: {statuses}, 执行了 {assets.calls}")
+        return False
+    if sorted(page.calls) != ['after', 'before', 'check']:
+        print(f"✗ 页面请求没有执行同步与钩子: {page.calls}")
+        return False
+    print(f"✓ {len(statuses)} 个静态文件请求没有执行同步与插件钩子，页面请求照常执行")
+    return True
+
+
+def test_preview_assets_immutable(app):
+    """管理员预览其他主题时，预览主题的指纹资源同样返回永久缓存头"""
+    from app.services.asset_service import ASSET_CACHE_CONTROL
+
+    print("测试预览主题的指纹资源...")
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'static_admin', 'password': 'password123'})
+    url = fingerprinted_url(client.get('/?preview_theme=aurora').get_data(as_text=True), 'aurora')
+    client.get('/?preview_theme=')
+    response = app.test_client().get(url) if url else None
+    if response is None or response.headers.get('Cache-Control') != ASSET_CACHE_CONTROL:
+        print(f"✗ 预览主题的资源没有永久缓存: {url}")
+        return False
+    print(f"✓ {url} 返回 {ASSET_CACHE_CONTROL}")
+    return True
+
+
+def test_wsgi_fast_path(app):
+    """开启快速通道后静态文件不进入 Flask 分发，缺失的文件仍由 Flask 返回 404，路径不能越出静态目录"""
+    from app.services.asset_service import ASSET_CACHE_CONTROL
+
+    print("测试 WSGI 静态文件快速通道...")
+    dispatched = []
+    app.before_request_funcs.setdefault(None, []).insert(0, lambda: dispatched.append(1))
+    client = app.test_client()
+    bundle_url = fingerprinted_url(client.get('/').get_data(as_text=True), 'default')
+    dispatched.clear()
+
+    responses = {url: client.get(url) for url in ASSET_URLS + (bundle_url,)}
+    if dispatched or any(response.status_code != 200 for response in responses.values()):
+        print(f"✗ 静态文件进入了 Flask 分发: {[r.status_code for r in responses.values()]}, {len(dispatched)} 次")
+        return False
+    if responses[bundle_url].headers.get('Cache-Control') != ASSET_CACHE_CONTROL:
+        print("✗ 快速通道中的指纹资源没有永久缓存头")
+        return False
+    if responses['/uploads/photo.txt'].get_data(as_text=True) != 'uploaded':
+        print("✗ 上传文件内容不正确")
+        return False
+
+    missing = client.get('/themes/default/static/css/missing.css')
+    escaped = [client.get(url).status_code for url in (
+        '/themes/default/static/../theme.json', '/themes/../static/plugins/friend_links/plugin.json',
+        '/static/plugins/../static/x', '/uploads/../instance')]
+    if missing.status_code != 404 or not dispatched:
+        print(f"✗ 缺失的文件没有交给 Flask 处理: {missing.status_code}")
+        return False
+    if 200 in escaped:
+        print(f"✗ 快速通道返回了静态目录之外的文件: {escaped}")
+        return False
+    print(f"✓ {len(responses)} 个静态文件在进入 Flask 之前返回，缺失文件显示 404，越界路径被拒绝")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_asset_requests_skip_hooks(app),
+        test_preview_assets_immutable(app)
+    ])
+    os.environ['STATIC_WSGI_FAST_PATH'] = '1'
+    ok = ok and test_wsgi_fast_path(create_app())
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+模板钩子输出缓存测试
+验证模板钩子在模板读取时才执行且每个请求最多执行一次、过滤器修改 plugin_hooks 不影响同一请求内的其他读取、
+声明可缓存的钩子按 TTL 与失效键跨请求复用，以及友链组件的资源钩子不会随请求重复注册、
+组件的缓存在其他 worker 修改链接或配置后失效
+"""
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'template_hooks.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+
+
+def setup_data():
+    """创建数据表与默认设置"""
+    from app.models.setting import SettingManager
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+
+
+class CountingHook:
+    """记录调用次数的模板钩子"""
+
+    def __init__(self, output):
+        self.output = output
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.output
+
+
+def test_lazy_once_per_request(app):
+    """页面请求中钩子只执行一次，未被读取的钩子不执行"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试模板钩子的惰性执行...")
+    sidebar = CountingHook('<div id="hook-sidebar"></div>')
+    unread = CountingHook('<div id="hook-unread"></div>')
+    plugin_manager.register_template_hook('sidebar_bottom', sidebar)
+    plugin_manager.register_template_hook('unread_hook', unread)
+    try:
+        html = app.test_client().get('/').get_data(as_text=True)
+        with app.test_request_context('/'):
+            hooks = plugin_manager.template_hooks('sidebar_bottom', 'unread_hook')
+            hooks['sidebar_bottom']
+    finally:
+        plugin_manager.unregister_hook('sidebar_bottom', sidebar)
+        plugin_manager.unregister_hook('unread_hook', unread)
+
+    if html.count('hook-sidebar') != 1 or sidebar.calls != 2:
+        print(f"✗ 侧边栏钩子执行了 {sidebar.calls} 次（两个请求），页面中出现 {html.count('hook-sidebar')} 次")
+        return False
+    if unread.calls:
+        print(f"✗ 没有被读取的钩子执行了 {unread.calls} 次")
+        return False
+    print("✓ 每个请求只执行一次侧边栏钩子，未读取的钩子不执行")
+    return True
+
+
+def test_request_memo(app):
+    """同一请求内复用结果；返回的列表可以修改；请求中注册新回调后重新计算"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试请求内复用...")
+    first = CountingHook('first')
+    second = CountingHook('second')
+    plugin_manager.register_template_hook('memo_hook', first)
+    try:
+        with app.test_request_context('/'):
+            plugin_manager.get_template_hooks('memo_hook').append('filtered')
+            repeated = plugin_manager.get_template_hooks('memo_hook')
+            plugin_manager.register_template_hook('memo_hook', second, priority=20)
+            extended = plugin_manager.get_template_hooks('memo_hook')
+    finally:
+        plugin_manager.unregister_hook('memo_hook', first)
+        plugin_manager.unregister_hook('memo_hook', second)
+
+    if repeated != ['first'] or extended != ['first', 'second'] or first.calls != 2:
+        print(f"✗ 请求内的结果不正确: {repeated} {extended}，first 执行 {first.calls} 次")
+        return False
+    print("✓ 重复读取不再执行回调，修改返回值不影响后续读取，新注册的回调生效")
+    return True
+
+
+def test_cross_request_cache(app):
+    """声明 cache_ttl / cache_key 的钩子跨请求复用，过期、失效键变化或主动清除后重新生成"""
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试跨请求缓存...")
+    ttl_hook = CountingHook('ttl')
+    key_hook = CountingHook('key')
+    version = [1]
+    plugin_manager.register_template_hook('ttl_hook', ttl_hook, cache_ttl=0.3, plugin_name=None)
+    plugin_manager.register_template_hook('key_hook', key_hook, cache_key=lambda: version[0])
+
+    def render(name):
+        with app.test_request_context('/'):
+            return plugin_manager.get_template_hooks(name)
+
+    try:
+        for _ in range(3):
+            render('ttl_hook')
+            render('key_hook')
+        cached_calls = (ttl_hook.calls, key_hook.calls)
+        time.sleep(0.35)
+        render('ttl_hook')
+        version[0] = 2
+        render('key_hook')
+        expired_calls = (ttl_hook.calls, key_hook.calls)
+        plugin_manager.invalidate_template_hook_cache('key_hook')
+        render('key_hook')
+        invalidated_calls = key_hook.calls
+    finally:
+        plugin_manager.unregister_hook('ttl_hook', ttl_hook)
+        plugin_manager.unregister_hook('key_hook', key_hook)
+
+    if cached_calls != (1, 1) or expired_calls != (2, 2) or invalidated_calls != 3:
+        print(f"✗ 缓存次数不正确: {cached_calls} {expired_calls} {invalidated_calls}")
+        return False
+    if any(key[0] in ('ttl_hook', 'key_hook') for key in plugin_manager._template_hook_cache):
+        print("✗ 注销回调后缓存没有清除")
+        return False
+    print("✓ 三个请求只生成一次，过期、失效键变化与主动清除后重新生成")
+    return True
+
+
+def test_friend_links_assets(app):
+    """启用友链插件后，多次请求不会重复注册资源钩子，组件跨请求缓存，其他 worker 修改链接或配置后更新"""
+    import json
+    from datetime import datetime
+    from app.services.plugin_manager import plugin_manager
+
+    print("测试友链插件...")
+    with app.test_request_context('/'):
+        plugin_manager.install_plugin('friend_links')
+        plugin_manager.activate_plugin('friend_links')
+
+    client = app.test_client()
+    pages = [client.get('/').get_data(as_text=True) for _ in range(3)]
+    registered = len(plugin_manager.hooks.get('head_assets', []))
+    with app.app_context():
+        plugin = plugin_manager.get_plugin('friend_links')
+        cache_key = ('sidebar_bottom', plugin.render_sidebar_widget)
+        cached = plugin_manager._template_hook_cache.get(cache_key)
+        client.get('/')
+        reused = plugin_manager._template_hook_cache.get(cache_key) is cached
+
+        # 模拟其他 worker：通过独立连接直接写入，本 worker 没有任何失效调用
+        FriendLink = sys.modules[type(plugin).__module__].FriendLink
+        now = datetime.utcnow()
+        with db.engine.begin() as conn:
+            conn.execute(FriendLink.__table__.insert().values(
+                name='新友链', url='https://example.org', description='', logo='', sort_order=0,
+                is_active=True, created_at=now, updated_at=now))
+    added = client.get('/').get_data(as_text=True)
+
+    with app.app_context():
+        config = dict(plugin.get_config(), title='合作伙伴')
+        with db.engine.begin() as conn:
+            conn.execute(db.text("UPDATE plugins SET config_data = :config, updated_at = :now WHERE name = 'friend_links'"),
+                         {'config': json.dumps(config), 'now': datetime.utcnow()})
+    configured = client.get('/').get_data(as_text=True)
+
+    stylesheet = 'friend_links/css/friend_links.css'
+    if any(page.count(stylesheet) != pages[0].count(stylesheet) for page in pages) or registered != 1:
+        print(f"✗ 资源钩子重复注册: head_assets 有 {registered} 个回调")
+        return False
+    if 'friend-links-widget' not in pages[0] or cached is None or not reused:
+        print("✗ 友链组件没有显示或没有跨请求缓存")
+        return False
+    if '新友链' not in added or '合作伙伴' not in configured:
+        print("✗ 其他 worker 修改链接或配置后组件没有更新")
+        return False
+    print("✓ 资源钩子只注册一次，组件跨请求缓存，其他 worker 修改链接或配置后更新")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_lazy_once_per_request(app),
+        test_request_memo(app),
+        test_cross_request_cache(app),
+        test_friend_links_assets(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+主题激活预编译测试
+验证激活前编译新主题的全部模板（包括 admin/），主题自己的模板有错误时保持原主题并在后台显示错误，
+全部通过后才切换，切换后的首批请求不再编译模板；激活进度在其他 worker 中同样可见，
+继承自父主题的模板编译失败时只记录日志
+"""
+import json
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# 使用临时项目目录：default 主题链接到仓库，另建一个正常主题和一个有语法错误的主题
+WORK_DIR = tempfile.mkdtemp()
+PROJECT_ROOT = os.path.join(WORK_DIR, 'project')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'theme_activation.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['THEME_BYTECODE_CACHE_DIR'] = ''
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+
+
+def write_theme(name, templates, parent='default'):
+    """创建测试主题（默认以 default 为父主题）"""
+    theme_dir = os.path.join(PROJECT_ROOT, 'themes', name)
+    for template_name, source in templates.items():
+        path = os.path.join(theme_dir, 'templates', template_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as template_file:
+            template_file.write(source)
+    with open(os.path.join(theme_dir, 'theme.json'), 'w', encoding='utf-8') as config_file:
+        json.dump({'display_name': name, 'version': '1.0.0', 'parent': parent}, config_file)
+
+
+def setup_project():
+    """准备主题目录、数据表与管理员"""
+    os.makedirs(os.path.join(PROJECT_ROOT, 'themes'))
+    os.symlink(os.path.join(REPO_ROOT, 'themes', 'default'), os.path.join(PROJECT_ROOT, 'themes', 'default'))
+    write_theme('good', {'404.html': '{% extends "base.html" %}{% block content %}good 404{% endblock %}'})
+    write_theme('broken', {
+        'post.html': '{% extends "base.html" %}{% block content %}{{ post.title }{% endblock %}',
+        'admin/users.html': '{% extends "admin/base.html" %}{% block admin_content %}{% for %}{% endblock %}'
+    })
+    # legacy 的后台模板有错误，child 继承 legacy 但自己的模板没有问题
+    write_theme('legacy', {
+        'admin/users.html': '{% extends "admin/base.html" %}{% block admin_content %}{% for %}{% endblock %}'
+    })
+    write_theme('child', {'404.html': '{% extends "base.html" %}{% block content %}child 404{% endblock %}'},
+                parent='legacy')
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        from app.models import User
+        from app.models.setting import SettingManager
+        SettingManager.init_default_settings()
+        db.session.add(User('theme_admin', 'theme@example.com', 'password123', is_admin=True, is_active=True))
+        db.session.commit()
+
+
+def test_broken_theme_rejected(app, client):
+    """有语法错误的主题不会启用，错误显示在主题管理页面"""
+    from app.services.theme_manager import theme_manager
+
+    print("测试有错误的主题不会启用...")
+    client.post('/admin/themes/broken/activate')
+    status = client.get('/admin/themes/activation').get_json()
+    if status.get('status') != 'failed' or set(status['errors']) != {'broken:post.html', 'broken:admin/users.html'}:
+        print(f"✗ 激活结果不正确: {status}")
+        return False
+    with app.app_context():
+        if theme_manager.current_theme.name != 'default':
+            print(f"✗ 当前主题被切换为 {theme_manager.current_theme.name}")
+            return False
+    page = client.get('/admin/themes').get_data(as_text=True)
+    if 'broken 主题激活失败' not in page or 'broken:admin/users.html' not in page:
+        print("✗ 主题管理页面没有显示模板错误")
+        return False
+    print(f"✓ {len(status['errors'])} 个模板错误被拦截，当前主题保持 default")
+    return True
+
+
+def test_good_theme_warmed_up(app, client):
+    """后台激活完成后才切换，切换后的请求直接使用已编译的模板"""
+    from jinja2 import Environment
+    from app.services.theme_manager import theme_manager
+
+    print("测试后台预编译后切换主题...")
+    with app.app_context():
+        activation = theme_manager.start_activation('good')
+        if not activation.done.wait(30) or activation.status != 'activated':
+            print(f"✗ 激活失败: {activation.to_dict()}")
+            return False
+
+    compiles = []
+    original_compile = Environment.compile
+
+    def counting_compile(self, *args, **kwargs):
+        compiles.append(args[1] if len(args) > 1 else kwargs.get('name'))
+        return original_compile(self, *args, **kwargs)
+
+    Environment.compile = counting_compile
+    try:
+        pages = {url: client.get(url) for url in ('/', '/missing-page', '/admin/', '/admin/themes')}
+    finally:
+        Environment.compile = original_compile
+
+    if 'good 404' not in pages['/missing-page'].get_data(as_text=True):
+        print("✗ 切换后没有使用新主题的模板")
+        return False
+    if compiles:
+        print(f"✗ 切换后的请求仍在编译模板: {compiles}")
+        return False
+    print(f"✓ 预编译 {activation.compiled} 个模板后切换，切换后的请求没有编译模板")
+    return True
+
+
+def test_status_shared_between_workers(app, client):
+    """激活进度保存在设置中：其他 worker 执行的激活在本 worker 可见，中断的任务按失败显示"""
+    import time
+    from app.models.setting import SettingManager
+    from app.services.theme_manager import THEME_ACTIVATION_SETTING_KEY, theme_manager
+
+    print("测试跨 worker 的激活进度...")
+    # 本 worker 没有执行过这次激活（请求被分配到了其他 worker）
+    theme_manager._activation = None
+    finished = client.get('/admin/themes/activation').get_json()
+
+    with app.app_context():
+        state = {'theme': 'broken', 'status': 'compiling', 'compiled': 7, 'errors': {}, 'duration': 0,
+                 'started_at': time.time(), 'finished_at': None, 'updated_at': time.time()}
+        SettingManager.set(THEME_ACTIVATION_SETTING_KEY, state, 'json', category='system')
+        running = client.get('/admin/themes/activation').get_json()
+        page = client.get('/admin/themes').get_data(as_text=True)
+        duplicate = theme_manager.start_activation('broken', wait=1)
+        started_here = theme_manager._activation is not None
+
+        state['updated_at'] = time.time() - 3600
+        SettingManager.set(THEME_ACTIVATION_SETTING_KEY, state, 'json')
+        interrupted = client.get('/admin/themes/activation').get_json()
+
+    if finished.get('theme') != 'good' or finished.get('status') != 'activated':
+        print(f"✗ 没有读取到其他 worker 完成的激活: {finished}")
+        return False
+    if running.get('status') != 'compiling' or running.get('compiled') != 7 or '已编译 7 个' not in page:
+        print(f"✗ 没有显示其他 worker 的编译进度: {running}")
+        return False
+    if duplicate.status != 'compiling' or started_here:
+        print("✗ 其他 worker 正在激活同一主题时重复启动了激活")
+        return False
+    if interrupted.get('status') != 'failed' or '' not in interrupted.get('errors', {}):
+        print(f"✗ 中断的激活任务没有按失败显示: {interrupted}")
+        return False
+    print("✓ 其他 worker 的激活结果与进度可见，同一主题不重复激活，中断的任务显示为失败")
+    return True
+
+
+def test_inherited_template_errors_logged(app):
+    """父主题的模板编译失败只记录日志，子主题仍然启用"""
+    import logging
+    from app.services.theme_manager import theme_manager
+
+    print("测试继承模板的编译错误...")
+    messages = []
+    handler = logging.Handler()
+    handler.emit = lambda record: messages.append(record.getMessage())
+    app.logger.addHandler(handler)
+    try:
+        with app.app_context():
+            activated = theme_manager.activate_theme('child')
+            activation = theme_manager.get_activation()
+    finally:
+        app.logger.removeHandler(handler)
+
+    if not activated or activation.errors:
+        print(f"✗ 继承模板的错误阻止了激活: {activation.to_dict()}")
+        return False
+    if not any('legacy:admin/users.html' in message for message in messages):
+        print(f"✗ 继承模板的错误没有记录日志: {messages}")
+        return False
+    print("✓ 子主题已启用，父主题的模板错误记录在日志中")
+    return True
+
+
+if __name__ == "__main__":
+    setup_project()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'theme_admin', 'password': 'password123'})
+    ok = all([
+        test_broken_theme_rejected(app, client),
+        test_good_theme_warmed_up(app, client),
+        test_status_shared_between_workers(app, client),
+        test_inherited_template_errors_logged(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
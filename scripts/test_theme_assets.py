@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+主题静态资源指纹测试
+验证页面通过 asset_url() 引用带内容指纹的资源、指纹URL返回永久缓存头、合并文件的内容，
+过期指纹回退到当前文件，以及资源按主题继承链查找、文件修改后指纹随之变化
+"""
+import os
+import re
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'theme_assets.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+
+DEFAULT_STATIC = os.path.join(PROJECT_ROOT, 'themes', 'default', 'static')
+
+
+def setup_data():
+    """创建数据表与默认设置"""
+    from app.models.setting import SettingManager
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+
+
+def read_static(path):
+    with open(os.path.join(DEFAULT_STATIC, path), 'rb') as static_file:
+        return static_file.read()
+
+
+def test_fingerprinted_urls(app):
+    """页面引用带指纹的资源，指纹URL返回永久缓存头与正确的内容"""
+    from app.services.asset_service import ASSET_CACHE_CONTROL
+
+    print("测试带指纹的资源URL...")
+    client = app.test_client()
+    html = client.get('/').get_data(as_text=True)
+    bundle_url = re.search(r'/themes/default/static/css/bundle\.[0-9a-f]{10}\.css', html)
+    script_url = re.search(r'/themes/default/static/js/app\.[0-9a-f]{10}\.js', html)
+    if not bundle_url or not script_url:
+        print("✗ 页面没有引用带指纹的资源")
+        return False
+
+    bundle = client.get(bundle_url.group(0))
+    script = client.get(script_url.group(0))
+    for response in (bundle, script):
+        if response.status_code != 200 or response.headers.get('Cache-Control') != ASSET_CACHE_CONTROL:
+            print(f"✗ 指纹URL的响应不正确: {response.status_code} {response.headers.get('Cache-Control')}")
+            return False
+    if bundle.data != read_static('css/style.css') + b'\n' + read_static('css/markdown.css'):
+        print("✗ 合并文件的内容不正确")
+        return False
+    if script.data != read_static('js/app.js') or not bundle.mimetype == 'text/css':
+        print("✗ 资源内容或类型不正确")
+        return False
+
+    revalidated = client.get(script_url.group(0), headers={'If-None-Match': script.headers['ETag']})
+    if revalidated.status_code != 304:
+        print(f"✗ ETag 重新验证没有返回 304: {revalidated.status_code}")
+        return False
+    print(f"✓ {bundle_url.group(0)} 与 {script_url.group(0)} 返回 {ASSET_CACHE_CONTROL}")
+    return True
+
+
+def test_stale_fingerprint(app):
+    """过期的指纹回退到当前文件，不设置永久缓存；普通URL保持可用"""
+    print("测试过期指纹与普通URL...")
+    client = app.test_client()
+    stale = client.get('/themes/default/static/js/app.0123456789.js')
+    plain = client.get('/themes/default/static/css/style.css')
+    if stale.status_code != 200 or stale.data != read_static('js/app.js') or 'immutable' in stale.headers.get('Cache-Control', ''):
+        print(f"✗ 过期指纹的响应不正确: {stale.status_code} {stale.headers.get('Cache-Control')}")
+        return False
+    if plain.status_code != 200 or plain.data != read_static('css/style.css'):
+        print(f"✗ 普通静态文件URL不可用: {plain.status_code}")
+        return False
+    print("✓ 过期指纹返回当前文件，普通URL不受影响")
+    return True
+
+
+def test_stale_bundle(app):
+    """合并文件只存在于内存中：过期指纹与成员文件被修改后，合并文件URL返回重新构建的内容"""
+    print("测试过期的合并文件...")
+    client = app.test_client()
+    expected = read_static('css/style.css') + b'\n' + read_static('css/markdown.css')
+    old_url = client.get('/themes/default/static/css/bundle.0123456789.css')
+
+    bundle_pattern = r'/themes/default/static/css/bundle\.[0-9a-f]{10}\.css'
+    emitted = re.search(bundle_pattern, client.get('/').get_data(as_text=True)).group(0)
+    style_path = os.path.join(DEFAULT_STATIC, 'css', 'style.css')
+    stat = os.stat(style_path)
+    try:
+        os.utime(style_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        touched = client.get(emitted)
+        refreshed = re.search(bundle_pattern, client.get('/').get_data(as_text=True)).group(0)
+        fresh = client.get(refreshed)
+    finally:
+        os.utime(style_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    if old_url.status_code != 200 or old_url.data != expected:
+        print(f"✗ 旧页面的合并文件URL没有返回当前内容: {old_url.status_code}")
+        return False
+    if 'immutable' in old_url.headers.get('Cache-Control', ''):
+        print("✗ 过期指纹的合并文件URL设置了永久缓存")
+        return False
+    # 只修改时间时内容不变，重新构建后指纹相同，页面引用的URL继续有效
+    if touched.status_code != 200 or touched.data != expected or refreshed != emitted:
+        print(f"✗ 成员文件修改后合并文件URL不正确: {emitted} {touched.status_code} → {refreshed}")
+        return False
+    if fresh.status_code != 200 or 'immutable' not in fresh.headers.get('Cache-Control', ''):
+        print(f"✗ 重新构建后的合并文件URL不正确: {refreshed} {fresh.status_code}")
+        return False
+    print("✓ 过期指纹与成员文件修改后的合并文件URL都返回重新构建的内容")
+    return True
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as asset_file:
+        asset_file.write(content)
+
+
+def test_manifest_chain(app):
+    """资源按继承链查找、主题前缀从指定主题开始查找，开启自动重载时文件修改后指纹变化"""
+    from app.services.asset_service import AssetManifest
+
+    print("测试资源清单的继承链与自动重载...")
+    child_static = os.path.join(WORK_DIR, 'child', 'static')
+    parent_static = os.path.join(WORK_DIR, 'parent', 'static')
+    write_file(os.path.join(child_static, 'css', 'site.css'), 'body { color: red; }')
+    write_file(os.path.join(parent_static, 'css', 'site.css'), 'body { color: blue; }')
+    write_file(os.path.join(parent_static, 'css', 'extra.css'), 'p { margin: 0; }')
+    chain = [
+        ('child', child_static, {'css/all.css': ['css/site.css', 'css/extra.css']}),
+        ('parent', parent_static, {}),
+    ]
+
+    with app.test_request_context('/'):
+        manifest = AssetManifest(chain, auto_reload=True)
+        owners = {
+            'css/site.css': manifest.resolve('css/site.css').theme_name,
+            'parent:css/site.css': manifest.resolve('parent:css/site.css').theme_name,
+            'css/extra.css': manifest.resolve('css/extra.css').theme_name,
+        }
+        bundle = manifest.resolve('css/all.css')
+        first_url = manifest.url('css/site.css')
+        write_file(os.path.join(child_static, 'css', 'site.css'), 'body { color: green; }')
+        os.utime(os.path.join(child_static, 'css', 'site.css'), ns=(0, 0))
+        second_url = manifest.url('css/site.css')
+        missing_url = manifest.url('css/missing.css')
+
+    if owners != {'css/site.css': 'child', 'parent:css/site.css': 'parent', 'css/extra.css': 'parent'}:
+        print(f"✗ 资源查找的主题不正确: {owners}")
+        return False
+    if bundle.data != b'body { color: red; }\np { margin: 0; }':
+        print(f"✗ 合并文件没有按继承链查找成员: {bundle.data!r}")
+        return False
+    if first_url == second_url:
+        print("✗ 文件修改后指纹没有变化")
+        return False
+    if missing_url != '/themes/child/static/css/missing.css':
+        print(f"✗ 不存在的资源应返回普通URL: {missing_url}")
+        return False
+    print(f"✓ 子主题覆盖父主题的同名文件，修改后 {first_url} → {second_url}")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_fingerprinted_urls(app),
+        test_stale_fingerprint(app),
+        test_stale_bundle(app),
+        test_manifest_chain(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+主题配置缓存测试
+验证模板反复调用 get_theme_config() 时不再重复解析 JSON、稳定状态下的请求不再查询主题表，
+以及 set_theme_config() 立即生效并写入数据库
+"""
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'theme_config.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from sqlalchemy import event
+
+from app import create_app, db
+
+
+class ThemeQueryCounter:
+    """统计代码块内查询主题表的SQL数量"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        if 'FROM themes' in statement:
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def setup_data():
+    """创建数据表、默认设置与一篇文章"""
+    from app.models import User, Post
+    from app.models.setting import SettingManager
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+        user = User('config_admin', 'config@example.com', 'password123', is_admin=True, is_active=True)
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Post('文章', '正文', user.id, slug='post', status='published'))
+        db.session.commit()
+
+
+def test_config_parsed_once(app):
+    """多次请求与多次调用只解析一次配置，请求中有提交也不会重新查询主题"""
+    from app.models.theme import Theme
+
+    print("测试主题配置只解析一次...")
+    parses = []
+    original_get_config = Theme.get_config
+
+    def counting_get_config(self):
+        parses.append(self.name)
+        return original_get_config(self)
+
+    Theme.get_config = counting_get_config
+    client = app.test_client()
+    try:
+        # 文章页会提交阅读数，提交会让会话中的对象过期
+        client.get('/post/post')
+        client.get('/')
+        with app.app_context():
+            engine = db.engine
+        with ThemeQueryCounter(engine) as counter:
+            for url in ('/', '/post/post', '/archives', '/'):
+                client.get(url)
+    finally:
+        Theme.get_config = original_get_config
+
+    if len(parses) > 1:
+        print(f"✗ 主题配置被解析了 {len(parses)} 次")
+        return False
+    if counter.count:
+        print(f"✗ 稳定状态下的请求查询了 {counter.count} 次主题表")
+        return False
+    print(f"✓ 配置解析 {len(parses)} 次，后续 4 个请求没有查询主题表")
+    return True
+
+
+def test_set_config(app):
+    """set_theme_config() 立即替换缓存并写入数据库"""
+    from app.models.theme import Theme
+    from app.services.theme_manager import theme_manager
+
+    print("测试 set_theme_config 更新缓存...")
+    with app.test_request_context('/'):
+        config = dict(theme_manager.get_theme_config(), primary_color='#123456')
+        theme_manager.set_theme_config(config)
+        cached = theme_manager.get_theme_config().get('primary_color')
+        stored = db.session.get(Theme, theme_manager.current_theme.id).get_config().get('primary_color')
+    if cached != '#123456' or stored != '#123456':
+        print(f"✗ 配置没有更新: 缓存 {cached}, 数据库 {stored}")
+        return False
+    print("✓ 缓存与数据库中的配置均已更新")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_config_parsed_once(app),
+        test_set_config(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
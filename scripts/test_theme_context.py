@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+主题默认上下文惰性加载测试
+验证未被模板读取的默认变量不会查询数据库、同一请求内只查询一次，以及调试报告的内容
+"""
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'theme_context.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['THEME_CONTEXT_REPORT'] = '1'
+# 关闭侧边栏的跨请求缓存，只验证请求内的复用
+os.environ['SIDEBAR_CACHE_TTL'] = '0'
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from sqlalchemy import event
+
+from app import create_app, db
+
+DEFAULT_TABLES = ('posts', 'categories', 'tags')
+
+
+class TableQueryCounter:
+    """统计代码块内查询 posts/categories/tags 表的SQL数量"""
+
+    def __init__(self):
+        self.counts = {table: 0 for table in DEFAULT_TABLES}
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        for table in DEFAULT_TABLES:
+            if f'FROM {table}' in statement:
+                self.counts[table] += 1
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+
+
+def setup_database():
+    """创建数据表与默认设置"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        from app.models.setting import SettingManager
+        SettingManager.init_default_settings()
+
+
+def test_unused_defaults_not_loaded(app):
+    """模板没有读取的默认变量不查询数据库"""
+    from app.services.theme_manager import theme_manager
+
+    print("测试未读取的默认变量不查询...")
+    with app.test_request_context('/missing'):
+        with TableQueryCounter() as counter:
+            html = theme_manager.render_template('404.html')
+    if '模板渲染错误' in html or '模板未找到' in html or any(counter.counts.values()):
+        print(f"✗ 404 页面查询了默认变量: {counter.counts}")
+        return False
+    print("✓ 404 页面没有查询文章、分类和标签")
+    return True
+
+
+def test_defaults_memoized_per_request(app):
+    """同一请求内多次渲染只查询一次，新请求重新查询"""
+    from app.services.theme_manager import theme_manager
+
+    print("测试默认变量在同一请求内复用...")
+    with app.test_request_context('/archives'):
+        with TableQueryCounter() as single:
+            theme_manager.render_template('archives.html', posts=[], archives={})
+    if not all(single.counts.values()):
+        print(f"✗ 侧边栏没有查询默认数据: {single.counts}")
+        return False
+
+    with app.test_request_context('/archives'):
+        with TableQueryCounter() as counter:
+            theme_manager.render_template('archives.html', posts=[], archives={})
+            theme_manager.render_template('archives.html', posts=[], archives={})
+    if counter.counts != single.counts:
+        print(f"✗ 同一请求内的查询次数不正确: {counter.counts}，单次渲染: {single.counts}")
+        return False
+    print("✓ 每个请求每个默认变量只查询一次")
+    return True
+
+
+def test_usage_report(app):
+    """调试报告列出每个模板读取和未读取的默认变量"""
+    from app.services.theme_manager import theme_manager
+
+    print("测试默认上下文使用报告...")
+    report = theme_manager.get_context_usage_report()
+    not_found = report.get('404.html')
+    archives = report.get('archives.html')
+    if not not_found or 'recent_posts' in not_found['used'] or 'recent_posts' not in not_found['unused']:
+        print(f"✗ 404.html 报告不正确: {not_found}")
+        return False
+    if not archives or archives['renders'] != 3 or archives['used'].get('sidebar') != 3:
+        print(f"✗ archives.html 报告不正确: {archives}")
+        return False
+    print(f"✓ archives.html 读取了 {', '.join(archives['used'])}，未读取 {', '.join(archives['unused']) or '无'}")
+    return True
+
+
+if __name__ == "__main__":
+    setup_database()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_unused_defaults_not_loaded(app),
+        test_defaults_memoized_per_request(app),
+        test_usage_report(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
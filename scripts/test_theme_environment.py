@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+主题模板环境缓存测试
+验证同一主题复用 Jinja 环境（模板只编译一次）、切换主题后环境重建，对比缓存前后的渲染耗时，
+主题继承链（当前主题 → 父主题/default → 核心）的模板查找，以及预编译的字节码缓存
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'theme_env.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['THEME_BYTECODE_CACHE_DIR'] = os.path.join(WORK_DIR, 'jinja_cache')
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+
+
+def setup_database():
+    """创建数据表与默认设置"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        from app.models.setting import SettingManager
+        SettingManager.init_default_settings()
+
+
+def render_index(client):
+    """请求首页并返回耗时（毫秒）"""
+    start = time.perf_counter()
+    response = client.get('/')
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code != 200 or '模板渲染错误'.encode() in response.data:
+        raise RuntimeError(f"首页渲染失败: {response.status_code}")
+    return elapsed
+
+
+def test_inheritance_chain():
+    """子主题覆盖与回退、父主题模板使用自己的基础模板、显式继承父主题同名模板"""
+    from jinja2 import DictLoader
+    from app.services.theme_manager import ThemeEnvironment, ThemeTemplateLoader
+
+    print("测试主题继承链查找...")
+    loader = ThemeTemplateLoader([
+        ('child', DictLoader({
+            'base.html': '[child]{% block body %}{% endblock %}',
+            'index.html': '{% extends "base.html" %}{% block body %}index{% endblock %}',
+            'page.html': '{% extends "parent:page.html" %}{% block body %}child+{{ super() }}{% endblock %}',
+            'admin/base.html': '[child-admin]'
+        })),
+        ('parent', DictLoader({
+            'base.html': '[parent]{% block body %}{% endblock %}',
+            'page.html': '{% extends "base.html" %}{% block body %}page{% endblock %}',
+            'admin/base.html': '[parent-admin]{% block admin_content %}{% endblock %}',
+            'admin/posts.html': '{% extends "admin/base.html" %}{% block admin_content %}posts{% endblock %}'
+        })),
+        ('core', DictLoader({'core.html': 'core'}))
+    ])
+    env = ThemeEnvironment(loader=loader)
+
+    expected = {
+        'index.html': '[child]index',
+        'admin/posts.html': '[parent-admin]posts',
+        'page.html': '[parent]child+page',
+        'core.html': 'core'
+    }
+    for name, output in expected.items():
+        resolved = loader.resolve(name)
+        actual = env.get_template(resolved).render() if resolved else None
+        if actual != output:
+            print(f"✗ {name} 渲染为 {actual!r}，期望 {output!r}")
+            return False
+    if loader.resolve('missing.html') is not None:
+        print("✗ 不存在的模板被解析")
+        return False
+    print("✓ 覆盖、回退与显式继承父主题模板均正确")
+    return True
+
+
+def test_environment_reuse(app, requests=20):
+    """同一主题的请求复用环境，切换主题后重新创建"""
+    from app.services.theme_manager import theme_manager
+
+    client = app.test_client()
+    with app.app_context():
+        theme_name = theme_manager.current_theme.name
+
+    print("测试同一主题复用 Jinja 环境...")
+    render_index(client)
+    environments = dict(theme_manager._environments)
+    if not environments:
+        print("✗ 渲染后没有缓存的环境")
+        return False
+    cached_ms = [render_index(client) for _ in range(requests)]
+    if theme_manager._environments != environments:
+        print("✗ 重复请求创建了新的环境")
+        return False
+    print(f"✓ {requests} 次请求复用 {len(environments)} 个环境")
+
+    print("对比每次请求新建环境（不使用字节码缓存）的耗时...")
+    uncached_ms = []
+    cache_dir = app.config['THEME_BYTECODE_CACHE_DIR']
+    app.config['THEME_BYTECODE_CACHE_DIR'] = None
+    try:
+        for _ in range(requests):
+            theme_manager.clear_environments()
+            uncached_ms.append(render_index(client))
+    finally:
+        app.config['THEME_BYTECODE_CACHE_DIR'] = cache_dir
+        theme_manager.clear_environments()
+    cached_avg = sum(cached_ms) / len(cached_ms)
+    uncached_avg = sum(uncached_ms) / len(uncached_ms)
+    print(f"  复用环境: {cached_avg:.1f}ms, 每次新建: {uncached_avg:.1f}ms, 加速 {uncached_avg / cached_avg:.1f}x")
+    if cached_avg >= uncached_avg:
+        print("✗ 复用环境没有减少渲染耗时")
+        return False
+    print("✓ 复用环境减少了渲染耗时")
+
+    print("测试切换主题后重建环境...")
+    with app.app_context():
+        other = 'aurora' if theme_name != 'aurora' else 'default'
+        if not theme_manager.activate_theme(other):
+            print(f"✗ 无法激活主题 {other}")
+            return False
+    if any(name != other for name in theme_manager._environments):
+        print("✗ 切换主题后仍保留旧主题的环境")
+        return False
+    render_index(client)
+    print(f"✓ 切换到 {other} 后只保留新主题的环境")
+
+    with app.app_context():
+        theme_manager.activate_theme(theme_name)
+    return True
+
+
+def test_precompiled_bytecode(app):
+    """预编译后首次请求直接读取字节码，不再编译模板"""
+    from app.services.theme_manager import ThemeEnvironment, theme_manager
+
+    print("测试预编译模板字节码...")
+    with app.app_context():
+        theme = theme_manager.current_theme
+        compiled, errors = theme_manager.precompile_templates(theme)
+        if errors or not compiled:
+            print(f"✗ 预编译失败: {errors}")
+            return False
+
+    compile_calls = []
+    original_compile = ThemeEnvironment.compile
+
+    def counting_compile(self, *args, **kwargs):
+        compile_calls.append(args[1] if len(args) > 1 else kwargs.get('name'))
+        return original_compile(self, *args, **kwargs)
+
+    ThemeEnvironment.compile = counting_compile
+    try:
+        theme_manager.clear_environments()
+        client = app.test_client()
+        for url in ('/', '/archives', '/tags', '/search?q=test'):
+            response = client.get(url)
+            if response.status_code != 200:
+                print(f"✗ {url} 返回 {response.status_code}")
+                return False
+    finally:
+        ThemeEnvironment.compile = original_compile
+
+    if compile_calls:
+        print(f"✗ 预编译后仍编译了模板: {compile_calls}")
+        return False
+    print(f"✓ 预编译 {compiled} 个模板，重新创建环境后的请求均直接读取字节码")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='主题模板环境缓存测试')
+    parser.add_argument('--requests', type=int, default=20, help='每轮请求次数')
+    args = parser.parse_args()
+
+    setup_database()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_inheritance_chain(),
+        test_environment_reuse(app, args.requests),
+        test_precompiled_bytecode(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+管理员主题预览测试
+验证 ?preview_theme= 只对管理员会话生效、不影响当前主题与其他访客，
+以及在多个主题之间来回预览时复用已编译的环境
+"""
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'theme_preview.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['THEME_BYTECODE_CACHE_DIR'] = ''
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from jinja2 import Environment
+
+from app import create_app, db
+
+PREVIEW_THEMES = ('aurora', 'hoshizora', 'serenity', 'cyber_glitch')
+
+
+def setup_data():
+    """创建数据表、管理员与普通用户"""
+    from app.models import User
+    from app.models.setting import SettingManager
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+        db.session.add(User('preview_admin', 'admin@example.com', 'password123', is_admin=True, is_active=True))
+        db.session.add(User('preview_user', 'user@example.com', 'password123', is_active=True))
+        db.session.commit()
+
+
+def login(app, username):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': username, 'password': 'password123'})
+    return client
+
+
+def stylesheet_theme(client, url):
+    """从页面引用的主题样式表判断渲染所用的主题"""
+    html = client.get(url).get_data(as_text=True)
+    for name in PREVIEW_THEMES + ('default',):
+        if f'/themes/{name}/static/' in html:
+            return name
+    return None
+
+
+def test_preview_is_per_session(app):
+    """预览只影响管理员自己的会话"""
+    print("测试预览只对管理员会话生效...")
+    admin = login(app, 'preview_admin')
+    user = login(app, 'preview_user')
+    visitor = app.test_client()
+
+    seen = {
+        'admin': stylesheet_theme(admin, '/?preview_theme=aurora'),
+        'admin_next_page': stylesheet_theme(admin, '/archives'),
+        'user': stylesheet_theme(user, '/?preview_theme=aurora'),
+        'visitor': stylesheet_theme(visitor, '/'),
+    }
+    expected = {'admin': 'aurora', 'admin_next_page': 'aurora', 'user': 'default', 'visitor': 'default'}
+    if seen != expected:
+        print(f"✗ 预览结果不正确: {seen}")
+        return False
+
+    if stylesheet_theme(admin, '/?preview_theme=') != 'default':
+        print("✗ ?preview_theme= 没有结束预览")
+        return False
+    print("✓ 管理员会话使用预览主题，其他用户与访客不受影响，可以结束预览")
+    return True
+
+
+def test_preview_environments_reused(app):
+    """在多个主题之间来回预览不重新编译模板，也不改变当前主题"""
+    from app.services.theme_manager import theme_manager
+
+    print("测试来回预览复用已编译的环境...")
+    admin = login(app, 'preview_admin')
+    urls = ('/', '/archives', '/missing-page')
+    for name in PREVIEW_THEMES + ('',):
+        for url in urls:
+            admin.get(f'{url}?preview_theme={name}')
+
+    compiles = []
+    original_compile = Environment.compile
+
+    def counting_compile(self, *args, **kwargs):
+        compiles.append(args[1] if len(args) > 1 else kwargs.get('name'))
+        return original_compile(self, *args, **kwargs)
+
+    Environment.compile = counting_compile
+    try:
+        for name in PREVIEW_THEMES + ('',):
+            for url in urls:
+                admin.get(f'{url}?preview_theme={name}')
+    finally:
+        Environment.compile = original_compile
+
+    if compiles:
+        print(f"✗ 再次预览时重新编译了模板: {compiles}")
+        return False
+    with app.app_context():
+        active = theme_manager.current_theme.name
+    if active != 'default' or list(theme_manager._environments) != ['default']:
+        print(f"✗ 预览改变了当前主题: {active}, {list(theme_manager._environments)}")
+        return False
+    print(f"✓ 第二轮预览 {len(PREVIEW_THEMES)} 个主题没有编译模板，当前主题仍为 default")
+    return True
+
+
+if __name__ == "__main__":
+    setup_data()
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_preview_is_per_session(app),
+        test_preview_environments_reused(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)
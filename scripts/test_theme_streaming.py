@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+主题模板流式渲染测试
+验证声明为可流式输出的模板先发送 <head>、输出与整页渲染一致、闪现消息只显示一次，以及未声明的模板保持整页渲染
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'streaming.db')
+os.environ['FLASK_INSTANCE_PATH'] = os.path.join(WORK_DIR, 'instance')
+os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+os.environ['THEME_STREAMING'] = '1'
+os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+from app import create_app, db
+
+
+def setup_data(comments):
+    """创建一篇带大量评论的长文章"""
+    from app.models import User, Post, Comment
+    from app.models.setting import SettingManager
+
+    db.create_all()
+    SettingManager.init_default_settings()
+    user = User('stream_admin', 'stream@example.com', 'password123', is_admin=True, is_active=True)
+    db.session.add(user)
+    db.session.commit()
+
+    content = '\n\n'.join(f'## 第 {index} 节\n\n' + '长文章正文内容。' * 40 for index in range(50))
+    post = Post('长文章', content, user.id, slug='long-post', status='published')
+    db.session.add(post)
+    db.session.flush()
+    for index in range(comments):
+        db.session.add(Comment(f'评论 {index} ' + '内容' * 20, post.id, is_approved=True,
+                               author_name=f'guest{index}', author_email='g@example.com'))
+    db.session.commit()
+
+
+def fetch(client, url):
+    """请求页面，返回 (是否流式, 分块列表, 首块耗时, 总耗时)"""
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = []
+    first_chunk = None
+    for chunk in response.iter_encoded():
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        chunks.append(chunk.decode('utf-8'))
+    total = time.perf_counter() - start
+    response.close()
+    # 整页渲染的响应带有 Content-Length，流式响应没有
+    return 'Content-Length' not in response.headers, chunks, first_chunk or total, total
+
+
+def test_stream_safe_template(app):
+    """声明为可流式输出的模板先发送 <head>，完整输出与整页渲染一致"""
+    print("测试可流式输出的模板...")
+    client = app.test_client()
+    # 预热：首次请求会渲染 Markdown、编译模板
+    fetch(client, '/post/long-post')
+    streamed, chunks, first_chunk, total = fetch(client, '/post/long-post')
+    if not streamed or len(chunks) < 3:
+        print(f"✗ 文章页没有流式输出: streamed={streamed}, {len(chunks)} 块")
+        return False
+    if not chunks[0].rstrip().endswith('</head>') and '</head>' not in chunks[0]:
+        print("✗ 第一块没有包含 </head>")
+        return False
+    if '</body>' in chunks[0]:
+        print("✗ 第一块包含了整个页面")
+        return False
+
+    app.config['THEME_STREAMING'] = False
+    try:
+        buffered, full_chunks, _, full_total = fetch(client, '/post/long-post')
+    finally:
+        app.config['THEME_STREAMING'] = True
+    # 两次请求之间阅读数加一，比较前去掉
+    strip_views = lambda html: re.sub(r'\d+ 阅读', '', html)
+    if buffered or strip_views(''.join(chunks)) != strip_views(''.join(full_chunks)):
+        print("✗ 流式输出与整页渲染的结果不一致")
+        return False
+    print(f"✓ 分 {len(chunks)} 块输出，首块 {first_chunk * 1000:.1f}ms，全部 {total * 1000:.1f}ms"
+          f"（整页渲染 {full_total * 1000:.1f}ms）")
+    return True
+
+
+def test_flashed_messages_consumed(app):
+    """流式输出的页面显示闪现消息后，消息从会话中移除"""
+    print("测试流式输出中的闪现消息...")
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', '流式闪现消息')]
+    _, first, _, _ = fetch(client, '/')
+    _, second, _, _ = fetch(client, '/')
+    if '流式闪现消息' not in ''.join(first) or '流式闪现消息' in ''.join(second):
+        print("✗ 闪现消息没有显示或显示了两次")
+        return False
+    print("✓ 闪现消息只显示一次")
+    return True
+
+
+def test_other_templates_buffered(app):
+    """未声明的模板仍然整页渲染"""
+    print("测试未声明的模板...")
+    streamed, chunks, _, _ = fetch(app.test_client(), '/tags')
+    if streamed or '</html>' not in ''.join(chunks):
+        print(f"✗ 标签页不应流式输出: streamed={streamed}")
+        return False
+    print("✓ 未声明的模板整页渲染")
+    return True
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        setup_data(comments=300)
+    del os.environ['SKIP_PLUGIN_INIT']
+    app = create_app()
+    ok = all([
+        test_stream_safe_template(app),
+        test_flashed_messages_consumed(app),
+        test_other_templates_buffered(app)
+    ])
+    if ok:
+        print("所有测试通过！")
+    sys.exit(0 if ok else 1)